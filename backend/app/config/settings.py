@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 
@@ -5,9 +7,51 @@ class Settings(BaseSettings):
     """Application settings loaded from environment variables."""
 
     mongo_uri: str = "mongodb://localhost:27017/notka"
+    mongo_max_pool_size: int = 100  # Connections per worker process
+    host: str = "0.0.0.0"
     port: int = 8000
     upload_dir: str = "../uploads"
 
+    # Server process settings: "production" runs gunicorn with uvicorn workers
+    run_mode: Literal["development", "production"] = "development"
+    workers: int = 0  # Worker processes in production (0 = CPU count)
+    keepalive: int = 5  # Seconds an idle keep-alive connection stays open
+    backlog: int = 2048  # Pending connections the listen socket queues
+    worker_timeout: int = 60  # Seconds a silent worker runs before it is restarted
+    graceful_timeout: int = 30  # Seconds workers get to finish requests on shutdown
+    max_requests: int = 0  # Restart a worker after this many requests (0 = never)
+    access_log: bool = False  # Per-request access log lines on stdout
+
+    # /api/admin requires "X-Admin-Token: <token>" ("" disables the admin API)
+    admin_token: str = ""
+
+    # Slow query log (per worker; see /api/admin/slow-queries)
+    slow_query_ms: float = 100.0  # Reads slower than this are logged (0 disables)
+    slow_query_log_size: int = 200  # Recent slow commands kept
+    slow_query_explain_after: int = 3  # Explain a query shape once it was slow this often
+    slow_query_explain_interval: float = 60.0  # Min seconds between explains
+    slow_query_storm: int = 100  # No explains while more slow commands came in the last minute
+
+    # Server-Timing header with per-stage durations (validate, db.*, disk.*, serialize)
+    server_timing: bool = True
+    server_timing_log: bool = False  # Also print one JSON line per request
+
+    # Event loop stall detector (see /api/admin/loop)
+    loop_monitor_interval: float = 0.1  # Seconds between heartbeats (0 disables)
+    loop_stall_ms: float = 100.0  # Lag at which the blocking stack is recorded
+    loop_stall_log_size: int = 50  # Recent stalls kept
+
+    # Request profiling for /api/notes (see /api/admin/profiles)
+    profile_token: str = ""  # Requests with "X-Profile: <token>" are profiled ("" disables)
+    profile_sample_rate: float = 0.0  # Fraction of requests profiled at random
+    profile_interval: float = 0.005  # Seconds between stack samples
+    profile_dir: str = "../profiles"
+    profile_keep: int = 50  # Newest profiles kept on disk
+
+    # Metrics: workers share snapshots through metrics_dir so /metrics covers all of them
+    metrics_dir: str = ""  # e.g. /run/notka-metrics in production ("" = this process only)
+    metrics_flush_interval: float = 5.0  # Seconds between snapshot writes
+
     # CORS settings
     cors_origins: list[str] = [
         "http://localhost:3000",
@@ -25,6 +69,69 @@ class Settings(BaseSettings):
         # Videos
         ".mp4", ".webm", ".ogg", ".mov", ".avi", ".mkv", ".m4v"
     }
+    upload_concurrency: int = 4  # Max files written to disk at once per request
+
+    # Serving settings
+    serve_chunk_size: int = 1024 * 1024  # Bytes sent between disconnect checks and pacing
+    attachment_max_age: int = 365 * 24 * 60 * 60  # Browser cache lifetime for uploads
+    file_meta_cache_size: int = 4096  # Served paths whose stat/MIME results are cached
+    file_meta_ttl: float = 1.0  # Seconds a cached stat is trusted before revalidating
+    hot_file_max_size: int = 2 * 1024 * 1024  # Files up to 2MB may be held in memory
+    hot_cache_bytes: int = 64 * 1024 * 1024  # Memory budget for hot files (0 disables)
+    max_disk_reads: int = 64  # Attachment chunks read at once per worker; clients take turns
+    serve_bandwidth: int = 0  # Bytes/s per worker, split evenly across clients (0 = unlimited)
+
+    # Proxy offload: let nginx (X-Accel-Redirect) or Apache (X-Sendfile) stream files
+    file_offload: Literal["", "x-accel-redirect", "x-sendfile"] = ""  # "" = serve in Python
+    file_offload_prefix: str = "/protected-uploads/"  # nginx internal location for upload_dir
+
+    # Attachment storage: "s3" also stores uploads in an S3-compatible bucket and
+    # redirects downloads to presigned URLs (credentials come from the AWS_* env vars)
+    storage_backend: Literal["local", "s3"] = "local"
+    s3_bucket: str = ""
+    s3_endpoint_url: str = ""  # e.g. http://minio:9000; empty for AWS
+    s3_region: str = ""
+    s3_prefix: str = "uploads/"  # Key prefix for attachments in the bucket
+    s3_part_size: int = 8 * 1024 * 1024  # Multipart upload part size (5MB minimum)
+    s3_url_expiry: int = 3600  # Seconds a presigned download URL stays valid
+    s3_scratch_dir: str = ""  # Temporary copies for processing ("" = system temp dir)
+
+    # Cold tier: uploads idle this long move to archive_dir (a cheaper mount)
+    archive_dir: str = "../archive"
+    archive_after_days: int = 0  # Days without access before archiving (0 = never)
+    archive_zstd_level: int = 10  # zstd level for archived files that compress well
+    tiering_interval: int = 6 * 60 * 60  # Seconds between tiering passes
+    access_flush_interval: float = 60.0  # Seconds between batched access-time writes
+
+    # Orphaned upload collection
+    gc_interval: int = 24 * 60 * 60  # Seconds between passes (0 = only on demand)
+    gc_grace_period: int = 24 * 60 * 60  # Files younger than this are never collected
+    gc_delete_rate: float = 20.0  # Max deletions per second (0 = unthrottled)
+
+    # Background deletion of removed attachments
+    delete_workers: int = 4  # Workers draining the deletion queue
+    delete_max_attempts: int = 8  # Tries before a file is parked as failed
+    delete_retry_base: float = 5.0  # Seconds before the first retry; doubles each time
+    delete_retry_max: float = 60 * 60  # Cap on the retry delay
+    delete_lease: float = 5 * 60  # Seconds before a file claimed by a dead worker is retried
+    delete_poll_interval: float = 30.0  # Idle workers check for due retries this often
+
+    # Background processing settings
+    media_workers: int = 0  # Upload processing processes per host (0 = CPU count)
+    job_history: int = 1000  # Jobs kept in memory per worker, and listed by the status API
+    job_retention: int = 7 * 24 * 60 * 60  # Seconds job records stay in the database
+
+    # Preview settings
+    preview_dir: str = "../previews"
+    preview_size: int = 320  # Longest edge of generated thumbnails, in pixels
+    preview_cache_bytes: int = 256 * 1024 * 1024  # 256MB on-disk LRU budget per host
+
+    # Single-page PDF extraction settings
+    page_cache_dir: str = "../page_cache"
+    page_cache_bytes: int = 512 * 1024 * 1024  # 512MB on-disk LRU budget per host
+
+    # Workers re-read the preview and page cache directories this often (0 disables)
+    disk_cache_sweep_interval: float = 60.0
 
     class Config:
         env_file = ".env"
@@ -1,11 +1,22 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 from pathlib import Path
+from starlette.concurrency import run_in_threadpool
 
 from app.config import settings
-from app.services import db
-from app.routes import notes_router
+from app.middleware import MetricsMiddleware, ProfilingMiddleware, ServerTimingMiddleware
+from app.services import (
+    cold_tier, db, deletions, jobs, loop_monitor, maintenance_lock, metrics, orphan_gc,
+    page_cache, previews, storage,
+)
+from app.services.metrics import render
+from app.routes import notes_router, jobs_router, search_router, admin_router
+from notes import access as access_qry
+from notes import deletions as del_qry
+from notes import jobs as jobs_qry
+from notes import pages as pages_qry
 
 
 @asynccontextmanager
@@ -13,16 +24,44 @@ async def lifespan(app: FastAPI):
     """Lifespan events for startup and shutdown."""
     # Startup
     await db.connect()
+    await pages_qry.create_indexes()
+    await access_qry.create_indexes()
+    await del_qry.create_indexes()
+    await jobs_qry.create_indexes(settings.job_retention)
 
     # Ensure upload directory exists
     upload_dir = Path(settings.upload_dir)
     upload_dir.mkdir(parents=True, exist_ok=True)
+    storage.connect()
+
+    # One worker runs the tiering and orphan passes and evicts from the disk caches
+    maintenance = maintenance_lock.acquire()
+    await previews.start(evict=maintenance)
+    await page_cache.start(evict=maintenance)
+
+    # Start background processing for uploads
+    jobs.start()
+    deletions.start()
+    metrics.start()
+    loop_monitor.start()
+    cold_tier.start(tiering=maintenance)  # Accesses are flushed by every worker
+    if maintenance:
+        orphan_gc.start()
 
     print(f"🚀 Server running on port {settings.port}")
 
     yield
 
     # Shutdown
+    await orphan_gc.stop()
+    await cold_tier.stop()
+    await page_cache.stop()
+    await previews.stop()
+    maintenance_lock.release()
+    await loop_monitor.stop()
+    await metrics.stop()
+    await deletions.stop()
+    await jobs.stop()
     await db.disconnect()
 
 
@@ -41,7 +80,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let cross-origin PDF.js / <video> clients see range and validator headers
+    expose_headers=[
+        "Accept-Ranges", "Content-Range", "Content-Length", "ETag", "Last-Modified",
+        "Server-Timing", "X-Profile-Id",
+    ],
 )
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 # Mount uploads directory for serving files
 # COMMENTED OUT: Using custom Range-supporting endpoint instead
@@ -51,6 +98,9 @@ app.add_middleware(
 
 # Include routers
 app.include_router(notes_router)
+app.include_router(jobs_router)
+app.include_router(search_router)
+app.include_router(admin_router)
 
 
 @app.get("/")
@@ -66,3 +116,10 @@ async def health_check():
         "status": "healthy",
         "database": "connected" if db.database is not None else "disconnected",
     }
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics():
+    """Metrics in the Prometheus text format."""
+    snapshot = await run_in_threadpool(metrics.collect)  # Reads other workers' files
+    return PlainTextResponse(render(snapshot), media_type="text/plain; version=0.0.4")
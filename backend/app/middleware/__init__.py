@@ -0,0 +1,5 @@
+from .metrics import MetricsMiddleware
+from .profiling import ProfilingMiddleware
+from .timing import ServerTimingMiddleware, TimedRoute
+
+__all__ = ["MetricsMiddleware", "ProfilingMiddleware", "ServerTimingMiddleware", "TimedRoute"]
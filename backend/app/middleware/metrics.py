@@ -0,0 +1,43 @@
+"""Request latency and in-flight metrics for every HTTP request."""
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.middleware.routing import route_template
+from app.services.metrics import metrics
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware timing each request until its last body byte is sent.
+    Streaming responses are measured in full, which a BaseHTTPMiddleware
+    would not do.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope)
+        status = "500"  # If the app raises before starting a response
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        started = time.perf_counter()
+        metrics.requests_in_flight.inc(method, route)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            metrics.requests_in_flight.dec(method, route)
+            metrics.request_duration.observe(
+                time.perf_counter() - started, method, route, status
+            )
@@ -0,0 +1,53 @@
+"""Opt-in sampling profiles of single /api/notes requests."""
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.middleware.routing import route_template
+from app.services.profiling import profiles
+
+PROFILED_PREFIX = "/api/notes"
+TRIGGER_HEADER = b"x-profile"
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware profiling a request when it carries
+    `X-Profile: <settings.profile_token>` or is picked by
+    settings.profile_sample_rate. The response names the profile in
+    `X-Profile-Id`; the sampler stops once the last body byte is sent.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(PROFILED_PREFIX):
+            await self.app(scope, receive, send)
+            return
+        header = dict(scope["headers"]).get(TRIGGER_HEADER, b"").decode("latin-1")
+        trigger = profiles.should_profile(header)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        sampler = profiles.start(trigger, scope["method"], scope["path"])
+        status = 500
+
+        async def send_with_id(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message).append("X-Profile-Id", sampler.meta["id"])
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.stop(
+                route=route_template(scope),
+                status=status,
+                duration_ms=round((time.perf_counter() - started) * 1000, 3),
+            )
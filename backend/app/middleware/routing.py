@@ -0,0 +1,15 @@
+"""Helpers shared by the instrumentation middleware."""
+from starlette.routing import Match
+from starlette.types import Scope
+
+UNMATCHED = "unmatched"  # Keeps 404 scans from creating one series per path
+
+
+def route_template(scope: Scope) -> str:
+    """The path template of the route a request will hit, e.g. /api/notes/{note_id}."""
+    app = scope.get("app")
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match != Match.NONE:
+            return getattr(route, "path", UNMATCHED)
+    return UNMATCHED
@@ -0,0 +1,109 @@
+"""Server-Timing header with a per-stage breakdown of each request."""
+import json
+import time
+from typing import Callable
+
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.middleware.routing import route_template
+from app.services.timing import RequestTimer, request_timer
+
+
+class TimedRoute(APIRoute):
+    """
+    APIRoute splitting its handler into `validate` (reading and validating
+    the request), `handler` (the endpoint) and `serialize` (response model
+    validation and rendering).
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, self._timed_endpoint(endpoint), **kwargs)
+
+    @staticmethod
+    def _timed_endpoint(endpoint: Callable) -> Callable:
+        # FastAPI reads the signature through __wrapped__; every endpoint here is async
+        async def wrapper(*args, **kwargs):
+            timer = request_timer.get()
+            if timer is None:
+                return await endpoint(*args, **kwargs)
+            started = time.perf_counter()
+            if timer.route_started is not None:
+                timer.add("validate", started - timer.route_started)
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                timer.endpoint_finished = time.perf_counter()
+                timer.add("handler", timer.endpoint_finished - started)
+
+        wrapper.__wrapped__ = endpoint
+        wrapper.__name__ = endpoint.__name__
+        wrapper.__doc__ = endpoint.__doc__
+        return wrapper
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request: Request):
+            timer = request_timer.get()
+            if timer is None:
+                return await handler(request)
+            timer.route_started = time.perf_counter()
+            try:
+                response = await handler(request)
+            except RequestValidationError:
+                timer.add("validate", time.perf_counter() - timer.route_started)
+                raise
+            if timer.endpoint_finished is not None:
+                timer.add("serialize", time.perf_counter() - timer.endpoint_finished)
+            return response
+        return timed_handler
+
+
+class ServerTimingMiddleware:
+    """
+    Pure ASGI middleware adding `Server-Timing` to every response, and a JSON
+    log line per request with settings.server_timing_log. Stages finished
+    after the headers are sent (the rest of a streamed body) only reach the log.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not settings.server_timing:
+            await self.app(scope, receive, send)
+            return
+
+        timer = RequestTimer()
+        token = request_timer.set(timer)
+        status = 500
+
+        async def send_with_timing(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", timer.header())
+                # Let cross-origin pages read the timings (PerformanceResourceTiming)
+                origin = dict(scope["headers"]).get(b"origin", b"").decode("latin-1")
+                if origin in settings.cors_origins:
+                    headers.append("Timing-Allow-Origin", origin)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_timer.reset(token)
+            if settings.server_timing_log:
+                print(json.dumps({
+                    "method": scope["method"],
+                    "route": route_template(scope),
+                    "status": status,
+                    "total_ms": round(timer.elapsed() * 1000, 3),
+                    "stages": timer.as_dict(),
+                }))
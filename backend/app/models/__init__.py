@@ -1,3 +1,3 @@
-from .note import Note, NoteCreate, NoteUpdate, NoteInDB
+from .note import Attachment, Note, NoteCreate, NoteUpdate, NoteInDB
 
-__all__ = ["Note", "NoteCreate", "NoteUpdate", "NoteInDB"]
+__all__ = ["Attachment", "Note", "NoteCreate", "NoteUpdate", "NoteInDB"]
@@ -22,13 +22,28 @@ class PyObjectId(ObjectId):
         field_schema.update(type="string")
 
 
+class Attachment(BaseModel):
+    """Stored attachment record; probed fields stay None until known (or for legacy files)."""
+
+    path: str
+    name: Optional[str] = None
+    size: Optional[int] = None
+    mime_type: Optional[str] = None
+    sha256: Optional[str] = None
+    uploaded_at: Optional[datetime] = None
+    page_count: Optional[int] = None
+    duration: Optional[float] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+
 class NoteBase(BaseModel):
     """Base note model with common fields."""
 
     title: str = Field(..., min_length=1, max_length=200)
     content: str = Field(default='')  # Allow empty content
     file_path: Optional[str] = None  # Keep for backward compatibility
-    files: Optional[List[str]] = Field(default_factory=list)  # New: support multiple files
+    files: Optional[List[str]] = Field(default_factory=list)  # Attachment paths
     page_number: Optional[int] = Field(None, ge=1)
 
 
@@ -62,6 +77,7 @@ class Note(NoteBase):
 
     id: str = Field(..., alias="_id")
     created_at: datetime
+    attachments: List[Attachment] = Field(default_factory=list)  # One record per file
 
     class Config:
         populate_by_name = True
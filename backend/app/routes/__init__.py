@@ -1,3 +1,6 @@
 from .notes import router as notes_router
+from .jobs import router as jobs_router
+from .search import router as search_router
+from .admin import router as admin_router
 
-__all__ = ["notes_router"]
+__all__ = ["notes_router", "jobs_router", "search_router", "admin_router"]
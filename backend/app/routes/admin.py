@@ -0,0 +1,122 @@
+import secrets
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Dict, List
+
+from app.config import settings
+from app.middleware import TimedRoute
+from app.services.deletions import deletions
+from app.services.file_cache import file_cache
+from app.services.hot_cache import hot_cache
+from app.services.loop_monitor import loop_monitor
+from app.services.maintenance import maintenance_lock
+from app.services.orphan_gc import orphan_gc
+from app.services.profiling import profiles
+from app.services.slow_queries import slow_queries
+from app.services.streams import streams
+from app.services.tiering import cold_tier
+
+
+async def require_admin(x_admin_token: str = Header("")):
+    """Admin endpoints need `X-Admin-Token: <settings.admin_token>` ("" disables them)."""
+    if not settings.admin_token or not secrets.compare_digest(
+        x_admin_token.encode(), settings.admin_token.encode()
+    ):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+def require_maintenance_worker():
+    """Passes that move or delete files only run in the worker holding the maintenance lock."""
+    if not maintenance_lock.held:
+        raise HTTPException(
+            status_code=409, detail="Maintenance runs in another worker; retry the request"
+        )
+
+
+router = APIRouter(
+    prefix="/api/admin", tags=["admin"], route_class=TimedRoute,
+    dependencies=[Depends(require_admin)],
+)
+
+
+@router.get("/cache", response_model=Dict[str, Any])
+async def cache_stats():
+    """Hit rates and sizes of the attachment serving caches."""
+    return {
+        "hot_files": hot_cache.stats(),
+        "file_metadata": file_cache.stats(),
+    }
+
+
+@router.get("/streams", response_model=Dict[str, Any])
+async def stream_stats():
+    """Attachment bodies being sent by this worker and chunk reads waiting for a turn."""
+    return streams.stats()
+
+
+@router.get("/tiering", response_model=Dict[str, Any])
+async def tiering_stats():
+    """Cold tier activity: files archived and recalled, and the last pass."""
+    return cold_tier.stats()
+
+
+@router.post(
+    "/tiering/run", response_model=Dict[str, Any],
+    dependencies=[Depends(require_maintenance_worker)],
+)
+async def run_tiering():
+    """Run a tiering pass now."""
+    return await cold_tier.run_pass()
+
+
+@router.get("/gc", response_model=Dict[str, Any])
+async def gc_stats():
+    """Orphaned upload collection: schedule and the last pass."""
+    return orphan_gc.stats()
+
+
+@router.post(
+    "/gc/run", response_model=Dict[str, Any], dependencies=[Depends(require_maintenance_worker)]
+)
+async def run_gc(dry_run: bool = False):
+    """Collect orphaned uploads now (dry_run only counts them)."""
+    try:
+        return await orphan_gc.run(dry_run=dry_run)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/slow-queries", response_model=Dict[str, Any])
+async def slow_query_stats():
+    """Slow MongoDB reads on this worker by query shape, with explain summaries."""
+    return slow_queries.stats()
+
+
+@router.get("/loop", response_model=Dict[str, Any])
+async def loop_stats():
+    """Event loop lag percentiles on this worker and the stacks of recent stalls."""
+    return loop_monitor.stats()
+
+
+@router.get("/profiles", response_model=List[Dict[str, Any]])
+async def list_profiles():
+    """Stored request profiles, newest first."""
+    return await run_in_threadpool(profiles.list)
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str):
+    """Collapsed stacks of a profile, ready for flamegraph.pl or speedscope."""
+    try:
+        path = await run_in_threadpool(profiles.stacks_path, profile_id)
+        return PlainTextResponse(await run_in_threadpool(path.read_text, encoding="utf-8"))
+    except (KeyError, FileNotFoundError):
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+
+@router.get("/deletions", response_model=Dict[str, Any])
+async def deletion_stats():
+    """Background deletion queue: queued, running and failed files, and worker counters."""
+    return await deletions.stats()
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, HTTPException
+from typing import Any, Dict, List, Optional
+
+from app.middleware import TimedRoute
+from app.services import jobs
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"], route_class=TimedRoute)
+
+
+@router.get("/", response_model=List[Dict[str, Any]])
+async def list_jobs(note_id: Optional[str] = None):
+    """List recent background jobs, optionally for a single note."""
+    return await jobs.list(note_id)
+
+
+@router.get("/{job_id}", response_model=Dict[str, Any])
+async def get_job(job_id: str):
+    """Retrieve the status (and result) of a background job."""
+    try:
+        return await jobs.find(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job not found")
@@ -1,17 +1,146 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form, status, Request
-from fastapi.responses import FileResponse, StreamingResponse
-from typing import List, Optional
+from fastapi.responses import FileResponse, RedirectResponse, Response
+from starlette.concurrency import run_in_threadpool
+from typing import Any, Dict, List, Optional, Tuple
 from pathlib import Path
-import shutil
-import os
-from datetime import datetime
+from urllib.parse import quote
+import asyncio
 import mimetypes
+from datetime import datetime
 
+from app.middleware import TimedRoute
 from app.models import Note
 from app.config import settings
+from app.services.compression import accepted_encodings, is_compressible, variant_name
+from app.services.faststart import needs_faststart
+from app.services.file_cache import FileInfo, file_cache
+from app.services.hot_cache import hot_cache
+from app.services.metrics import metrics
+from app.services.file_serving import (
+    RangeFileResponse,
+    RangeNotSatisfiable,
+    cache_headers,
+    if_range_matches,
+    is_not_modified,
+    offload_response,
+    parse_range_header,
+)
+from app.services.pdf_pages import extract_page, page_cache
+from app.services.previews import PREVIEW_EXTENSIONS, make_preview, previews
+from app.services.deletions import deletions
+from app.services.processing import schedule_pages, schedule_uploads
+from app.services.storage import storage
+from app.services.tiering import cold_tier
+from app.services.timing import stage
+from app.services.uploads import disk_path
 from notes import queries as qry
 
-router = APIRouter(prefix="/api/notes", tags=["notes"])
+router = APIRouter(prefix="/api/notes", tags=["notes"], route_class=TimedRoute)
+
+DERIVED_CACHE_CONTROL = "public, max-age=31536000, immutable"  # Source names are timestamped
+
+
+def _collect_uploads(
+    file: Optional[UploadFile], files: Optional[List[UploadFile]]
+) -> List[UploadFile]:
+    """Merge the single `file` field and the `files` list, skipping empty fields."""
+    uploads = [file] if file else []
+    uploads.extend(f for f in (files or []) if f and f.filename)
+    return uploads
+
+
+def _normalize_path(file_path: Path) -> str:
+    """Normalize path for frontend: store 'uploads/filename' instead of '../uploads/filename'."""
+    file_path_str = str(file_path)
+    if file_path_str.startswith('../'):
+        file_path_str = file_path_str[3:]  # Remove '../'
+    return file_path_str
+
+
+def content_disposition(filename: str) -> str:
+    """Attachment Content-Disposition header, RFC 5987-encoded for non-ASCII names."""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+async def remove_uploads(file_paths: List[str]):
+    """Best-effort removal of files saved for a request that then failed."""
+    for file_path_str in file_paths:
+        try:
+            await storage.delete(file_path_str)
+        except Exception as e:
+            print(f"Warning: Could not delete file {file_path_str}: {e}")
+
+
+async def save_uploads(uploads: List[UploadFile]) -> List[Dict[str, Any]]:
+    """
+    Validate and save uploaded files concurrently through the storage backend,
+    at most settings.upload_concurrency at a time.
+    Returns attachment records (path, name, size, MIME type, SHA-256 and upload
+    time, measured while the bytes stream to storage) in upload order.
+    """
+    if not uploads:
+        return []
+
+    # Validate every extension before writing anything
+    for upload in uploads:
+        file_ext = Path(upload.filename).suffix.lower()
+        if file_ext not in settings.allowed_extensions:
+            raise HTTPException(
+                status_code=400,
+                detail=f"File type {file_ext} not allowed.",
+            )
+
+    # Create uploads directory if it doesn't exist
+    upload_dir = Path(settings.upload_dir)
+    await run_in_threadpool(upload_dir.mkdir, parents=True, exist_ok=True)
+
+    # Generate unique filenames with timestamp (disambiguate repeats within a batch)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    targets = []
+    taken = set()
+    for index, upload in enumerate(uploads):
+        filename = f"{timestamp}_{upload.filename}"
+        if filename in taken:
+            filename = f"{timestamp}_{index}_{upload.filename}"
+        taken.add(filename)
+        targets.append(upload_dir / filename)
+
+    semaphore = asyncio.Semaphore(max(1, settings.upload_concurrency))
+
+    file_paths = [_normalize_path(target) for target in targets]
+    uploaded_at = datetime.utcnow()
+
+    async def write(upload: UploadFile, file_path: str) -> Dict[str, Any]:
+        async with semaphore:
+            with stage("disk.save"):
+                written = await storage.save(file_path, upload.file)
+        metrics.upload_bytes.inc(amount=written[qry.SIZE])
+        return {
+            qry.PATH: file_path,
+            qry.NAME: upload.filename,
+            qry.SIZE: written[qry.SIZE],
+            qry.MIME_TYPE: mimetypes.guess_type(upload.filename)[0] or upload.content_type,
+            qry.SHA256: written[qry.SHA256],
+            qry.UPLOADED_AT: uploaded_at,
+        }
+
+    results = await asyncio.gather(
+        *(write(upload, file_path) for upload, file_path in zip(uploads, file_paths)),
+        return_exceptions=True,
+    )
+
+    for file_path in file_paths:
+        file_cache.invalidate(file_path)
+
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors:
+        await remove_uploads(file_paths)
+        raise HTTPException(status_code=500, detail=f"Failed to save file: {str(errors[0])}")
+
+    return results
 
 
 @router.get("/", response_model=List[Note])
@@ -39,41 +168,13 @@ async def create_note(
     content: str = Form(''),  # Allow empty content
     page_number: Optional[int] = Form(None),
     file: Optional[UploadFile] = File(None),
+    files: Optional[List[UploadFile]] = File(None),
 ):
-    """Create a new note with optional file upload."""
+    """Create a new note with optional file uploads (single `file` and/or `files`)."""
 
-    # Handle file upload if provided
-    file_path = None
-    if file:
-        # Validate file extension
-        file_ext = Path(file.filename).suffix.lower()
-        if file_ext not in settings.allowed_extensions:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File type {file_ext} not allowed.",
-            )
-
-        # Create uploads directory if it doesn't exist
-        upload_dir = Path(settings.upload_dir)
-        upload_dir.mkdir(parents=True, exist_ok=True)
-
-        # Generate unique filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp}_{file.filename}"
-        file_path = upload_dir / filename
-
-        # Save file
-        try:
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            # Normalize path for frontend: remove '../' prefix if present
-            # Store as 'uploads/filename' instead of '../uploads/filename'
-            file_path_str = str(file_path)
-            if file_path_str.startswith('../'):
-                file_path_str = file_path_str[3:]  # Remove '../'
-            file_path = file_path_str
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
+    # Handle file uploads if provided
+    attachments = await save_uploads(_collect_uploads(file, files))
+    file_paths = [record[qry.PATH] for record in attachments]
 
     # Create note using queries module
     try:
@@ -81,14 +182,19 @@ async def create_note(
             qry.TITLE: title,
             qry.CONTENT: content,
             qry.PAGE_NUMBER: page_number,
-            qry.FILE_PATH: file_path
+            qry.FILE_PATH: file_paths[-1] if file_paths else None,
+            qry.FILES: attachments,
         }
         note_id = await qry.create(note_data)
         note = await qry.get(note_id)
-        return Note(**note)
     except ValueError as e:
+        await remove_uploads(file_paths)
         raise HTTPException(status_code=400, detail=str(e))
 
+    # Derive metadata in the background; the response doesn't wait for it
+    schedule_uploads(note_id, file_paths, page_number)
+    return Note(**note)
+
 
 @router.put("/{note_id}", response_model=Note)
 async def update_note(note_id: str, note_update: dict):
@@ -98,6 +204,8 @@ async def update_note(note_id: str, note_update: dict):
         update_data = {k: v for k, v in note_update.items() if v is not None}
         await qry.update(note_id, update_data)
         note = await qry.get(note_id)
+        if qry.PAGE_NUMBER in update_data:
+            schedule_pages(note_id, note[qry.FILES], note.get(qry.PAGE_NUMBER))
         return Note(**note)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -108,60 +216,33 @@ async def update_note(note_id: str, note_update: dict):
 @router.post("/{note_id}/file", response_model=Note)
 async def add_file_to_note(
     note_id: str,
-    file: UploadFile = File(...)
+    file: Optional[UploadFile] = File(None),
+    files: Optional[List[UploadFile]] = File(None),
 ):
-    """Add a file to an existing note (appends to files array)."""
-    try:
-        # Get the existing note
-        note = await qry.get(note_id)
+    """Add one or more files to an existing note (appends to files array)."""
+    if not qry.is_valid_id(note_id):
+        raise HTTPException(status_code=400, detail=f"Invalid ID: {note_id}")
 
-        # Validate file extension
-        file_ext = Path(file.filename).suffix.lower()
-        if file_ext not in settings.allowed_extensions:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File type {file_ext} not allowed.",
-            )
-
-        # Create uploads directory if it doesn't exist
-        upload_dir = Path(settings.upload_dir)
-        upload_dir.mkdir(parents=True, exist_ok=True)
+    uploads = _collect_uploads(file, files)
+    if not uploads:
+        raise HTTPException(status_code=400, detail="At least one file is required")
 
-        # Generate unique filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp}_{file.filename}"
-        file_path = upload_dir / filename
-
-        # Save file
-        try:
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            # Normalize path for frontend: remove '../' prefix if present
-            file_path_str = str(file_path)
-            if file_path_str.startswith('../'):
-                file_path_str = file_path_str[3:]  # Remove '../'
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
-
-        # Get existing files array and append new file
-        existing_files = note.get(qry.FILES, [])
-        if not existing_files:
-            existing_files = []
-        existing_files.append(file_path_str)
-
-        # Update note with new files array (and keep file_path for backward compatibility)
-        await qry.update(note_id, {
-            qry.FILE_PATH: file_path_str,  # Keep last uploaded file for backward compatibility
-            qry.FILES: existing_files
-        })
-        updated_note = await qry.get(note_id)
-        return Note(**updated_note)
+    attachments = await save_uploads(uploads)
+    file_paths = [record[qry.PATH] for record in attachments]
 
+    # Append all new files with one atomic update (file_path keeps the last one)
+    try:
+        updated_note = await qry.add_files(note_id, attachments)
     except ValueError as e:
+        await remove_uploads(file_paths)
         raise HTTPException(status_code=400, detail=str(e))
     except KeyError:
+        await remove_uploads(file_paths)
         raise HTTPException(status_code=404, detail="Note not found")
 
+    schedule_uploads(note_id, file_paths, updated_note.get(qry.PAGE_NUMBER))
+    return Note(**updated_note)
+
 
 @router.delete("/{note_id}/file", response_model=Note)
 async def delete_file_from_note(note_id: str, file_data: dict):
@@ -174,35 +255,15 @@ async def delete_file_from_note(note_id: str, file_data: dict):
         if not file_path_to_delete:
             raise HTTPException(status_code=400, detail="file_path is required")
 
-        # Get existing files
-        existing_files = note.get(qry.FILES, [])
-
         # Check if file exists in the note's files array
-        if file_path_to_delete not in existing_files:
+        if file_path_to_delete not in note.get(qry.FILES, []):
             raise HTTPException(status_code=404, detail="File not found in this note")
 
-        # Remove the file from the array
-        updated_files = [f for f in existing_files if f != file_path_to_delete]
-
-        # Delete the physical file
-        file_path = Path(file_path_to_delete)
-        if file_path.exists():
-            try:
-                os.remove(file_path)
-            except Exception as e:
-                print(f"Warning: Could not delete file {file_path}: {e}")
-
-        # Update the note with the new files array
-        update_data = {qry.FILES: updated_files}
+        # Drop the attachment record (file_path falls back to the last remaining file)
+        updated_note = await qry.remove_file(note_id, file_path_to_delete)
 
-        # Update file_path for backward compatibility (set to last file or None)
-        if updated_files:
-            update_data[qry.FILE_PATH] = updated_files[-1]
-        else:
-            update_data[qry.FILE_PATH] = None
-
-        await qry.update(note_id, update_data)
-        updated_note = await qry.get(note_id)
+        # The file itself is removed in the background once the note no longer lists it
+        await deletions.enqueue([file_path_to_delete], note_id)
         return Note(**updated_note)
 
     except ValueError as e:
@@ -218,19 +279,9 @@ async def delete_note(note_id: str):
         # Get note first to check for files
         note = await qry.get(note_id)
 
-        # Delete all associated files
-        files_to_delete = note.get(qry.FILES, [])
-        if files_to_delete:
-            for file_path_str in files_to_delete:
-                file_path = Path(file_path_str)
-                if file_path.exists():
-                    try:
-                        os.remove(file_path)
-                    except Exception as e:
-                        print(f"Warning: Could not delete file {file_path}: {e}")
-
-        # Delete the note
+        # Delete the note, then queue its files for background removal
         await qry.delete(note_id)
+        await deletions.enqueue(note.get(qry.FILES, []), note_id)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except KeyError:
@@ -238,7 +289,7 @@ async def delete_note(note_id: str):
 
 
 @router.get("/{note_id}/file")
-async def get_note_file(note_id: str):
+async def get_note_file(note_id: str, request: Request):
     """Download or view the file associated with a note."""
     try:
         note = await qry.get(note_id)
@@ -246,13 +297,42 @@ async def get_note_file(note_id: str):
         if not note.get(qry.FILE_PATH):
             raise HTTPException(status_code=404, detail="File not found")
 
-        file_path = Path(note[qry.FILE_PATH])
-        if not file_path.exists():
+        file_path = disk_path(note[qry.FILE_PATH])
+
+        # Object storage: the browser downloads straight from the bucket
+        url = await storage.url_for(note[qry.FILE_PATH], download_name=file_path.name)
+        if url is not None:
+            return RedirectResponse(url, status_code=307)
+
+        try:
+            if not await run_in_threadpool(file_path.is_file):
+                await cold_tier.recall(note[qry.FILE_PATH])
+            stat_result = await run_in_threadpool(file_path.stat)
+        except OSError:
             raise HTTPException(status_code=404, detail="File does not exist on server")
+        cold_tier.record_access(note[qry.FILE_PATH])
+        final = not await run_in_threadpool(needs_faststart, file_path)
+
+        headers = {
+            "Content-Disposition": content_disposition(file_path.name),
+            **cache_headers(file_path.name, stat_result, final=final),
+        }
 
-        return FileResponse(
-            path=file_path,
-            filename=file_path.name,
+        offloaded = offload_response(
+            await run_in_threadpool(file_path.resolve),
+            {key: headers[key] for key in ("Content-Disposition", "Cache-Control")},
+            "application/octet-stream",
+        )
+        if offloaded is not None:
+            return offloaded
+
+        if is_not_modified(request.headers, stat_result):
+            return Response(status_code=304, headers=headers)
+
+        return RangeFileResponse(
+            file_path,
+            stat_result.st_size,
+            headers=headers,
             media_type="application/octet-stream",
         )
     except ValueError as e:
@@ -261,97 +341,229 @@ async def get_note_file(note_id: str):
         raise HTTPException(status_code=404, detail="Note not found")
 
 
-@router.get("/serve/{file_path:path}")
+@router.get("/{note_id}/page/{page_number}")
+async def get_note_page(note_id: str, page_number: int, file: Optional[str] = None):
+    """
+    Return a single page of a note's PDF as a standalone PDF.
+    Uses the note's main PDF unless `file` names another of its attachments.
+    Pages are cached on disk; the page a note links to is precomputed at upload.
+    """
+    if page_number < 1:
+        raise HTTPException(status_code=400, detail="page_number must be >= 1")
+
+    try:
+        note = await qry.get(note_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Note not found")
+
+    pdfs = [f for f in note.get(qry.FILES, []) if Path(f).suffix.lower() == '.pdf']
+    if file is not None:
+        if file not in pdfs:
+            raise HTTPException(status_code=404, detail="PDF not found in this note")
+        source = file
+    elif note.get(qry.FILE_PATH) in pdfs:
+        source = note[qry.FILE_PATH]
+    elif pdfs:
+        source = pdfs[0]
+    else:
+        raise HTTPException(status_code=404, detail="Note has no PDF attached")
+
+    key = (source, page_number)
+    page_path = page_cache.get(key)
+    if page_path is None:
+        page_path = page_cache.path_for(key)
+        try:
+            async with storage.local_copy(source) as source_path:
+                await run_in_threadpool(
+                    extract_page, str(source_path), str(page_path), page_number
+                )
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="File does not exist on server")
+        except IndexError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=422, detail=f"Could not extract page: {str(e)}")
+        page_cache.add(key)
+
+    return FileResponse(
+        path=page_path,
+        media_type="application/pdf",
+        headers={"Cache-Control": DERIVED_CACHE_CONTROL},
+    )
+
+
+@router.get("/serve/preview/{file_path:path}")
+async def serve_preview(file_path: str):
+    """
+    Serve a small WebP preview of an image or the first page of a PDF.
+    Previews are generated at upload time and regenerated on demand if evicted.
+    """
+    if Path(file_path).suffix.lower() not in PREVIEW_EXTENSIONS:
+        raise HTTPException(status_code=404, detail="Preview not available")
+
+    preview_path = previews.get(file_path)
+    if preview_path is None:
+        preview_path = previews.path_for(file_path)
+        try:
+            async with storage.local_copy(file_path) as source_path:
+                result = await run_in_threadpool(
+                    make_preview, str(source_path), str(preview_path), settings.preview_size
+                )
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="File not found")
+        except Exception as e:
+            print(f"Warning: Could not generate preview for {file_path}: {e}")
+            result = {"preview": False}
+        if not result["preview"]:
+            raise HTTPException(status_code=404, detail="Preview not available")
+        previews.add(file_path)
+
+    return FileResponse(
+        path=preview_path,
+        media_type="image/webp",
+        headers={"Cache-Control": DERIVED_CACHE_CONTROL},
+    )
+
+
+async def lookup_file(file_path: str) -> FileInfo:
+    """file_cache.lookup(), recalling the file from the cold tier if it was archived."""
+    try:
+        return await file_cache.lookup(file_path)
+    except FileNotFoundError:
+        if not await cold_tier.recall(file_path):
+            raise
+    return await file_cache.lookup(file_path)
+
+
+async def pick_variant(
+    file_path: str, info: FileInfo, accept_encoding: str
+) -> Optional[Tuple[str, FileInfo]]:
+    """
+    The best pre-compressed variant of a file that the client accepts, as
+    (encoding, variant info); None means send the file as stored.
+    """
+    for encoding in accepted_encodings(accept_encoding):
+        try:
+            variant = await file_cache.lookup_variant(variant_name(file_path, encoding), info)
+        except (OSError, ValueError):
+            continue
+        if variant is None:
+            continue
+        # A variant older than its original is stale; never serve it
+        if variant.stat_result.st_mtime_ns >= info.stat_result.st_mtime_ns:
+            return encoding, variant
+    return None
+
+
+@router.api_route("/serve/{file_path:path}", methods=["GET", "HEAD"])
 async def serve_file_with_range(file_path: str, request: Request):
     """
     Serve files with HTTP Range request support for video seeking.
-    This endpoint handles partial content requests (206) for video playback.
+    Implements RFC 7233 byte ranges: single, suffix (bytes=-N) and multiple
+    ranges (multipart/byteranges), If-Range validation and HEAD requests.
+    Responses carry ETag/Last-Modified/Cache-Control and honour conditional requests.
+    Path lookups are cached, small hot files are answered from memory, and other
+    bytes are sent with sendfile when the server supports zero-copy sends, or
+    left to the fronting proxy in offload mode (settings.file_offload).
+    Without a Range header, compressible files are sent as their pre-compressed
+    br/gzip variant when Accept-Encoding allows. With object storage, requests
+    are redirected to a presigned URL instead. Archived files are recalled from
+    the cold tier first.
     """
-    # Construct full path from uploads directory
-    full_path = Path(settings.upload_dir) / file_path
+    # Object storage: the browser fetches the bytes (and ranges) from the bucket
+    url = await storage.url_for(file_path)
+    if url is not None:
+        return RedirectResponse(url, status_code=307)
 
-    # Security check: ensure the path is within uploads directory
+    # Resolve, security-check (must stay within uploads) and stat, cached per path
     try:
-        full_path = full_path.resolve()
-        upload_dir_resolved = Path(settings.upload_dir).resolve()
-        if not str(full_path).startswith(str(upload_dir_resolved)):
-            raise HTTPException(status_code=403, detail="Access denied")
-    except Exception:
-        raise HTTPException(status_code=403, detail="Invalid file path")
-
-    # Check if file exists
-    if not full_path.exists() or not full_path.is_file():
+        with stage("disk.stat"):
+            info = await lookup_file(file_path)
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="Access denied")
+    except (OSError, ValueError):
         raise HTTPException(status_code=404, detail="File not found")
+    cold_tier.record_access(file_path)
 
-    # Get file size
-    file_size = full_path.stat().st_size
+    full_path = info.path
+    stat_result = info.stat_result
+    file_size = stat_result.st_size
+    mime_type = info.mime_type
 
-    # Determine MIME type
-    mime_type, _ = mimetypes.guess_type(str(full_path))
-    if mime_type is None:
-        mime_type = "application/octet-stream"
+    headers = {
+        "Accept-Ranges": "bytes",
+        **cache_headers(full_path.name, stat_result, final=info.final),
+    }
 
-    # Check for Range header
-    range_header = request.headers.get("range")
+    # Offload mode: the proxy streams the bytes (and handles ranges/validators)
+    offloaded = offload_response(
+        full_path, {"Cache-Control": headers["Cache-Control"]}, mime_type
+    )
+    if offloaded is not None:
+        return offloaded
+
+    # Whole-file requests for compressible types may get a pre-compressed variant
+    variant = None
+    if is_compressible(mime_type):
+        headers["Vary"] = "Accept-Encoding"
+        if "range" not in request.headers:
+            accept_encoding = request.headers.get("accept-encoding", "")
+            variant = await pick_variant(file_path, info, accept_encoding)
+    if variant is not None:
+        encoding, variant_info = variant
+        headers.update(cache_headers(full_path.name, stat_result, encoding))
+        headers["Content-Encoding"] = encoding
+        if is_not_modified(request.headers, stat_result, encoding):
+            return Response(status_code=304, headers=headers)
+        buffer = await hot_cache.fetch(variant_info) if request.method == "GET" else None
+        return RangeFileResponse(
+            variant_info.path,
+            variant_info.stat_result.st_size,
+            headers=headers,
+            media_type=mime_type,
+            buffer=buffer,
+        )
+
+    # Conditional GET/HEAD: the client's cached copy is still current
+    if is_not_modified(request.headers, stat_result):
+        return Response(status_code=304, headers=headers)
 
-    if range_header:
-        # Parse Range header (format: "bytes=start-end")
+    # Range applies to GET only, and only while If-Range (if sent) still matches
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if (
+        range_header
+        and request.method == "GET"
+        and (if_range is None or if_range_matches(if_range, stat_result))
+    ):
         try:
-            byte_range = range_header.replace("bytes=", "").strip()
-            start, end = byte_range.split("-")
-            start = int(start) if start else 0
-            end = int(end) if end else file_size - 1
-
-            # Ensure valid range
-            if start >= file_size or start < 0:
-                raise HTTPException(status_code=416, detail="Range not satisfiable")
-            if end >= file_size:
-                end = file_size - 1
-
-            chunk_size = end - start + 1
-
-            # Create streaming response for partial content
-            def file_iterator():
-                with open(full_path, "rb") as f:
-                    f.seek(start)
-                    remaining = chunk_size
-                    while remaining > 0:
-                        chunk = f.read(min(8192, remaining))
-                        if not chunk:
-                            break
-                        remaining -= len(chunk)
-                        yield chunk
-
-            headers = {
-                "Content-Range": f"bytes {start}-{end}/{file_size}",
-                "Accept-Ranges": "bytes",
-                "Content-Length": str(chunk_size),
-                "Content-Type": mime_type,
-            }
-
-            return StreamingResponse(
-                file_iterator(),
-                status_code=206,  # Partial Content
-                headers=headers,
-                media_type=mime_type
+            ranges = parse_range_header(range_header, file_size)
+        except RangeNotSatisfiable:
+            raise HTTPException(
+                status_code=416,
+                detail="Range not satisfiable",
+                headers={"Content-Range": f"bytes */{file_size}"},
             )
-        except (ValueError, IndexError):
-            raise HTTPException(status_code=400, detail="Invalid Range header")
 
-    # No Range header - return full file
-    def full_file_iterator():
-        with open(full_path, "rb") as f:
-            while chunk := f.read(8192):
-                yield chunk
+        if ranges is not None:
+            if len(ranges) == 1:
+                start, end = ranges[0]
+                headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
 
-    headers = {
-        "Accept-Ranges": "bytes",
-        "Content-Length": str(file_size),
-        "Content-Type": mime_type,
-    }
+            return RangeFileResponse(
+                full_path,
+                file_size,
+                ranges=ranges,
+                status_code=206,  # Partial Content
+                headers=headers,
+                media_type=mime_type,
+                buffer=await hot_cache.fetch(info),
+            )
 
-    return StreamingResponse(
-        full_file_iterator(),
-        headers=headers,
-        media_type=mime_type
+    # No (usable) Range header - return full file
+    buffer = await hot_cache.fetch(info) if request.method == "GET" else None
+    return RangeFileResponse(
+        full_path, file_size, headers=headers, media_type=mime_type, buffer=buffer
     )
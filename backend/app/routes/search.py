@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Query
+from typing import Any, Dict, List
+
+from app.middleware import TimedRoute
+from app.services import page_index
+
+router = APIRouter(prefix="/api/search", tags=["search"], route_class=TimedRoute)
+
+
+@router.get("/pages", response_model=List[Dict[str, Any]])
+async def search_pages(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """Find pages/slides of uploaded files containing every word of the query."""
+    return await page_index.search(q, limit)
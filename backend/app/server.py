@@ -0,0 +1,68 @@
+"""
+Production server: a gunicorn master forking uvicorn workers.
+The application is imported once in the master (preload_app) so a broken
+import fails before any worker starts. Per-process resources (the Motor
+client, the job process pool, background loops) are created by the
+lifespan, which runs in each worker after the fork. State that requests
+read (page search, job status) lives in MongoDB, and the job pool is split
+across workers (see app.services.maintenance.worker_processes).
+"""
+import os
+from typing import Any, Dict
+
+from gunicorn.app.base import BaseApplication
+from gunicorn.util import import_app
+from uvicorn.workers import UvicornWorker
+
+from app.config import settings
+
+APP_URI = "app.main:app"
+
+
+class ProductionWorker(UvicornWorker):
+    """Uvicorn worker pinned to uvloop and httptools (no silent fallback to asyncio/h11)."""
+
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools", "lifespan": "on"}
+
+
+def worker_count() -> int:
+    """settings.workers, or one worker per CPU core."""
+    return settings.workers or os.cpu_count() or 1
+
+
+def production_options() -> Dict[str, Any]:
+    """Gunicorn settings derived from Settings."""
+    return {
+        "bind": f"{settings.host}:{settings.port}",
+        "workers": worker_count(),
+        "worker_class": f"{__name__}.ProductionWorker",
+        "preload_app": True,
+        "keepalive": settings.keepalive,
+        "backlog": settings.backlog,
+        "timeout": settings.worker_timeout,
+        "graceful_timeout": settings.graceful_timeout,
+        "max_requests": settings.max_requests,
+        "max_requests_jitter": settings.max_requests // 10,
+        "accesslog": "-" if settings.access_log else None,
+    }
+
+
+class ProductionServer(BaseApplication):
+    """Gunicorn application configured from Settings instead of a config file."""
+
+    def __init__(self, options: Dict[str, Any], app_uri: str = APP_URI):
+        self.options = options
+        self.app_uri = app_uri
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return import_app(self.app_uri)
+
+
+def run():
+    """Serve until the master is stopped (SIGTERM drains workers within graceful_timeout)."""
+    ProductionServer(production_options()).run()
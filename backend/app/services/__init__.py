@@ -1,3 +1,17 @@
 from .database import db
+from .deletions import deletions
+from .jobs import jobs
+from .loop_monitor import loop_monitor
+from .maintenance import maintenance_lock
+from .metrics import metrics
+from .orphan_gc import orphan_gc
+from .page_index import page_index
+from .pdf_pages import page_cache
+from .previews import previews
+from .storage import storage
+from .tiering import cold_tier
 
-__all__ = ["db"]
+__all__ = [
+    "cold_tier", "db", "deletions", "jobs", "loop_monitor", "maintenance_lock", "metrics",
+    "orphan_gc", "page_index", "page_cache", "previews", "storage",
+]
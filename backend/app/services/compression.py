@@ -0,0 +1,147 @@
+"""
+Pre-compressed variants of compressible attachments.
+Variants are written once at upload time next to the original (name.br,
+name.gz, the layout nginx's gzip_static/brotli_static expect) and picked by
+Accept-Encoding when serving; nothing is compressed per request. Files are
+compressed in one streaming pass, with brotli's slowest setting reserved for
+small files so a large deck cannot tie up a job-pool worker for minutes.
+"""
+import gzip
+import mimetypes
+import os
+import uuid
+from contextlib import ExitStack
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional
+
+import brotli
+
+from app.services.uploads import disk_path
+
+# Encodings in server preference order, with their file suffixes
+VARIANT_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+COMPRESSIBLE_TYPES = {
+    "image/svg+xml",
+    "image/bmp",
+    "application/json",
+    "application/xml",
+    "application/javascript",
+    "application/msword",  # Legacy binary Office formats compress well
+    "application/vnd.ms-powerpoint",
+}
+MIN_SAVING = 0.1  # Keep a variant only if it is at least 10% smaller
+CHUNK_SIZE = 1024 * 1024
+MAX_QUALITY_SIZE = 1024 * 1024  # Brotli quality 11 only up to this size
+LARGE_FILE_QUALITY = 5  # Near-gzip speed with a better ratio
+
+
+def is_compressible(mime_type: Optional[str]) -> bool:
+    """Whether files of this MIME type get pre-compressed variants."""
+    if not mime_type:
+        return False
+    return mime_type.startswith("text/") or mime_type in COMPRESSIBLE_TYPES
+
+
+def variant_name(file_path: str, encoding: str) -> str:
+    """Path of an encoding's variant, relative like `file_path`."""
+    return file_path + VARIANT_SUFFIXES[encoding]
+
+
+def accepted_encodings(accept_encoding: str) -> List[str]:
+    """
+    Our encodings the client accepts (q > 0), in server preference order.
+    Identity is always acceptable, so it is not listed.
+    """
+    accepted = set()
+    refused = set()
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        (accepted if q > 0 else refused).add(coding.strip())
+    if "*" in accepted:
+        accepted.update(set(VARIANT_SUFFIXES) - refused)
+    return [encoding for encoding in VARIANT_SUFFIXES if encoding in accepted]
+
+
+def brotli_quality(size: int) -> int:
+    """Brotli quality for a file of `size` bytes."""
+    return 11 if size <= MAX_QUALITY_SIZE else LARGE_FILE_QUALITY
+
+
+class _BrotliWriter:
+    """Streaming brotli into a binary file, with GzipFile's write/close interface."""
+
+    def __init__(self, file: BinaryIO, quality: int):
+        self.file = file
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def write(self, data: bytes):
+        self.file.write(self.compressor.process(data))
+
+    def close(self):
+        self.file.write(self.compressor.finish())
+
+
+def compress_variants(source: str) -> Dict[str, int]:
+    """
+    Write every variant that saves at least MIN_SAVING of the file's size,
+    reading the file once in CHUNK_SIZE pieces.
+    Runs in the job queue; returns {encoding: variant size}.
+    """
+    source_path = Path(source)
+    size = source_path.stat().st_size
+    tmp_paths = {
+        encoding: source_path.with_name(f"{source_path.name}{suffix}.{uuid.uuid4().hex}.tmp")
+        for encoding, suffix in VARIANT_SUFFIXES.items()
+    }
+    written = {}
+    try:
+        with ExitStack() as stack:
+            outputs = {
+                encoding: stack.enter_context(open(tmp_path, "wb"))
+                for encoding, tmp_path in tmp_paths.items()
+            }
+            writers = [
+                _BrotliWriter(outputs["br"], brotli_quality(size)),
+                gzip.GzipFile(fileobj=outputs["gzip"], mode="wb", compresslevel=9, mtime=0),
+            ]
+            with open(source_path, "rb") as f:
+                while chunk := f.read(CHUNK_SIZE):
+                    for writer in writers:
+                        writer.write(chunk)
+            for writer in writers:
+                writer.close()
+
+        for encoding, tmp_path in tmp_paths.items():
+            compressed_size = tmp_path.stat().st_size
+            if compressed_size > size * (1 - MIN_SAVING):
+                continue
+            dest = source_path.with_name(source_path.name + VARIANT_SUFFIXES[encoding])
+            os.replace(tmp_path, dest)
+            written[encoding] = compressed_size
+    finally:
+        for tmp_path in tmp_paths.values():
+            tmp_path.unlink(missing_ok=True)
+    return written
+
+
+def remove_variants(stored_path: str) -> List[str]:
+    """Delete an attachment's variants. Returns their relative paths."""
+    if not is_compressible(mimetypes.guess_type(stored_path)[0]):
+        return []
+    removed = []
+    for encoding in VARIANT_SUFFIXES:
+        name = variant_name(stored_path, encoding)
+        try:
+            os.remove(disk_path(name))
+        except FileNotFoundError:
+            continue
+        removed.append(name)
+    return removed
@@ -1,5 +1,7 @@
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from app.config import settings
+from app.services.metrics import metrics
+from app.services.slow_queries import slow_queries
 from typing import Optional
 
 
@@ -10,8 +12,17 @@ class Database:
     database: Optional[AsyncIOMotorDatabase] = None
 
     async def connect(self):
-        """Connect to MongoDB."""
-        self.client = AsyncIOMotorClient(settings.mongo_uri)
+        """
+        Connect to MongoDB. Runs in the lifespan, i.e. in each server worker
+        after the fork, so every worker gets its own client and pool.
+        """
+        self.client = AsyncIOMotorClient(
+            settings.mongo_uri,
+            maxPoolSize=settings.mongo_max_pool_size,
+            # Command latency histograms and the slow query log
+            event_listeners=[metrics.mongo_listener, slow_queries],
+        )
+        slow_queries.attach(self.client)
         self.database = self.client.get_database()
         print("✅ Connected to MongoDB")
 
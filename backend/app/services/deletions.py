@@ -0,0 +1,116 @@
+"""
+Background removal of deleted attachments.
+Delete routes commit the note change, queue the files in notes.deletions
+and return; a pool of workers removes the files and everything derived from
+them, retrying failures with exponential backoff. Queued files survive
+restarts, and leases let another worker pick up a file whose worker died.
+"""
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.services.file_cache import file_cache
+from app.services.processing import discard_derived
+from app.services.storage import storage
+from notes import deletions as del_qry
+
+
+class DeletionQueue:
+    """Worker pool draining the durable deletion queue."""
+
+    def __init__(self):
+        self.workers: List[asyncio.Task] = []
+        self.wake: Optional[asyncio.Event] = None
+        self.deleted = 0
+        self.retried = 0
+        self.given_up = 0
+
+    async def enqueue(self, file_paths: List[str], note_id: Optional[str] = None) -> int:
+        """Queue files for removal and wake the workers. Returns the number queued."""
+        queued = await del_qry.enqueue(file_paths, note_id)
+        for file_path in file_paths:
+            file_cache.invalidate(file_path)
+        if self.wake is not None:
+            self.wake.set()
+        return queued
+
+    @staticmethod
+    def retry_delay(attempts: int) -> float:
+        """Exponential backoff after the given number of failed attempts."""
+        return min(settings.delete_retry_base * 2 ** (attempts - 1), settings.delete_retry_max)
+
+    async def process(self, record: Dict[str, Any]) -> bool:
+        """Remove one queued file and its derived data. Returns False if it will be retried."""
+        file_path = record[del_qry.FILE_PATH]
+        try:
+            await storage.delete(file_path)
+            await discard_derived(file_path)
+        except Exception as e:
+            attempts = record[del_qry.ATTEMPTS]
+            give_up = attempts >= settings.delete_max_attempts
+            await del_qry.retry_later(
+                record[del_qry.ID], self.retry_delay(attempts), str(e), give_up=give_up
+            )
+            if give_up:
+                self.given_up += 1
+                print(f"Warning: Giving up deleting {file_path} after {attempts} attempts: {e}")
+            else:
+                self.retried += 1
+            return False
+
+        await del_qry.complete(record[del_qry.ID])
+        self.deleted += 1
+        return True
+
+    async def _worker(self):
+        while True:
+            try:
+                record = await del_qry.claim(settings.delete_lease)
+            except Exception as e:
+                print(f"Warning: Could not read the deletion queue: {e}")
+                record = None
+
+            if record is None:
+                # Idle: wait for new work, polling for retries that came due
+                try:
+                    await asyncio.wait_for(self.wake.wait(), settings.delete_poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self.wake.clear()
+                continue
+
+            try:
+                await self.process(record)
+            except Exception as e:
+                # The record stays leased and is claimed again once the lease expires
+                print(f"Warning: Could not update the deletion queue: {e}")
+
+    def start(self):
+        """Start settings.delete_workers workers; queued files from before a restart resume."""
+        if self.workers:
+            return
+        self.wake = asyncio.Event()
+        self.workers = [
+            asyncio.create_task(self._worker()) for _ in range(max(1, settings.delete_workers))
+        ]
+
+    async def stop(self):
+        """Stop the workers. Files they had leased are retried once the lease expires."""
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        self.wake = None
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self.workers),
+            "deleted": self.deleted,
+            "retried": self.retried,
+            "given_up": self.given_up,
+            "queue": await del_qry.count_by_status(),
+        }
+
+
+# Global deletion queue instance
+deletions = DeletionQueue()
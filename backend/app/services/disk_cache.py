@@ -0,0 +1,193 @@
+"""Byte-bounded LRU cache of derived files (previews, extracted pages) on disk."""
+import asyncio
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+import anyio
+
+from app.config import settings
+
+
+class DiskCache:
+    """
+    LRU of files in one directory, bounded by a byte budget.
+    The directory and budget are read from the named settings so they can be
+    reconfigured at runtime; subclasses map keys to file names via name_for().
+
+    Server workers share the directory. A file another worker wrote is
+    adopted on its first get(). Only the process started with evict=True
+    (the maintenance lock holder) deletes files to keep the whole directory
+    within the budget; every worker re-reads the directory every
+    settings.disk_cache_sweep_interval seconds.
+    """
+
+    def __init__(self, dir_setting: str, budget_setting: str, suffix: str):
+        self.dir_setting = dir_setting
+        self.budget_setting = budget_setting
+        self.suffix = suffix
+        self.entries: "OrderedDict[str, int]" = OrderedDict()  # name -> size, oldest first
+        self.total_bytes = 0
+        self.evicts = True  # Single process unless start() says otherwise
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def directory(self) -> Path:
+        """Directory that holds the cached files."""
+        return Path(getattr(settings, self.dir_setting))
+
+    @property
+    def budget(self) -> int:
+        """Byte budget for the whole directory."""
+        return getattr(settings, self.budget_setting)
+
+    def name_for(self, key: Any) -> str:
+        """File name for a cache key."""
+        return str(key) + self.suffix
+
+    def path_for(self, key: Any) -> Path:
+        """File location for a cache key."""
+        return self.directory / self.name_for(key)
+
+    def _scan(self) -> List[Tuple[str, int]]:
+        """(name, size) of the cached files on disk, least recently used first."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        found = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(self.suffix):
+                    stat = entry.stat()
+                    found.append((max(stat.st_atime, stat.st_mtime), entry.name, stat.st_size))
+        return [(name, size) for _, name, size in sorted(found)]
+
+    def _merge(self, found: List[Tuple[str, int]]):
+        """
+        Take the directory listing as the set of cached files. Files this process
+        already tracks keep their LRU position; new ones go after them, by age.
+        """
+        sizes = dict(found)
+        entries = OrderedDict(
+            (name, sizes.pop(name)) for name in self.entries if name in sizes
+        )
+        entries.update(sizes)  # Still in the listing's order
+        self.entries = entries
+        self.total_bytes = sum(entries.values())
+
+    def load(self):
+        """Rebuild the LRU order from the directory (least recently used first)."""
+        self.entries.clear()
+        self._merge(self._scan())
+        if self.evicts:
+            self._evict()
+
+    async def sweep(self):
+        """Pick up files other workers wrote or evicted, and enforce the budget if we evict."""
+        self._merge(await anyio.to_thread.run_sync(self._scan))
+        if self.evicts:
+            victims = self._pick_victims()
+            await anyio.to_thread.run_sync(self._delete, victims)
+
+    def get(self, key: Any) -> Optional[Path]:
+        """Return the cached file if present (by any worker), marking it as recently used."""
+        name = self.name_for(key)
+        path = self.directory / name
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            self.total_bytes -= self.entries.pop(name, 0)
+            return None
+        if name not in self.entries:  # Written by another worker
+            self.entries[name] = size
+            self.total_bytes += size
+        self.entries.move_to_end(name)
+        return path
+
+    def add(self, key: Any):
+        """Account for a newly written file and evict if over budget."""
+        name = self.name_for(key)
+        path = self.directory / name
+        if not path.exists():
+            return
+        self.total_bytes -= self.entries.pop(name, 0)
+        self.entries[name] = path.stat().st_size
+        self.total_bytes += self.entries[name]
+        if self.evicts:
+            self._evict()
+
+    async def discard(self, key: Any):
+        """Remove the cached file for a key, if any."""
+        await self._remove([self.name_for(key)])
+
+    async def discard_prefix(self, prefix: str):
+        """Remove every cached file whose name starts with prefix (whichever worker wrote it)."""
+        names = {name for name in self.entries if name.startswith(prefix)}
+        names.update(await anyio.to_thread.run_sync(self._names_on_disk, prefix))
+        await self._remove(list(names))
+
+    def _names_on_disk(self, prefix: str) -> List[str]:
+        """Cached file names in the directory starting with prefix."""
+        try:
+            with os.scandir(self.directory) as it:
+                return [
+                    entry.name for entry in it
+                    if entry.name.startswith(prefix) and entry.name.endswith(self.suffix)
+                ]
+        except FileNotFoundError:
+            return []
+
+    async def _remove(self, names: List[str]):
+        """Forget cached files and delete them in a worker thread."""
+        for name in names:
+            self.total_bytes -= self.entries.pop(name, 0)
+        await anyio.to_thread.run_sync(self._delete, names)
+
+    def _pick_victims(self) -> List[str]:
+        """Forget least recently used files until under the byte budget; returns their names."""
+        victims = []
+        while self.total_bytes > self.budget and self.entries:
+            name, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            victims.append(name)
+        return victims
+
+    def _delete(self, names: List[str]):
+        """Delete cached files from the directory (blocking)."""
+        for name in names:
+            try:
+                os.remove(self.directory / name)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Warning: Could not delete cached file {name}: {e}")
+
+    def _evict(self):
+        """Drop least recently used files until under the byte budget."""
+        self._delete(self._pick_victims())
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(settings.disk_cache_sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Warning: Sweeping {self.directory} failed: {e}")
+
+    async def start(self, evict: bool):
+        """
+        Load the directory and start the periodic sweep. `evict` is True in exactly
+        one server process, which keeps the directory within the budget.
+        """
+        self.evicts = evict
+        await self.sweep()
+        if settings.disk_cache_sweep_interval > 0 and self.task is None:
+            self.task = asyncio.create_task(self._sweep_forever())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
@@ -0,0 +1,191 @@
+"""
+MP4 "faststart" rewriting: move the moov atom in front of mdat.
+With moov first, a player can start from the first Range request instead of
+seeking to the end of the file. Pure Python so it can run in the process pool.
+"""
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Tuple, Union
+
+from app.services.media import MP4_EXTENSIONS, iter_atoms
+
+# Atoms whose payload is a list of child atoms on the path to the chunk offset tables
+CONTAINER_ATOMS = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+COPY_BUFFER_SIZE = 1024 * 1024
+MAX_MOOV_SIZE = 256 * 1024 * 1024
+UINT32_MAX = 0xFFFFFFFF
+
+
+class _Overflow(Exception):
+    """A relocated chunk offset no longer fits in a 32-bit stco entry."""
+
+
+def _atoms(data: bytes) -> Iterator[Tuple[bytes, bytes]]:
+    """Iterate (type, payload) over atoms packed in a byte string."""
+    offset = 0
+    while offset + 8 <= len(data):
+        size, atom_type = struct.unpack_from(">I4s", data, offset)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = len(data) - offset
+        if size < header_size or offset + size > len(data):
+            raise ValueError(f'Corrupt atom {atom_type!r} at offset {offset}')
+        yield atom_type, data[offset + header_size:offset + size]
+        offset += size
+
+
+def _atom(atom_type: bytes, payload: bytes) -> bytes:
+    """Serialize an atom, using a 64-bit size header only when needed."""
+    size = 8 + len(payload)
+    if size <= UINT32_MAX:
+        return struct.pack(">I4s", size, atom_type) + payload
+    return struct.pack(">I4sQ", 1, atom_type, size + 8) + payload
+
+
+def _offsets(payload: bytes, typecode: str) -> array:
+    """Decode the big-endian offset table of an stco/co64 payload."""
+    count = struct.unpack_from(">I", payload, 4)[0]
+    itemsize = array(typecode).itemsize
+    offsets = array(typecode, payload[8:8 + count * itemsize])
+    if sys.byteorder == "little":
+        offsets.byteswap()
+    return offsets
+
+
+def _offset_table(version_flags: bytes, offsets: array) -> bytes:
+    """Encode an stco/co64 payload."""
+    count = len(offsets)
+    if sys.byteorder == "little":
+        offsets.byteswap()
+    return version_flags + struct.pack(">I", count) + offsets.tobytes()
+
+
+def relocate_moov(moov: bytes, relocate: Callable[[int], int], use_co64: bool = False) -> bytes:
+    """
+    Return the moov payload with every chunk offset passed through relocate().
+    Raises _Overflow if an stco entry overflows and use_co64 is False;
+    with use_co64 every stco table is upgraded to co64.
+    """
+    out = []
+    for atom_type, payload in _atoms(moov):
+        if atom_type in CONTAINER_ATOMS:
+            out.append(_atom(atom_type, relocate_moov(payload, relocate, use_co64)))
+        elif atom_type in (b"stco", b"co64"):
+            typecode = "Q" if atom_type == b"co64" else "I"
+            new_offsets = [relocate(offset) for offset in _offsets(payload, typecode)]
+            if atom_type == b"stco" and not use_co64:
+                if new_offsets and max(new_offsets) > UINT32_MAX:
+                    raise _Overflow()
+                table = _offset_table(payload[:4], array("I", new_offsets))
+                out.append(_atom(b"stco", table))
+            else:
+                table = _offset_table(payload[:4], array("Q", new_offsets))
+                out.append(_atom(b"co64", table))
+        else:
+            out.append(_atom(atom_type, payload))
+    return b"".join(out)
+
+
+def _copy_range(src, dst, start: int, length: int):
+    """Copy length bytes starting at start from src to dst."""
+    src.seek(start)
+    while length > 0:
+        chunk = src.read(min(COPY_BUFFER_SIZE, length))
+        if not chunk:
+            raise ValueError('Unexpected end of file')
+        dst.write(chunk)
+        length -= len(chunk)
+
+
+def _moov_and_mdat(src, file_size: int) -> Tuple[Optional[tuple], Optional[tuple]]:
+    """The first top-level moov and mdat atoms (as iter_atoms() yields them), if any."""
+    atoms = list(iter_atoms(src, 0, file_size))
+    moov = next((a for a in atoms if a[0] == b"moov"), None)
+    mdat = next((a for a in atoms if a[0] == b"mdat"), None)
+    return moov, mdat
+
+
+def needs_faststart(path: Union[str, Path]) -> bool:
+    """
+    Whether faststart() would rewrite the file, i.e. its bytes change once the
+    faststart job runs. Reads only the top-level atom headers.
+    """
+    if Path(path).suffix.lower() not in MP4_EXTENSIONS:
+        return False
+    try:
+        with open(path, "rb") as src:
+            moov, mdat = _moov_and_mdat(src, src.seek(0, 2))
+    except OSError:
+        return False
+    return (
+        moov is not None and mdat is not None
+        and mdat[1] < moov[1] and moov[3] <= MAX_MOOV_SIZE
+    )
+
+
+def faststart(path: str) -> Dict[str, object]:
+    """
+    Rewrite an MP4/QuickTime file in place so moov precedes mdat.
+    Returns {'rewritten': bool, ...}; files that are already faststart are untouched.
+    """
+    file_path = Path(path)
+    if file_path.suffix.lower() not in MP4_EXTENSIONS:
+        return {'rewritten': False, 'reason': 'not an MP4 file'}
+
+    with open(file_path, "rb") as src:
+        file_size = src.seek(0, 2)
+        moov, mdat = _moov_and_mdat(src, file_size)
+        if moov is None or mdat is None:
+            return {'rewritten': False, 'reason': 'missing moov or mdat'}
+
+        _, moov_offset, moov_header, moov_size = moov
+        insert_at = mdat[1]
+        if moov_offset < insert_at:
+            return {'rewritten': False, 'reason': 'already faststart'}
+        if moov_size > MAX_MOOV_SIZE:
+            return {'rewritten': False, 'reason': 'moov atom too large'}
+
+        src.seek(moov_offset + moov_header)
+        payload = src.read(moov_size - moov_header)
+        moov_end = moov_offset + moov_size
+
+        # Chunk offsets between the insertion point and the old moov move forward by the
+        # new moov size; anything after the old moov moves by the size difference.
+        new_size = moov_size
+        use_co64 = False
+        while True:
+            def relocate(offset: int, grow=new_size) -> int:
+                if offset < insert_at:
+                    return offset
+                if offset < moov_offset:
+                    return offset + grow
+                return offset + grow - moov_size
+
+            try:
+                new_moov = _atom(b"moov", relocate_moov(payload, relocate, use_co64))
+            except _Overflow:
+                use_co64 = True
+                continue
+            if len(new_moov) == new_size:
+                break
+            new_size = len(new_moov)
+
+        tmp_path = file_path.with_name(f".{file_path.name}.faststart")
+        try:
+            with open(tmp_path, "wb") as dst:
+                _copy_range(src, dst, 0, insert_at)
+                dst.write(new_moov)
+                _copy_range(src, dst, insert_at, moov_offset - insert_at)
+                _copy_range(src, dst, moov_end, file_size - moov_end)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    return {'rewritten': True, 'moov_size': new_size, 'co64': use_co64}
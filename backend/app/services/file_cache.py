@@ -0,0 +1,156 @@
+"""
+Bounded cache of resolved file metadata for the serve endpoint.
+A video seek fires dozens of Range requests for the same path; each one
+reuses the resolved path, stat result and MIME type instead of re-resolving.
+Misses and revalidations touch the filesystem, so they run in the threadpool.
+"""
+import mimetypes
+import os
+import stat
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.services.faststart import needs_faststart
+from app.services.uploads import disk_path
+
+
+class FileInfo(NamedTuple):
+    """Cached metadata for a served file."""
+
+    path: Path  # Resolved location on disk
+    stat_result: os.stat_result
+    mime_type: str
+    checked_at: float  # time.monotonic() of the last stat
+    final: bool = True  # False while the faststart job will still rewrite the bytes
+
+
+def _version(stat_result: os.stat_result) -> Tuple[int, int]:
+    return stat_result.st_mtime_ns, stat_result.st_size
+
+
+class FileMetaCache:
+    """
+    LRU of requested path -> FileInfo, revalidated by size and mtime.
+    Variants found missing are remembered too, per version of their source.
+    """
+
+    def __init__(self):
+        self.entries: "OrderedDict[str, FileInfo]" = OrderedDict()
+        # Variant path -> (source (mtime_ns, size), time.monotonic() of the check)
+        self.missing: "OrderedDict[str, Tuple[Tuple[int, int], float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def lookup(self, file_path: str) -> FileInfo:
+        """
+        Return metadata for a path relative to the upload directory.
+        Raises PermissionError if it escapes the directory and
+        FileNotFoundError if it isn't a regular file.
+        """
+        now = time.monotonic()
+        info = self.entries.get(file_path)
+
+        if info is not None:
+            if now - info.checked_at < settings.file_meta_ttl:
+                self.hits += 1
+                self.entries.move_to_end(file_path)
+                return info
+            # Cheap revalidation: one stat on the already-resolved path
+            try:
+                stat_result = await run_in_threadpool(os.stat, info.path)
+            except OSError:
+                stat_result = None
+            if stat_result is not None and _version(stat_result) == _version(info.stat_result):
+                self.hits += 1
+                info = info._replace(stat_result=stat_result, checked_at=now)
+                self.entries[file_path] = info
+                self.entries.move_to_end(file_path)
+                return info
+            self.entries.pop(file_path, None)
+
+        self.misses += 1
+        info = await run_in_threadpool(self._load, file_path, now)
+        self.entries[file_path] = info
+        while len(self.entries) > settings.file_meta_cache_size:
+            self.entries.popitem(last=False)
+        return info
+
+    @staticmethod
+    def _load(file_path: str, now: float) -> FileInfo:
+        """Resolve, check and stat a path (the uncached slow path)."""
+        upload_dir = Path(settings.upload_dir).resolve()
+        full_path = (upload_dir / file_path).resolve()
+        if not full_path.is_relative_to(upload_dir):
+            raise PermissionError(f'Path outside upload directory: {file_path}')
+
+        stat_result = os.stat(full_path)  # FileNotFoundError propagates
+        if not stat.S_ISREG(stat_result.st_mode):
+            raise FileNotFoundError(f'Not a file: {file_path}')
+
+        mime_type, _ = mimetypes.guess_type(full_path.name)
+        return FileInfo(
+            full_path, stat_result, mime_type or "application/octet-stream", now,
+            final=not needs_faststart(full_path),
+        )
+
+    async def lookup_variant(self, variant_path: str, source: FileInfo) -> Optional[FileInfo]:
+        """
+        lookup() for a pre-compressed variant of `source`, or None if it doesn't
+        exist. Absence is trusted for settings.file_meta_ttl while the source is
+        unchanged, so files without variants don't cost a stat per encoding.
+        """
+        now = time.monotonic()
+        version = _version(source.stat_result)
+        missing = self.missing.get(variant_path)
+        if (
+            missing is not None
+            and missing[0] == version
+            and now - missing[1] < settings.file_meta_ttl
+        ):
+            self.hits += 1
+            return None
+        try:
+            info = await self.lookup(variant_path)
+        except FileNotFoundError:
+            self.missing[variant_path] = (version, now)
+            self.missing.move_to_end(variant_path)
+            while len(self.missing) > settings.file_meta_cache_size:
+                self.missing.popitem(last=False)
+            return None
+        self.missing.pop(variant_path, None)
+        return info
+
+    def invalidate(self, stored_path: str):
+        """Drop cached entries for a stored attachment path (after upload/delete/rewrite)."""
+        target = disk_path(stored_path).resolve()
+        for key in [key for key, info in self.entries.items() if info.path == target]:
+            del self.entries[key]
+        name = Path(stored_path).name  # Uploads are stored flat, see disk_path()
+        for key in [key for key in self.missing if Path(key).name == name]:
+            del self.missing[key]
+
+    def clear(self):
+        """Drop every cached entry and reset the counters."""
+        self.entries.clear()
+        self.missing.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and size."""
+        return {
+            'entries': len(self.entries),
+            'missing_variants': len(self.missing),
+            'capacity': settings.file_meta_cache_size,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+# Global file metadata cache instance
+file_cache = FileMetaCache()
@@ -0,0 +1,331 @@
+"""
+Responses for serving attachment bytes.
+RangeFileResponse sends one or more byte ranges of a file with the ASGI
+zero-copy extension (sendfile) when the server offers it, and large buffered
+reads otherwise. Bodies go out in chunks paced by the stream scheduler and stop
+as soon as the client disconnects. Range parsing follows RFC 7233.
+"""
+import os
+import re
+import secrets
+from contextlib import asynccontextmanager
+from email.utils import formatdate, parsedate_to_datetime
+from functools import partial
+from pathlib import Path
+from typing import (
+    AsyncIterator, Awaitable, BinaryIO, Callable, Dict, List, Mapping, Optional, Tuple, Union,
+)
+from urllib.parse import quote
+
+import anyio
+from starlette.background import BackgroundTask
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from app.config import settings
+from app.services.metrics import metrics
+from app.services.streams import TokenBucket, streams
+
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+MAX_RANGES = 64  # More ranges than this and the Range header is ignored
+
+_RANGE_SPEC_RE = re.compile(r"^\s*(\d*)\s*-\s*(\d*)\s*$")
+_TIMESTAMPED_NAME_RE = re.compile(r"^\d{8}_\d{6}_")  # Upload names never get reused
+
+ByteRange = Tuple[int, int]  # (first byte, last byte), inclusive
+ChunkSender = Callable[[Send, int, int], Awaitable[bool]]
+
+
+class RangeNotSatisfiable(Exception):
+    """None of the requested ranges overlap the file (HTTP 416)."""
+
+
+def parse_range_header(header: str, file_size: int) -> Optional[List[ByteRange]]:
+    """
+    Parse a Range header into sorted, coalesced byte ranges.
+    Returns None when the header must be ignored (other units, bad syntax,
+    too many ranges); raises RangeNotSatisfiable when nothing overlaps the file.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+
+    specs = [part for part in spec.split(",") if part.strip()]
+    if not specs or len(specs) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for part in specs:
+        match = _RANGE_SPEC_RE.match(part)
+        if not match or match.group(1) == match.group(2) == "":
+            return None
+        first, last = match.groups()
+        if first == "":
+            # Suffix range: the last N bytes
+            suffix = int(last)
+            if suffix > 0 and file_size > 0:
+                ranges.append((max(0, file_size - suffix), file_size - 1))
+            continue
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start < file_size:
+            end = int(last) if last else file_size - 1
+            ranges.append((start, min(end, file_size - 1)))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    # Coalesce overlapping and adjacent ranges
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def file_etag(stat_result: os.stat_result, encoding: str = "") -> str:
+    """Strong ETag derived from size and modification time (and content coding, if any)."""
+    suffix = f"-{encoding}" if encoding else ""
+    return f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}{suffix}"'
+
+
+def file_last_modified(stat_result: os.stat_result) -> str:
+    """Last-Modified HTTP date for a file."""
+    return formatdate(stat_result.st_mtime, usegmt=True)
+
+
+def cache_headers(
+    file_name: str, stat_result: os.stat_result, encoding: str = "", final: bool = True
+) -> Dict[str, str]:
+    """
+    Validators and cache policy for a served file.
+    Timestamped upload names are effectively immutable, so browsers may keep
+    them for settings.attachment_max_age; anything else must be revalidated.
+    So must a file a pending job will still rewrite (final=False: an MP4 before
+    faststart), or browsers would keep the old bytes under the same URL.
+    `encoding` names the pre-compressed variant being sent, which gets its own ETag.
+    """
+    if final and _TIMESTAMPED_NAME_RE.match(file_name):
+        cache_control = f"public, max-age={settings.attachment_max_age}, immutable"
+    else:
+        cache_control = "no-cache"
+    return {
+        "ETag": file_etag(stat_result, encoding),
+        "Last-Modified": file_last_modified(stat_result),
+        "Cache-Control": cache_control,
+    }
+
+
+def is_not_modified(
+    request_headers: Mapping[str, str], stat_result: os.stat_result, encoding: str = ""
+) -> bool:
+    """
+    Evaluate If-None-Match (weak comparison) or, failing that, If-Modified-Since.
+    True means the client's copy is current and a 304 can be sent.
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        etag = file_etag(stat_result, encoding)
+        return any(
+            tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+        )
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(stat_result.st_mtime) <= int(since)
+
+
+def offload_response(
+    full_path: Path, headers: Mapping[str, str], media_type: str
+) -> Optional[Response]:
+    """
+    In offload mode, return an empty response telling the fronting proxy which
+    file to stream (nginx X-Accel-Redirect or Apache/lighttpd X-Sendfile).
+    The proxy then handles Range and conditional requests itself.
+    Returns None when settings.file_offload is off.
+    """
+    if settings.file_offload == "x-accel-redirect":
+        relative = full_path.relative_to(Path(settings.upload_dir).resolve())
+        target = settings.file_offload_prefix.rstrip("/") + "/" + quote(relative.as_posix())
+        header = "X-Accel-Redirect"
+    elif settings.file_offload == "x-sendfile":
+        target = str(full_path)
+        header = "X-Sendfile"
+    else:
+        return None
+    return Response(headers={**headers, header: target}, media_type=media_type)
+
+
+def if_range_matches(if_range: str, stat_result: os.stat_result) -> bool:
+    """Whether an If-Range validator (strong ETag or HTTP date) still matches the file."""
+    if_range = if_range.strip()
+    if if_range.startswith('W/'):
+        return False  # Weak validators never satisfy If-Range
+    if if_range.startswith('"'):
+        return if_range == file_etag(stat_result)
+    try:
+        since = parsedate_to_datetime(if_range).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(stat_result.st_mtime) == int(since)
+
+
+class RangeFileResponse(Response):
+    """
+    Send byte ranges of a file: the whole file by default, a single range as-is,
+    or several ranges as multipart/byteranges. HEAD requests get headers only.
+    If `buffer` holds the file's bytes, ranges are sliced from it instead of read.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        file_size: int,
+        ranges: Optional[List[ByteRange]] = None,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        media_type: Optional[str] = None,
+        background: Optional[BackgroundTask] = None,
+        buffer: Optional[memoryview] = None,
+    ):
+        self.path = path
+        self.buffer = buffer
+        self.status_code = status_code
+        self.background = background
+        headers = dict(headers or {})
+
+        if ranges is None:
+            ranges = [(0, file_size - 1)] if file_size > 0 else []
+
+        if len(ranges) > 1:
+            # Each part is preceded by its own boundary and headers
+            boundary = secrets.token_hex(16)
+            self.parts = [
+                (
+                    f"\r\n--{boundary}\r\n"
+                    f"Content-Type: {media_type}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{file_size}\r\n\r\n".encode("latin-1"),
+                    start,
+                    end - start + 1,
+                )
+                for start, end in ranges
+            ]
+            self.trailer = f"\r\n--{boundary}--\r\n".encode("latin-1")
+            self.media_type = f"multipart/byteranges; boundary={boundary}"
+        else:
+            self.parts = [(b"", start, end - start + 1) for start, end in ranges]
+            self.trailer = b""
+            self.media_type = media_type
+
+        content_length = sum(len(head) + length for head, _, length in self.parts)
+        headers["content-length"] = str(content_length + len(self.trailer))
+        self.init_headers(headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope.get("method") == "HEAD" or not self.parts:
+            await self._send_start(send)
+            await send({"type": "http.response.body", "body": self.trailer, "more_body": False})
+        else:
+            client = (scope.get("client") or ("", 0))[0]
+            async with streams.stream(client) as bucket:
+                await self._send_start(send)
+                await self._send_parts(scope, client, Request(scope, receive), send, bucket)
+                await send({"type": "http.response.body", "body": self.trailer, "more_body": False})
+
+        if self.background is not None:
+            await self.background()
+
+    async def _send_start(self, send: Send):
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+
+    async def _send_parts(
+        self, scope: Scope, client: str, request: Request, send: Send, bucket: TokenBucket
+    ):
+        """
+        Send every part in chunks of settings.serve_chunk_size, paced by the client's
+        token bucket. Stops early if the client went away or the file shrank.
+        """
+        async with self._chunk_sender(scope, client) as send_chunk:
+            for head, offset, length in self.parts:
+                if head:
+                    await send({"type": "http.response.body", "body": head, "more_body": True})
+                end = offset + length
+                while offset < end:
+                    # Scrubbing aborts requests; stop reading as soon as we notice
+                    if await request.is_disconnected():
+                        return
+                    count = min(settings.serve_chunk_size, end - offset)
+                    await bucket.consume(count)
+                    if not await send_chunk(send, offset, count):
+                        return
+                    metrics.served_bytes.inc(amount=count)
+                    offset += count
+
+    @asynccontextmanager
+    async def _chunk_sender(self, scope: Scope, client: str) -> AsyncIterator[ChunkSender]:
+        """
+        Yield a coroutine sending `count` bytes at `offset` from the best available source.
+        Disk reads take a read slot from the stream scheduler, one chunk at a time.
+        """
+        if self.buffer is not None:
+            yield self._send_buffer_chunk
+        elif ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+            with open(self.path, "rb") as file:
+                yield partial(self._send_zerocopy_chunk, file, client)
+        else:
+            fd = await anyio.to_thread.run_sync(os.open, self.path, os.O_RDONLY)
+            try:
+                yield partial(self._send_read_chunk, fd, client)
+            finally:
+                os.close(fd)
+
+    async def _send_buffer_chunk(self, send: Send, offset: int, count: int) -> bool:
+        """Send a memoryview slice of an in-memory copy of the file."""
+        await send({
+            "type": "http.response.body",
+            "body": self.buffer[offset:offset + count],
+            "more_body": True,
+        })
+        return True
+
+    @staticmethod
+    async def _send_zerocopy_chunk(
+        file: BinaryIO, client: str, send: Send, offset: int, count: int
+    ) -> bool:
+        """Let the server sendfile() the bytes straight from the page cache."""
+        async with streams.read_slot(client):  # The server reads the file during the send
+            await send({
+                "type": ZEROCOPY_EXTENSION,
+                "file": file,
+                "offset": offset,
+                "count": count,
+                "more_body": True,
+            })
+        return True
+
+    @staticmethod
+    async def _send_read_chunk(fd: int, client: str, send: Send, offset: int, count: int) -> bool:
+        """Fallback: a positional read in the threadpool, then the send without the slot."""
+        async with streams.read_slot(client):
+            chunk = await anyio.to_thread.run_sync(os.pread, fd, count, offset)
+        if len(chunk) < count:
+            return False  # File shrank underneath us; end the body
+        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        return True
@@ -0,0 +1,101 @@
+"""
+Byte-budgeted in-memory cache for small, frequently served files.
+Cached files are answered by slicing a memoryview: no open() or read() per request.
+"""
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional
+
+import anyio
+
+from app.config import settings
+from app.services.file_cache import FileInfo
+from app.services.timing import timed
+
+
+class _Entry(NamedTuple):
+    data: bytes
+    mtime_ns: int
+    size: int
+
+
+class HotFileCache:
+    """LRU of resolved path -> file bytes, bounded by settings.hot_cache_bytes."""
+
+    def __init__(self):
+        self.entries: "OrderedDict[Path, _Entry]" = OrderedDict()
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def eligible(info: FileInfo) -> bool:
+        """Whether a file is small enough to be held in memory."""
+        size = info.stat_result.st_size
+        return 0 < size <= settings.hot_file_max_size <= settings.hot_cache_bytes
+
+    def get(self, info: FileInfo) -> Optional[memoryview]:
+        """Return the cached bytes if present and still matching the file's stat."""
+        entry = self.entries.get(info.path)
+        if entry is None:
+            return None
+        if (entry.mtime_ns, entry.size) != (
+            info.stat_result.st_mtime_ns, info.stat_result.st_size
+        ):
+            self.discard(info.path)
+            return None
+        self.entries.move_to_end(info.path)
+        return memoryview(entry.data)
+
+    @timed("disk")
+    async def fetch(self, info: FileInfo) -> Optional[memoryview]:
+        """Return cached bytes for an eligible file, loading it on a miss."""
+        if not self.eligible(info):
+            return None
+
+        view = self.get(info)
+        if view is not None:
+            self.hits += 1
+            return view
+
+        self.misses += 1
+        data = await anyio.to_thread.run_sync(info.path.read_bytes)
+        if len(data) != info.stat_result.st_size:
+            return None  # Changed while reading; serve from disk this time
+
+        self.discard(info.path)
+        self.entries[info.path] = _Entry(data, info.stat_result.st_mtime_ns, len(data))
+        self.resident_bytes += len(data)
+        while self.resident_bytes > settings.hot_cache_bytes and self.entries:
+            _, evicted = self.entries.popitem(last=False)
+            self.resident_bytes -= evicted.size
+        return memoryview(data)
+
+    def discard(self, path: Path):
+        """Drop a file from the cache."""
+        entry = self.entries.pop(path, None)
+        if entry is not None:
+            self.resident_bytes -= entry.size
+
+    def clear(self):
+        """Drop every cached file and reset the counters."""
+        self.entries.clear()
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit rate and memory usage."""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'resident_bytes': self.resident_bytes,
+            'budget_bytes': settings.hot_cache_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Global hot file cache instance
+hot_cache = HotFileCache()
@@ -0,0 +1,191 @@
+"""
+Background job queue for post-upload processing.
+CPU-heavy work runs in a process pool; results are handed back to async callbacks.
+Job records are also written to notes.jobs, so any server worker can report
+on a job another worker ran.
+Jobs on an attachment name it as `source`: the storage backend provides a local
+copy (downloaded from object storage if need be) for as long as the job runs.
+"""
+import asyncio
+import multiprocessing
+import os
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from app.config import settings
+from app.services.maintenance import worker_processes
+from app.services.storage import storage
+from notes import jobs as jobs_qry
+
+# Job statuses
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# Local copy of the running job's source, for on_done callbacks that touch the file
+job_file: ContextVar[Optional[Path]] = ContextVar("job_file", default=None)
+
+
+class JobQueue:
+    """Async job queue dispatching to a ProcessPoolExecutor."""
+
+    def __init__(self):
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers: List[asyncio.Task] = []
+        self.jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.writes: Set[asyncio.Task] = set()  # Queued-job records being stored
+
+    @property
+    def running(self) -> bool:
+        """Whether the queue has been started."""
+        return self.executor is not None
+
+    def start(self, workers: Optional[int] = None):
+        """
+        Start the process pool and the dispatcher tasks. settings.media_workers
+        (default: the CPU count) is per host, shared out among the server workers.
+        """
+        if self.running:
+            return
+        per_host = settings.media_workers or os.cpu_count() or 1
+        workers = workers or max(1, per_host // worker_processes())
+        # spawn avoids forking a process that holds Motor's threads and sockets
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        self.queue = asyncio.Queue()
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(workers)]
+        print(f"⚙️  Job queue started with {workers} workers")
+
+    async def stop(self):
+        """Cancel the dispatchers and shut the process pool down."""
+        if not self.running:
+            return
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, *self.writes, return_exceptions=True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = None
+        self.queue = None
+        self.workers = []
+
+    def submit(
+        self,
+        kind: str,
+        fn: Callable[..., Any],
+        *args,
+        note_id: Optional[str] = None,
+        file_path: Optional[str] = None,
+        on_done: Optional[Callable[[Any], Awaitable[Any]]] = None,
+        source: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Enqueue fn(*args) to run in the process pool.
+        With `source` (a stored attachment path), fn gets the path of a local copy
+        as its first argument: fn(local_path, *args). The copy lasts until on_done returns.
+        on_done is awaited with the result; its return value (if any) becomes the job result.
+        Returns the job ID, or None if the queue is not running.
+        """
+        if not self.running:
+            return None
+
+        job_id = uuid.uuid4().hex
+        self.jobs[job_id] = {
+            'id': job_id,
+            'kind': kind,
+            'note_id': note_id,
+            'file_path': file_path,
+            'status': QUEUED,
+            'result': None,
+            'error': None,
+            'created_at': datetime.utcnow(),
+            'finished_at': None,
+        }
+        while len(self.jobs) > settings.job_history:
+            self.jobs.popitem(last=False)
+
+        # Stored as queued; may land after the dispatcher already saved a later status
+        write = asyncio.ensure_future(self._store(jobs_qry.insert, dict(self.jobs[job_id])))
+        self.writes.add(write)
+        write.add_done_callback(self.writes.discard)
+        self.queue.put_nowait((self.jobs[job_id], fn, args, on_done, source))
+        return job_id
+
+    def get(self, job_id: str) -> Dict[str, Any]:
+        """Return a job record of this worker; raises KeyError if unknown or expired."""
+        if job_id not in self.jobs:
+            raise KeyError(f'Job not found: {job_id}')
+        return self.jobs[job_id]
+
+    async def find(self, job_id: str) -> Dict[str, Any]:
+        """Return a job record from any worker; raises KeyError if unknown or expired."""
+        if job_id in self.jobs:
+            return self.jobs[job_id]
+        return await jobs_qry.get(job_id)
+
+    async def list(self, note_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Return job records of every worker, newest first, optionally for a single note."""
+        return await jobs_qry.get_recent(note_id, settings.job_history)
+
+    @staticmethod
+    async def _store(write: Callable[[Dict[str, Any]], Awaitable[None]], job: Dict[str, Any]):
+        """Write a job record; the job itself goes on if the database is unavailable."""
+        try:
+            await write(job)
+        except Exception as e:
+            print(f"Warning: Could not store job {job['id']}: {e}")
+
+    async def join(self):
+        """Wait until every queued job has finished and its record is stored."""
+        if self.running:
+            await self.queue.join()
+
+    async def _run(self, fn: Callable[..., Any], args: tuple, on_done, source: Optional[str]):
+        """Run one job (on a local copy of its source) and its callback."""
+        if source is not None:
+            async with storage.local_copy(source) as local_path:
+                token = job_file.set(local_path)
+                try:
+                    return await self._run(fn, (str(local_path), *args), on_done, None)
+                finally:
+                    job_file.reset(token)
+
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self.executor, fn, *args)
+        if on_done is not None:
+            summary = await on_done(result)
+            if summary is not None:
+                result = summary
+        return result
+
+    async def _worker(self):
+        """Pull jobs off the queue and run them in the process pool."""
+        while True:
+            job, fn, args, on_done, source = await self.queue.get()
+            job['status'] = RUNNING
+            try:
+                await self._store(jobs_qry.save, job)
+                job['result'] = await self._run(fn, args, on_done, source)
+                job['status'] = DONE
+            except Exception as e:
+                job['error'] = str(e) or type(e).__name__
+                job['status'] = FAILED
+                print(f"Warning: Job {job['kind']} failed for {job['file_path']}: {job['error']}")
+            finally:
+                job['finished_at'] = datetime.utcnow()
+                try:
+                    await self._store(jobs_qry.save, job)
+                finally:
+                    self.queue.task_done()
+
+
+# Global job queue instance
+jobs = JobQueue()
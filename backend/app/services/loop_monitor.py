@@ -0,0 +1,150 @@
+"""
+Event loop stall detector.
+A heartbeat task sleeps settings.loop_monitor_interval seconds at a time
+and measures how late it wakes up. That lag is the time every other ready
+callback also waited. A watchdog thread notices a heartbeat that is overdue
+while the stall is still happening. It snapshots the event loop thread's
+stack from sys._current_frames(), which names the synchronous call that is
+blocking the loop. Stalls longer than settings.loop_stall_ms are kept with
+that stack and counted by blocking location.
+"""
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter, deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+from app.config import settings
+from app.services.metrics import metrics
+
+LAG_WINDOW = 1000  # Recent heartbeats the percentiles are computed over
+STACK_DEPTH = 30  # Innermost frames kept per captured stack
+PERCENTILES = (50, 90, 99)
+
+
+def _frame_location(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of values (0 when empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))  # ceil(len * pct / 100)
+    return ordered[int(rank) - 1]
+
+
+class LoopMonitor:
+    """Heartbeat lag measurement with stack capture of the blocking code."""
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.watchdog: Optional[threading.Thread] = None
+        self.stopping = threading.Event()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread_id: Optional[int] = None
+        self.last_beat = 0.0  # time.monotonic() of the latest heartbeat
+        self.capture: Optional[Dict[str, Any]] = None  # Stack taken during the current stall
+        self.lags: Deque[float] = deque(maxlen=LAG_WINDOW)
+        self.stalls: Deque[Dict[str, Any]] = deque(maxlen=settings.loop_stall_log_size)
+        self.locations: Counter = Counter()
+        self.stall_count = 0
+        self.max_lag = 0.0
+
+    def snapshot_stack(self) -> Dict[str, Any]:
+        """Stack of the event loop thread and the task it is running (called off the loop)."""
+        frame = sys._current_frames().get(self.loop_thread_id)
+        stack = []
+        while frame is not None and len(stack) < STACK_DEPTH:
+            stack.append(_frame_location(frame))
+            frame = frame.f_back
+        task = asyncio.current_task(self.loop)
+        return {
+            "task": task.get_name() if task is not None else None,
+            "stack": stack[::-1],  # Outermost first, like a traceback
+        }
+
+    def _watch(self):
+        poll = max(settings.loop_stall_ms / 4000, 0.001)
+        overdue = settings.loop_monitor_interval + settings.loop_stall_ms / 2000
+        while not self.stopping.wait(poll):
+            beat = self.last_beat
+            if self.capture is None and time.monotonic() - beat > overdue:
+                self.capture = {"beat": beat, **self.snapshot_stack()}
+
+    async def _heartbeat(self):
+        interval = settings.loop_monitor_interval
+        while True:
+            self.last_beat = time.monotonic()
+            expected = self.loop.time() + interval
+            await asyncio.sleep(interval)
+            lag = max(0.0, self.loop.time() - expected)
+            self.record(lag)
+
+    def record(self, lag: float):
+        """Account one heartbeat's lag; keeps the captured stack if it was a stall."""
+        self.lags.append(lag)
+        self.max_lag = max(self.max_lag, lag)
+        metrics.loop_lag.observe(lag)
+        capture, self.capture = self.capture, None
+        if lag * 1000 < settings.loop_stall_ms:
+            return
+        stall = {"lag_ms": round(lag * 1000, 3), "at": time.time(), "task": None, "stack": []}
+        if capture is not None and capture["beat"] == self.last_beat:  # Taken in this stall
+            stall.update(task=capture["task"], stack=capture["stack"])
+        location = stall["stack"][-1] if stall["stack"] else "unknown"
+        self.stall_count += 1
+        self.locations[location] += 1
+        self.stalls.append(stall)
+        print(f"⏳ Event loop blocked for {stall['lag_ms']:.0f} ms in {location}")
+
+    def start(self):
+        """Start the heartbeat and watchdog on the running loop (0 interval disables)."""
+        if settings.loop_monitor_interval <= 0 or self.task is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.stopping.clear()
+        self.task = asyncio.create_task(self._heartbeat())
+        self.watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self.watchdog.start()
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.stopping.set()
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+        self.watchdog.join()
+        self.watchdog = None
+
+    def stats(self) -> Dict[str, Any]:
+        lags_ms = [lag * 1000 for lag in self.lags]
+        return {
+            "interval_ms": settings.loop_monitor_interval * 1000,
+            "stall_threshold_ms": settings.loop_stall_ms,
+            "lag_ms": {
+                **{f"p{pct}": round(percentile(lags_ms, pct), 3) for pct in PERCENTILES},
+                "max": round(self.max_lag * 1000, 3),
+                "samples": len(lags_ms),
+            },
+            "stalls": self.stall_count,
+            "locations": [
+                {"location": location, "count": count}
+                for location, count in self.locations.most_common()
+            ],
+            "recent": list(self.stalls)[::-1],
+        }
+
+
+# Global loop monitor instance
+loop_monitor = LoopMonitor()
@@ -0,0 +1,62 @@
+"""
+Coordination between the server workers on one host.
+worker_processes() tells the per-host job pool how many ways to split.
+Only the process holding an exclusive lock on a file in upload_dir runs
+the tiering and orphan collection passes and evicts from the disk caches.
+The lock is released when that process exits, and the worker gunicorn
+starts in its place takes it over.
+"""
+import os
+from pathlib import Path
+from typing import Optional
+
+from app.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development server only
+    fcntl = None
+
+LOCK_NAME = ".maintenance.lock"  # Dotfiles are skipped by the orphan collector
+
+
+def worker_processes() -> int:
+    """Server processes on this host: settings.workers in production (0 = CPU count), else 1."""
+    if settings.run_mode != "production":
+        return 1
+    return settings.workers or os.cpu_count() or 1
+
+
+class MaintenanceLock:
+    """Non-blocking exclusive lock deciding which worker runs maintenance."""
+
+    def __init__(self):
+        self.fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self.fd is not None or fcntl is None  # Without flock there is one process
+
+    def acquire(self) -> bool:
+        """Try to take the lock. Returns True if this process holds it."""
+        if self.fd is not None or fcntl is None:
+            return True
+        path = Path(settings.upload_dir) / LOCK_NAME
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self.fd = fd
+        return True
+
+    def release(self):
+        if self.fd is not None:
+            os.close(self.fd)  # Closing the descriptor drops the flock
+            self.fd = None
+
+
+# Global maintenance lock instance
+maintenance_lock = MaintenanceLock()
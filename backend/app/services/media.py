@@ -0,0 +1,198 @@
+"""
+Metadata extraction for uploaded files.
+These functions are pure and CPU-bound so they can run in a process pool.
+"""
+import mmap
+import re
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from pypdf import PdfReader
+
+PDF_EXTENSIONS = {".pdf"}
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".svg", ".webp"}
+MP4_EXTENSIONS = {".mp4", ".mov", ".m4v"}
+
+_PAGES_COUNT_RE = re.compile(
+    rb"/Type\s*/Pages\b[^>]*?/Count\s+(\d+)|/Count\s+(\d+)[^>]*?/Type\s*/Pages\b"
+)
+_PAGE_RE = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+
+
+def probe_file(path: str) -> Dict[str, Any]:
+    """Extract size and type-specific metadata (page count, dimensions, duration)."""
+    file_path = Path(path)
+    ext = file_path.suffix.lower()
+    meta: Dict[str, Any] = {"size": file_path.stat().st_size}
+
+    if meta["size"] == 0:
+        return meta
+
+    if ext in PDF_EXTENSIONS:
+        page_count = pdf_page_count(file_path)
+        if page_count is not None:
+            meta["page_count"] = page_count
+    elif ext in IMAGE_EXTENSIONS:
+        dimensions = image_dimensions(file_path)
+        if dimensions is not None:
+            meta["width"], meta["height"] = dimensions
+    elif ext in MP4_EXTENSIONS:
+        duration = mp4_duration(file_path)
+        if duration is not None:
+            meta["duration"] = duration
+
+    return meta
+
+
+# ============================================================================
+# PDF
+# ============================================================================
+
+def _pdf_count(data) -> Optional[int]:
+    """Page count from the largest /Pages /Count, falling back to /Page objects."""
+    counts = [int(a or b) for a, b in _PAGES_COUNT_RE.findall(data)]
+    if counts:
+        return max(counts)
+    pages = len(_PAGE_RE.findall(data))
+    return pages or None
+
+
+def pdf_page_count(path: Path) -> Optional[int]:
+    """Return the number of pages in a PDF, or None if it can't be determined."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        count = _pdf_count(data)
+    if count is not None:
+        return count
+    # The page tree is compressed (object streams, PDF 1.5+): let pypdf resolve it
+    # through the cross-reference table instead of inflating streams ourselves
+    try:
+        return len(PdfReader(str(path)).pages) or None
+    except Exception:  # Damaged files raise all sorts of errors from pypdf
+        return None
+
+
+# ============================================================================
+# Images
+# ============================================================================
+
+def _jpeg_dimensions(f) -> Optional[Tuple[int, int]]:
+    """Walk JPEG markers until a start-of-frame segment."""
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+            continue
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">xHH", f.read(5))
+            return width, height
+        f.seek(length - 2, 1)
+
+
+def _svg_dimensions(head: bytes) -> Optional[Tuple[int, int]]:
+    """Read width/height (or viewBox) from the root <svg> element."""
+    match = re.search(rb"<svg\b[^>]*>", head, re.S)
+    if not match:
+        return None
+    tag = match.group(0)
+    width = re.search(rb'\swidth="([\d.]+)(px)?"', tag)
+    height = re.search(rb'\sheight="([\d.]+)(px)?"', tag)
+    if width and height:
+        return round(float(width.group(1))), round(float(height.group(1)))
+    view_box = re.search(rb'viewBox="[\d.\-]+[\s,]+[\d.\-]+[\s,]+([\d.]+)[\s,]+([\d.]+)"', tag)
+    if view_box:
+        return round(float(view_box.group(1))), round(float(view_box.group(2)))
+    return None
+
+
+def image_dimensions(path: Path) -> Optional[Tuple[int, int]]:
+    """Return (width, height) for common image formats by reading their headers."""
+    with open(path, "rb") as f:
+        head = f.read(64 * 1024)
+
+        if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", head[6:10])
+        if head.startswith(b"BM") and len(head) >= 26:
+            width, height = struct.unpack("<ii", head[18:26])
+            return width, abs(height)
+        if head.startswith(b"\xff\xd8"):
+            return _jpeg_dimensions(f)
+        if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+            chunk = head[12:16]
+            if chunk == b"VP8 " and len(head) >= 30:
+                width, height = struct.unpack("<HH", head[26:30])
+                return width & 0x3FFF, height & 0x3FFF
+            if chunk == b"VP8L" and len(head) >= 25:
+                bits = int.from_bytes(head[21:25], "little")
+                return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if chunk == b"VP8X" and len(head) >= 30:
+                width = int.from_bytes(head[24:27], "little") + 1
+                height = int.from_bytes(head[27:30], "little") + 1
+                return width, height
+            return None
+        if b"<svg" in head:
+            return _svg_dimensions(head)
+
+    return None
+
+
+# ============================================================================
+# MP4 / QuickTime
+# ============================================================================
+
+def iter_atoms(f, start: int, end: int) -> Iterator[Tuple[bytes, int, int, int]]:
+    """
+    Iterate ISO BMFF atoms between two offsets.
+    Yields (type, atom offset, header size, atom size).
+    """
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, atom_type = struct.unpack(">I4s", header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            return
+        yield atom_type, offset, header_size, size
+        offset += size
+
+
+def mp4_duration(path: Path) -> Optional[float]:
+    """Return the movie duration in seconds from the moov/mvhd atom."""
+    with open(path, "rb") as f:
+        file_size = f.seek(0, 2)
+        for atom_type, offset, header_size, size in iter_atoms(f, 0, file_size):
+            if atom_type != b"moov":
+                continue
+            moov_end = offset + size
+            for child, child_offset, child_header, _ in iter_atoms(
+                f, offset + header_size, moov_end
+            ):
+                if child != b"mvhd":
+                    continue
+                f.seek(child_offset + child_header)
+                version = f.read(4)[0]
+                if version == 1:
+                    timescale, duration = struct.unpack(">16xIQ", f.read(28))
+                else:
+                    timescale, duration = struct.unpack(">8xII", f.read(16))
+                if not timescale:
+                    return None
+                return round(duration / timescale, 3)
+    return None
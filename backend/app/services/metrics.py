@@ -0,0 +1,316 @@
+"""
+Prometheus-style metrics.
+Counters, gauges and histograms live in this process. Histograms are sharded
+per thread, so observing never takes a lock. The MongoDB command listener
+runs in Motor's worker threads while the event loop observes request
+latencies. A scrape sums the shards. With several server workers, set
+settings.metrics_dir: each worker writes its snapshot there and /metrics
+merges the snapshots of live workers.
+"""
+import asyncio
+import json
+import math
+import os
+import threading
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import anyio
+from pymongo import monitoring
+
+from app.config import settings
+
+# Request latencies from a few ms (cached serves) to uploads of large videos
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+Labels = Tuple[str, ...]
+
+
+class Metric:
+    """A named family of samples keyed by label values."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> List[Tuple[Labels, Any]]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonic total, updated from the event loop."""
+
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> List[Tuple[Labels, Any]]:
+        return list(self.values.items())
+
+
+class Gauge(Counter):
+    """Value that goes up and down, updated from the event loop."""
+
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    """Bucketed observations; each thread writes its own shard."""
+
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(buckets)
+        self.local = threading.local()
+        self.shards: List[Dict[Labels, list]] = []
+
+    def _shard(self) -> Dict[Labels, list]:
+        try:
+            return self.local.shard
+        except AttributeError:
+            shard = self.local.shard = {}
+            self.shards.append(shard)
+            return shard
+
+    def observe(self, value: float, *labels: str):
+        shard = self._shard()
+        state = shard.get(labels)
+        if state is None:
+            # [count per bucket (last is +Inf), sum of observations]
+            state = shard[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def samples(self) -> List[Tuple[Labels, Any]]:
+        """(labels, [bucket counts, sum]) merged across shards."""
+        merged: Dict[Labels, list] = {}
+        for shard in list(self.shards):
+            for labels, (counts, total) in list(shard.items()):
+                into = merged.setdefault(labels, [[0] * len(counts), 0.0])
+                into[0] = [a + b for a, b in zip(into[0], counts)]
+                into[1] += total
+        return list(merged.items())
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def render(snapshot: Dict[str, Dict[str, Any]]) -> str:
+    """Prometheus text exposition format (version 0.0.4) for a snapshot."""
+    lines = []
+    for name, family in snapshot.items():
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        labelnames = family["labels"]
+        for labels, value in family["samples"]:
+            if family["type"] != "histogram":
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip([*family["buckets"], math.inf], counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{name}_bucket{_format_labels(labelnames, labels, le)} {cumulative}"
+                )
+            lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {total!r}")
+            lines.append(f"{name}_count{_format_labels(labelnames, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def merge(snapshots: List[Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """Sum the samples of several workers' snapshots."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for snapshot in snapshots:
+        for name, family in snapshot.items():
+            into = merged.setdefault(name, {**family, "samples": []})
+            values = {tuple(labels): value for labels, value in into["samples"]}
+            for labels, value in family["samples"]:
+                labels = tuple(labels)
+                current = values.get(labels)
+                if current is None:
+                    values[labels] = value
+                elif family["type"] == "histogram":
+                    values[labels] = [[a + b for a, b in zip(current[0], value[0])],
+                                      current[1] + value[1]]
+                else:
+                    values[labels] = current + value
+            into["samples"] = [(list(labels), value) for labels, value in values.items()]
+    return merged
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every MongoDB command by name and collection (runs in Motor's threads)."""
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+        self.collections: Dict[Tuple[Any, int], str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = event.command.get("collection")  # getMore names it separately
+        if isinstance(collection, str):
+            self.collections[(event.connection_id, event.request_id)] = collection
+
+    def _finished(self, event, outcome: str):
+        collection = self.collections.pop((event.connection_id, event.request_id), "")
+        self.histogram.observe(
+            event.duration_micros / 1_000_000, event.command_name, collection, outcome
+        )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finished(event, "ok")
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finished(event, "error")
+
+
+class Metrics:
+    """The application's metrics and their exposition."""
+
+    def __init__(self):
+        self.families: List[Metric] = []
+        self.request_duration = self.add(Histogram(
+            "notka_http_request_duration_seconds",
+            "Time from receiving a request to sending the last body byte.",
+            ("method", "route", "status"),
+        ))
+        self.requests_in_flight = self.add(Gauge(
+            "notka_http_requests_in_flight", "Requests being handled.", ("method", "route"),
+        ))
+        self.upload_bytes = self.add(Counter(
+            "notka_upload_bytes_total", "Attachment bytes written by uploads.",
+        ))
+        self.served_bytes = self.add(Counter(
+            "notka_served_bytes_total", "Attachment bytes sent by the serve endpoint.",
+        ))
+        self.mongo_duration = self.add(Histogram(
+            "notka_mongo_command_duration_seconds",
+            "MongoDB command latency as seen by the driver.",
+            ("command", "collection", "outcome"),
+            buckets=MONGO_BUCKETS,
+        ))
+        self.mongo_listener = MongoCommandListener(self.mongo_duration)
+        self.loop_lag = self.add(Histogram(
+            "notka_event_loop_lag_seconds",
+            "How late the event loop heartbeat woke up (time callbacks waited to run).",
+            buckets=LAG_BUCKETS,
+        ))
+        self.task: Optional[asyncio.Task] = None
+
+    def add(self, metric: Metric) -> Metric:
+        self.families.append(metric)
+        return metric
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """This process's samples in a JSON-friendly form."""
+        return {
+            metric.name: {
+                "type": metric.kind,
+                "help": metric.documentation,
+                "labels": list(metric.labelnames),
+                "buckets": list(getattr(metric, "buckets", ())),
+                "samples": [(list(labels), value) for labels, value in metric.samples()],
+            }
+            for metric in self.families
+        }
+
+    def _snapshot_path(self, pid: int) -> Path:
+        return Path(settings.metrics_dir) / f"{pid}.json"
+
+    def write_snapshot(self):
+        """Publish this worker's samples for the other workers' scrapes (blocking)."""
+        path = self._snapshot_path(os.getpid())
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.snapshot()), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def collect(self) -> Dict[str, Dict[str, Any]]:
+        """Samples to expose: this process's, or every live worker's (blocking)."""
+        if not settings.metrics_dir:
+            return self.snapshot()
+        self.write_snapshot()
+        snapshots = []
+        for path in Path(settings.metrics_dir).glob("*.json"):
+            if not path.stem.isdigit():
+                continue
+            if not _pid_alive(int(path.stem)):
+                path.unlink(missing_ok=True)  # A worker that died without cleaning up
+                continue
+            try:
+                snapshots.append(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                continue  # Replaced or removed while we listed the directory
+        return merge(snapshots)
+
+    async def _publish_forever(self):
+        while True:
+            await asyncio.sleep(settings.metrics_flush_interval)
+            try:
+                await anyio.to_thread.run_sync(self.write_snapshot)
+            except OSError as e:
+                print(f"Warning: Could not publish metrics: {e}")
+
+    def start(self):
+        """Publish snapshots periodically when workers share settings.metrics_dir."""
+        if settings.metrics_dir and self.task is None:
+            self.task = asyncio.create_task(self._publish_forever())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if settings.metrics_dir:
+            self._snapshot_path(os.getpid()).unlink(missing_ok=True)
+
+
+# Global metrics instance
+metrics = Metrics()
@@ -0,0 +1,203 @@
+"""
+Garbage collection of uploads that no note references.
+Failed uploads, crashes between deleting a file and updating its note, and
+test runs leave such files behind. The collector merge-joins two sorted
+streams: referenced names from the notes collection (sorted by MongoDB) and
+the upload directory (walked with os.scandir and sorted in bounded runs on
+disk). Orphans older than a grace period are deleted at a throttled rate.
+"""
+import asyncio
+import heapq
+import json
+import os
+import tempfile
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+import anyio
+
+from app.config import settings
+from app.services.compression import VARIANT_SUFFIXES
+from app.services.file_cache import file_cache
+from notes import queries as qry
+
+RUN_SIZE = 100_000  # Directory entries sorted in memory at once
+MERGE_BATCH = 1000  # Sorted entries pulled from the runs per thread hop
+
+Entry = Tuple[str, str]  # (owning attachment name, file name)
+
+
+def owner_name(name: str) -> str:
+    """The attachment a file belongs to: variants (name.br, name.gz) belong to name."""
+    for suffix in VARIANT_SUFFIXES.values():
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def write_sorted_runs(directory: Path, older_than: float, run_dir: str) -> List[str]:
+    """
+    Walk `directory` with os.scandir and write the regular files modified before
+    `older_than` as sorted runs of at most RUN_SIZE entries. Returns the run files.
+    """
+    runs = []
+    batch: List[Entry] = []
+
+    def flush():
+        batch.sort()
+        fd, run_path = tempfile.mkstemp(dir=run_dir, suffix=".run")
+        with os.fdopen(fd, "w", encoding="utf-8") as run:
+            for entry in batch:
+                run.write(json.dumps(entry) + "\n")
+        runs.append(run_path)
+        batch.clear()
+
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue  # .gitkeep and friends
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                if entry.stat(follow_symlinks=False).st_mtime >= older_than:
+                    continue
+            except OSError:
+                continue  # Removed while we were walking
+            batch.append((owner_name(entry.name), entry.name))
+            if len(batch) >= RUN_SIZE:
+                flush()
+    if batch:
+        flush()
+    return runs
+
+
+def merge_runs(run_paths: List[str]) -> Iterator[Entry]:
+    """Merge sorted run files into one sorted stream."""
+    files = [open(path, encoding="utf-8") for path in run_paths]
+    try:
+        yield from heapq.merge(*(
+            (tuple(json.loads(line)) for line in run) for run in files
+        ))
+    finally:
+        for run in files:
+            run.close()
+
+
+async def _directory_entries(run_paths: List[str]) -> AsyncIterator[Entry]:
+    merged = merge_runs(run_paths)
+    while True:
+        batch = await anyio.to_thread.run_sync(lambda: list(islice(merged, MERGE_BATCH)))
+        if not batch:
+            return
+        for entry in batch:
+            yield entry
+
+
+def remove_if_idle(path: Path, older_than: float) -> int:
+    """Delete a file unless it changed since it was listed. Returns the bytes freed."""
+    try:
+        stat_result = os.stat(path)
+        if stat_result.st_mtime >= older_than:
+            return 0
+        os.remove(path)
+    except FileNotFoundError:
+        return 0
+    return stat_result.st_size
+
+
+class OrphanCollector:
+    """Finds and deletes unreferenced files in settings.upload_dir."""
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.running = False
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    async def run(self, dry_run: bool = False) -> Dict[str, Any]:
+        """
+        One collection pass. With dry_run, orphans are counted but kept.
+        Returns counts and the bytes reclaimed.
+        """
+        if self.running:
+            raise RuntimeError("Orphan collection already running")
+        self.running = True
+        started = time.time()
+        older_than = started - settings.gc_grace_period
+        upload_dir = Path(settings.upload_dir)
+        result = {"scanned": 0, "orphans": 0, "deleted": 0, "bytes_reclaimed": 0,
+                  "dry_run": dry_run}
+
+        try:
+            with tempfile.TemporaryDirectory(prefix="notka-gc-") as run_dir:
+                run_paths = await anyio.to_thread.run_sync(
+                    write_sorted_runs, upload_dir, older_than, run_dir
+                )
+                referenced = qry.referenced_file_names()
+                current = await anext(referenced, None)
+                if current is None:
+                    # No note references anything: more likely the wrong database
+                    # than a directory full of orphans, so only count them
+                    dry_run = result["dry_run"] = True
+
+                async for owner, name in _directory_entries(run_paths):
+                    result["scanned"] += 1
+                    while current is not None and current < owner:
+                        current = await anext(referenced, None)
+                    if current == owner:
+                        continue
+
+                    result["orphans"] += 1
+                    if dry_run:
+                        continue
+                    freed = await anyio.to_thread.run_sync(
+                        remove_if_idle, upload_dir / name, older_than
+                    )
+                    if freed:
+                        file_cache.invalidate(name)
+                        result["deleted"] += 1
+                        result["bytes_reclaimed"] += freed
+                    if settings.gc_delete_rate > 0:
+                        await asyncio.sleep(1 / settings.gc_delete_rate)
+                await referenced.aclose()
+        finally:
+            self.running = False
+
+        self.last_run = {**result, "started_at": started, "duration": time.time() - started}
+        print(
+            f"🧹 Orphan GC: {result['deleted']} of {result['orphans']} orphans removed, "
+            f"{result['bytes_reclaimed']} bytes reclaimed"
+        )
+        return result
+
+    async def _run_forever(self):
+        while True:
+            await asyncio.sleep(settings.gc_interval)
+            try:
+                await self.run()
+            except Exception as e:
+                print(f"Warning: Orphan GC failed: {e}")
+
+    def start(self):
+        """Collect every settings.gc_interval seconds (local storage only; 0 disables)."""
+        if settings.gc_interval <= 0 or settings.storage_backend != "local":
+            return
+        self.task = asyncio.create_task(self._run_forever())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"scheduled": self.task is not None, "running": self.running,
+                "last_run": self.last_run}
+
+
+# Global orphan collector instance
+orphan_gc = OrphanCollector()
@@ -0,0 +1,64 @@
+"""
+Page-level search over the text of uploaded files.
+Page text lives in notes.pages, which every server worker queries, so a file
+indexed by one worker is searchable through all of them straight away.
+"""
+import re
+from typing import Any, Dict, List
+
+from notes import pages as pages_qry
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+SNIPPET_RADIUS = 80
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class PageIndex:
+    """Stores page text in notes.pages and searches it through its text index."""
+
+    async def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Return pages containing every query term, best matches first."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        return [
+            {
+                'file_path': doc[pages_qry.FILE_PATH],
+                'note_id': doc.get(pages_qry.NOTE_ID),
+                'page': doc[pages_qry.PAGE],
+                'snippet': self.snippet(doc[pages_qry.TEXT], terms),
+            }
+            for doc in await pages_qry.search(terms, limit)
+        ]
+
+    @staticmethod
+    def snippet(text: str, terms: List[str]) -> str:
+        """Return the text around the first occurrence of any term."""
+        lowered = text.lower()
+        positions = [pos for pos in (lowered.find(term) for term in terms) if pos >= 0]
+        center = min(positions) if positions else 0
+        start = max(0, center - SNIPPET_RADIUS)
+        end = min(len(text), center + SNIPPET_RADIUS)
+        snippet = ' '.join(text[start:end].split())
+        if start > 0:
+            snippet = '…' + snippet
+        if end < len(text):
+            snippet = snippet + '…'
+        return snippet
+
+    async def index_file(self, note_id: str, file_path: str, pages: List[str]) -> int:
+        """Store the pages of a file for search. Returns the number of pages indexed."""
+        return await pages_qry.replace_file(note_id, file_path, pages)
+
+    async def drop_file(self, file_path: str):
+        """Remove a file's pages from search."""
+        await pages_qry.delete_file(file_path)
+
+
+# Global page index instance
+page_index = PageIndex()
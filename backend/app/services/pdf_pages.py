@@ -0,0 +1,56 @@
+"""
+Single-page extraction from uploaded PDFs.
+"Go to page N" fetches one small standalone PDF instead of the whole deck.
+"""
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from pypdf import PdfReader, PdfWriter
+
+from app.services.disk_cache import DiskCache
+
+PAGE_SUFFIX = ".pdf"
+
+
+def extract_page(source: str, dest: str, page_number: int) -> Dict[str, Any]:
+    """
+    Write page `page_number` (1-based) of a PDF to dest as a standalone PDF.
+    Raises IndexError if the page doesn't exist. Runs in the process pool.
+    """
+    reader = PdfReader(source)
+    page_count = len(reader.pages)
+    if not 1 <= page_number <= page_count:
+        raise IndexError(f'Page {page_number} out of range (1-{page_count})')
+
+    writer = PdfWriter()
+    writer.add_page(reader.pages[page_number - 1])
+
+    dest_path = Path(dest)
+    dest_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = dest_path.with_name(f"{dest_path.name}.{uuid.uuid4().hex}.tmp")
+    with open(tmp_path, "wb") as f:
+        writer.write(f)
+    os.replace(tmp_path, dest_path)
+    return {'page': page_number, 'page_count': page_count, 'size': dest_path.stat().st_size}
+
+
+class PageCache(DiskCache):
+    """Extracted pages keyed by (stored attachment path, page number)."""
+
+    def __init__(self):
+        super().__init__("page_cache_dir", "page_cache_bytes", PAGE_SUFFIX)
+
+    def name_for(self, key: Tuple[str, int]) -> str:
+        """Cache file name for one page of an attachment."""
+        file_path, page_number = key
+        return f"{Path(file_path).name}.p{page_number}{self.suffix}"
+
+    async def discard_file(self, file_path: str):
+        """Remove every cached page of an attachment."""
+        await self.discard_prefix(f"{Path(file_path).name}.p")
+
+
+# Global page cache instance
+page_cache = PageCache()
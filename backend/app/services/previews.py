@@ -0,0 +1,100 @@
+"""
+Downscaled WebP previews for uploaded images and PDFs.
+Previews live in a byte-bounded on-disk cache with LRU eviction.
+"""
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from PIL import Image
+from pypdf import PdfReader
+
+from app.services.disk_cache import DiskCache
+
+RASTER_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp"}
+PREVIEW_EXTENSIONS = RASTER_EXTENSIONS | {".pdf"}
+PREVIEW_SUFFIX = ".webp"
+WEBP_QUALITY = 75
+
+
+def _save_webp(image: Image.Image, dest: Path, max_size: int) -> Dict[str, Any]:
+    """Downscale an image and write it atomically as WebP."""
+    image.thumbnail((max_size, max_size))
+    if image.mode not in ("RGB", "RGBA"):
+        has_alpha = "A" in image.getbands() or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = dest.with_name(f"{dest.name}.{uuid.uuid4().hex}.tmp")
+    image.save(tmp_path, "WEBP", quality=WEBP_QUALITY, method=4)
+    os.replace(tmp_path, dest)
+    return {"width": image.width, "height": image.height, "size": dest.stat().st_size}
+
+
+def _render_pdf_page(source: Path, max_size: int) -> Optional[Image.Image]:
+    """
+    Render the first PDF page with poppler's pdftoppm when installed,
+    otherwise fall back to the largest image embedded in the page.
+    """
+    pdftoppm = shutil.which("pdftoppm")
+    if pdftoppm:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            prefix = os.path.join(tmp_dir, "page")
+            subprocess.run(
+                [pdftoppm, "-png", "-f", "1", "-l", "1", "-singlefile",
+                 "-scale-to", str(max_size), str(source), prefix],
+                check=True, capture_output=True, timeout=60,
+            )
+            with Image.open(prefix + ".png") as image:
+                image.load()
+                return image.copy()
+
+    reader = PdfReader(str(source))
+    if not reader.pages:
+        return None
+    images = list(reader.pages[0].images)
+    if not images:
+        return None
+    largest = max(images, key=lambda img: len(img.data))
+    return Image.open(io.BytesIO(largest.data))
+
+
+def make_preview(source: str, dest: str, max_size: int) -> Dict[str, Any]:
+    """
+    Generate a WebP preview for an image or the first page of a PDF.
+    Runs in the process pool; returns {'preview': bool, ...}.
+    """
+    source_path = Path(source)
+    ext = source_path.suffix.lower()
+
+    if ext in RASTER_EXTENSIONS:
+        with Image.open(source_path) as image:
+            image.seek(0)  # First frame of animated images
+            return {"preview": True, **_save_webp(image.copy(), Path(dest), max_size)}
+
+    if ext == ".pdf":
+        image = _render_pdf_page(source_path, max_size)
+        if image is not None:
+            return {"preview": True, **_save_webp(image, Path(dest), max_size)}
+
+    return {"preview": False}
+
+
+class PreviewCache(DiskCache):
+    """Preview files keyed by stored attachment path."""
+
+    def __init__(self):
+        super().__init__("preview_dir", "preview_cache_bytes", PREVIEW_SUFFIX)
+
+    def name_for(self, file_path: str) -> str:
+        """Preview file name for a stored attachment path."""
+        return Path(file_path).name + self.suffix
+
+
+# Global preview cache instance
+previews = PreviewCache()
@@ -0,0 +1,184 @@
+"""
+Post-upload processing pipeline.
+Routes call schedule_uploads() after saving files; work runs in the job queue.
+"""
+import mimetypes
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.services import compression, faststart, media, text_extract
+from app.services.file_cache import file_cache
+from app.services.jobs import job_file, jobs
+from app.services.page_index import page_index
+from app.services.pdf_pages import extract_page, page_cache
+from app.services.previews import PREVIEW_EXTENSIONS, make_preview, previews
+from app.services.storage import storage
+from app.services.tiering import cold_tier
+from app.services.uploads import file_digest
+from notes import queries as qry
+
+
+def _invalidate_file(note_id: str, file_path: str):
+    """
+    Build the callback that republishes a rewritten file, drops stale serve
+    metadata and refreshes the size and hash on its attachment record.
+    """
+    async def on_done(result: dict):
+        if result.get('rewritten'):
+            local_path = job_file.get()  # The copy the job rewrote
+            await storage.sync(file_path, local_path)
+            file_cache.invalidate(file_path)
+            digest = await run_in_threadpool(file_digest, local_path)
+            await qry.update_attachment(note_id, file_path, digest)
+    return on_done
+
+
+def _add_variants(file_path: str):
+    """Build the callback that lets this worker serve the variants it just wrote."""
+    async def on_done(written: dict):
+        for encoding in written:
+            file_cache.invalidate(compression.variant_name(file_path, encoding))
+    return on_done
+
+
+def _store_file_meta(note_id: str, file_path: str):
+    """Build the callback that merges probe results into the attachment record."""
+    async def on_done(meta: dict):
+        await qry.update_attachment(note_id, file_path, meta)
+    return on_done
+
+
+def _index_pages(note_id: str, file_path: str):
+    """Build the callback that adds extracted page text to the search index."""
+    async def on_done(pages: List[str]):
+        indexed = await page_index.index_file(note_id, file_path, pages)
+        return {'pages': len(pages), 'indexed_pages': indexed}
+    return on_done
+
+
+def _add_preview(file_path: str):
+    """Build the callback that registers a generated preview with the cache."""
+    async def on_done(result: dict):
+        if result.get('preview'):
+            previews.add(file_path)
+    return on_done
+
+
+def _add_page(file_path: str, page_number: int):
+    """Build the callback that registers an extracted page with the page cache."""
+    async def on_done(result: dict):
+        page_cache.add((file_path, page_number))
+    return on_done
+
+
+def schedule_pages(note_id: str, file_paths: Iterable[str], page_number: Optional[int]):
+    """
+    Precompute the page a note links to for each of its PDFs, so
+    "Go to page N" is served from the page cache. Returns the job IDs.
+    """
+    job_ids = []
+    if not page_number:
+        return job_ids
+    for file_path in file_paths:
+        if Path(file_path).suffix.lower() != '.pdf':
+            continue
+        if page_cache.get((file_path, page_number)) is not None:
+            continue
+        job_id = jobs.submit(
+            'page',
+            extract_page,
+            str(page_cache.path_for((file_path, page_number))),
+            page_number,
+            note_id=note_id,
+            file_path=file_path,
+            source=file_path,
+            on_done=_add_page(file_path, page_number),
+        )
+        if job_id:
+            job_ids.append(job_id)
+    return job_ids
+
+
+async def discard_derived(file_path: str):
+    """Drop everything derived from an attachment that is being removed."""
+    file_cache.invalidate(file_path)
+    await page_index.drop_file(file_path)
+    await previews.discard(file_path)
+    await page_cache.discard_file(file_path)
+    for variant in await run_in_threadpool(compression.remove_variants, file_path):
+        file_cache.invalidate(variant)
+    await cold_tier.discard(file_path)
+
+
+def schedule_uploads(
+    note_id: str, file_paths: List[str], page_number: Optional[int] = None
+) -> List[str]:
+    """Enqueue processing jobs for newly saved files. Returns the job IDs."""
+    job_ids = schedule_pages(note_id, file_paths, page_number)
+    for file_path in file_paths:
+        # Move moov in front of mdat so playback starts from the first Range request
+        if Path(file_path).suffix.lower() in media.MP4_EXTENSIONS:
+            job_id = jobs.submit(
+                'faststart',
+                faststart.faststart,
+                note_id=note_id,
+                file_path=file_path,
+                source=file_path,
+                on_done=_invalidate_file(note_id, file_path),
+            )
+            if job_id:
+                job_ids.append(job_id)
+
+        job_id = jobs.submit(
+            'metadata',
+            media.probe_file,
+            note_id=note_id,
+            file_path=file_path,
+            source=file_path,
+            on_done=_store_file_meta(note_id, file_path),
+        )
+        if job_id:
+            job_ids.append(job_id)
+
+        if Path(file_path).suffix.lower() in text_extract.TEXT_EXTENSIONS:
+            job_id = jobs.submit(
+                'text',
+                text_extract.extract_pages,
+                note_id=note_id,
+                file_path=file_path,
+                source=file_path,
+                on_done=_index_pages(note_id, file_path),
+            )
+            if job_id:
+                job_ids.append(job_id)
+
+        if Path(file_path).suffix.lower() in PREVIEW_EXTENSIONS:
+            job_id = jobs.submit(
+                'preview',
+                make_preview,
+                str(previews.path_for(file_path)),
+                settings.preview_size,
+                note_id=note_id,
+                file_path=file_path,
+                source=file_path,
+                on_done=_add_preview(file_path),
+            )
+            if job_id:
+                job_ids.append(job_id)
+
+        # Variants are served from upload_dir; object storage redirects to the original
+        if storage.keeps_files and compression.is_compressible(mimetypes.guess_type(file_path)[0]):
+            job_id = jobs.submit(
+                'compress',
+                compression.compress_variants,
+                note_id=note_id,
+                file_path=file_path,
+                source=file_path,
+                on_done=_add_variants(file_path),
+            )
+            if job_id:
+                job_ids.append(job_id)
+    return job_ids
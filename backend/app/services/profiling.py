@@ -0,0 +1,173 @@
+"""
+On-demand profiling of single requests.
+cProfile can't attribute time to one request on a shared event loop, so
+this samples instead. A thread wakes every settings.profile_interval
+seconds and looks at the request's task. If the task is running, it
+records the event loop thread's stack from the task's coroutine down. If
+the task is suspended, it records the task's await chain ending in an
+[await] frame, so time spent waiting on MongoDB, the threadpool or the
+client shows up too. Profiles are written as collapsed stacks (flamegraph.pl,
+speedscope) to settings.profile_dir, keeping the newest settings.profile_keep.
+"""
+import asyncio
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+
+STACKS_SUFFIX = ".folded"
+META_SUFFIX = ".json"
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    name = f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+    return name.replace(";", ",")  # ';' separates frames in the collapsed format
+
+
+def _await_chain(coro: Any) -> List[FrameType]:
+    """Frames of a suspended coroutine and everything it is awaiting."""
+    frames = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return frames
+
+
+class RequestSampler(threading.Thread):
+    """Samples one request's task until stopped, then writes the profile."""
+
+    def __init__(self, task: asyncio.Task, meta: Dict[str, Any]):
+        super().__init__(name=f"profile-{meta['id']}", daemon=True)
+        self.task = task
+        self.coro = task.get_coro()
+        self.loop_thread_id = threading.get_ident()  # Created on the event loop thread
+        self.meta = meta
+        self.stacks: Counter = Counter()
+        self.done = threading.Event()
+
+    def sample(self) -> Optional[str]:
+        """One collapsed stack (outermost frame first), or None once the task is done."""
+        root = getattr(self.coro, "cr_frame", None)
+        if root is None:
+            return None
+        frame = sys._current_frames().get(self.loop_thread_id)
+        running = []
+        while frame is not None:
+            running.append(frame)
+            if frame is root:
+                # The task is on the CPU: its part of the loop thread's stack
+                return ";".join(_frame_name(f) for f in reversed(running))
+            frame = frame.f_back
+        # Suspended: where it is waiting
+        chain = _await_chain(self.coro)
+        return ";".join([*(_frame_name(f) for f in chain), "[await]"])
+
+    def run(self):
+        while not self.done.wait(settings.profile_interval):
+            stack = self.sample()
+            if stack:
+                self.stacks[stack] += 1
+        self.meta["samples"] = sum(self.stacks.values())
+        try:
+            profiles.save(self.meta, self.stacks)
+        except OSError as e:
+            print(f"Warning: Could not save profile {self.meta['id']}: {e}")
+
+    def stop(self, **meta):
+        """Finish sampling; the thread writes the profile (with `meta` added) and exits."""
+        self.meta.update(meta)
+        self.done.set()
+
+
+class ProfileStore:
+    """Profiles on disk, shared by all workers, with bounded retention."""
+
+    def __init__(self):
+        self.active: Optional[RequestSampler] = None
+
+    @property
+    def directory(self) -> Path:
+        return Path(settings.profile_dir)
+
+    def should_profile(self, header: Optional[str]) -> Optional[str]:
+        """The trigger ("header" or "sample") if this request should be profiled."""
+        if self.active is not None and self.active.is_alive():
+            return None  # One profile at a time per worker keeps the overhead bounded
+        if header and settings.profile_token and secrets.compare_digest(
+            header, settings.profile_token
+        ):
+            return "header"
+        if settings.profile_sample_rate > 0 and (
+            secrets.randbelow(1_000_000) < settings.profile_sample_rate * 1_000_000
+        ):
+            return "sample"
+        return None
+
+    def start(self, trigger: str, method: str, path: str) -> RequestSampler:
+        """Start sampling the current task (call from the request's task)."""
+        meta = {
+            "id": f"{int(time.time() * 1000)}-{secrets.token_hex(4)}",
+            "trigger": trigger,
+            "method": method,
+            "path": path,
+            "pid": os.getpid(),
+            "interval": settings.profile_interval,
+            "started_at": time.time(),
+        }
+        self.active = RequestSampler(asyncio.current_task(), meta)
+        self.active.start()
+        return self.active
+
+    def save(self, meta: Dict[str, Any], stacks: Counter):
+        """Write a profile and drop the oldest beyond settings.profile_keep (blocking)."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        lines = [f"{stack} {count}\n" for stack, count in stacks.most_common()]
+        (self.directory / f"{meta['id']}{STACKS_SUFFIX}").write_text(
+            "".join(lines), encoding="utf-8"
+        )
+        # Metadata last: a profile is listed only once its stacks are complete
+        (self.directory / f"{meta['id']}{META_SUFFIX}").write_text(
+            json.dumps(meta), encoding="utf-8"
+        )
+        self.prune()
+
+    def prune(self):
+        metas = sorted(self.directory.glob(f"*{META_SUFFIX}"), key=lambda p: p.name)
+        for meta_path in metas[:max(0, len(metas) - settings.profile_keep)]:
+            meta_path.unlink(missing_ok=True)
+            meta_path.with_suffix(STACKS_SUFFIX).unlink(missing_ok=True)
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Metadata of stored profiles, newest first (blocking)."""
+        if not self.directory.is_dir():
+            return []
+        profiles_found = []
+        for meta_path in sorted(self.directory.glob(f"*{META_SUFFIX}"), reverse=True):
+            try:
+                profiles_found.append(json.loads(meta_path.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                continue  # Pruned by another worker meanwhile
+        return profiles_found
+
+    def stacks_path(self, profile_id: str) -> Path:
+        """Collapsed stacks file of a profile; raises KeyError for unknown IDs."""
+        path = self.directory / f"{Path(profile_id).name}{STACKS_SUFFIX}"
+        if not path.with_suffix(META_SUFFIX).is_file():
+            raise KeyError(profile_id)
+        return path
+
+
+# Global profile store instance
+profiles = ProfileStore()
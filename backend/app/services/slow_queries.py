@@ -0,0 +1,236 @@
+"""
+Slow query log.
+A command listener on the Motor client records commands slower than
+settings.slow_query_ms by query shape: the filter, sort or pipeline with
+values replaced by "?". Values are never kept in the log. When one shape is
+slow repeatedly, its latest command is re-run once as
+explain("executionStats") in the background. Explains are rate-limited and
+suspended while slow commands are arriving in bulk, so diagnosis never
+adds load during an incident.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+from app.config import settings
+
+# Read commands that can be explained without side effects
+EXPLAINABLE = {"find", "aggregate", "count", "distinct"}
+# Keys of those commands that the explain needs (drops lsid, $clusterTime, $db, ...)
+COMMAND_KEYS = {
+    "find": ("find", "filter", "sort", "projection", "skip", "limit", "hint", "collation"),
+    "aggregate": ("aggregate", "pipeline", "hint", "collation", "allowDiskUse", "cursor"),
+    "count": ("count", "query", "skip", "limit", "hint", "collation"),
+    "distinct": ("distinct", "key", "query", "collation"),
+}
+WRITING_STAGES = ("$out", "$merge")
+EXPLAIN_TTL = 60 * 60  # A shape is explained again after an hour (plans change)
+MAX_SHAPES = 500  # Least recently slow shapes are forgotten beyond this
+STORM_WINDOW = 60.0  # Seconds over which settings.slow_query_storm is counted
+
+
+def query_shape(value: Any) -> Any:
+    """The structure of a filter, sort or pipeline with literal values replaced by "?"."""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if any(isinstance(item, dict) for item in value):
+            return [query_shape(item) for item in value]
+        return "?"  # $in lists and friends: the length is not part of the shape
+    return "?"
+
+
+def describe(command_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
+    """Collection and value-free filter/sort/pipeline of a read command."""
+    description: Dict[str, Any] = {"command": command_name, "collection": command[command_name]}
+    if command_name == "find":
+        description["filter"] = query_shape(command.get("filter", {}))
+        if command.get("sort"):
+            description["sort"] = dict(command["sort"])  # Directions are the shape
+    elif command_name == "aggregate":
+        description["pipeline"] = query_shape(command.get("pipeline", []))
+    else:
+        description["filter"] = query_shape(command.get("query", {}))
+    return description
+
+
+def summarize_explain(explain: Dict[str, Any]) -> Dict[str, Any]:
+    """The useful part of explain output: plan stages and examined/returned counts."""
+    def find(node: Any, key: str) -> Optional[Any]:
+        if isinstance(node, dict):
+            if key in node:
+                return node[key]
+            children = node.values()
+        elif isinstance(node, list):
+            children = node
+        else:
+            return None
+        for child in children:
+            found = find(child, key)
+            if found is not None:
+                return found
+        return None
+
+    def stages(plan: Any) -> List[str]:
+        if not isinstance(plan, dict):
+            return []
+        plan = plan.get("queryPlan", plan)  # Slot-based engine wraps the classic plan
+        name = plan.get("stage", "")
+        if plan.get("indexName"):
+            name = f"{name} {plan['indexName']}"
+        inputs = plan.get("inputStages") or [plan.get("inputStage")]
+        return [name] + [stage for child in inputs for stage in stages(child)]
+
+    stats = find(explain, "executionStats") or {}
+    return {
+        "plan": [stage for stage in stages(find(explain, "winningPlan")) if stage],
+        "returned": stats.get("nReturned"),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "execution_ms": stats.get("executionTimeMillis"),
+    }
+
+
+class SlowQueryLog(monitoring.CommandListener):
+    """Records slow commands by shape and explains repeat offenders."""
+
+    def __init__(self):
+        self.lock = threading.Lock()  # Callbacks run in Motor's executor threads
+        self.pending: Dict[Tuple[Any, int], Tuple[str, Dict[str, Any]]] = {}
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=settings.slow_query_log_size)
+        self.shapes: Dict[str, Dict[str, Any]] = {}
+        self.slow_times: Deque[float] = deque()
+        self.client = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.explaining = False
+        self.last_explain = 0.0
+        self.explains_run = 0
+        self.explains_skipped = 0
+
+    def attach(self, client):
+        """Explain through this client, on the running event loop."""
+        self.client = client
+        self.loop = asyncio.get_running_loop()
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        if settings.slow_query_ms > 0 and event.command_name in EXPLAINABLE:
+            self.pending[(event.connection_id, event.request_id)] = (
+                event.database_name, event.command
+            )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finished(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finished(event)
+
+    def _finished(self, event):
+        started = self.pending.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        duration_ms = event.duration_micros / 1000
+        if duration_ms >= settings.slow_query_ms:
+            self.record(event.command_name, *started, duration_ms)
+
+    def record(
+        self, command_name: str, database_name: str, command: Dict[str, Any], duration_ms: float
+    ):
+        """Log one slow command and decide whether its shape should be explained."""
+        description = describe(command_name, command)
+        key = json.dumps(description, sort_keys=True, default=str)
+        now = time.time()
+        print(f"🐢 Slow query ({duration_ms:.0f} ms): {key}")
+
+        with self.lock:
+            self.recent.append({**description, "duration_ms": duration_ms, "at": now})
+            self.slow_times.append(now)
+            while self.slow_times and self.slow_times[0] < now - STORM_WINDOW:
+                self.slow_times.popleft()
+
+            shape = self.shapes.get(key)
+            if shape is None:
+                if len(self.shapes) >= MAX_SHAPES:
+                    oldest = min(self.shapes, key=lambda k: self.shapes[k]["last_at"])
+                    del self.shapes[oldest]
+                shape = self.shapes[key] = {
+                    **description, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "explain": None, "explained_at": None,
+                }
+            shape["count"] += 1
+            shape["total_ms"] += duration_ms
+            shape["max_ms"] = max(shape["max_ms"], duration_ms)
+            shape["last_at"] = now
+            shape["command"] = command  # Latest instance, for the explain; never exposed
+
+            if not self._should_explain(shape, command_name, command, now):
+                return
+            self.explaining = True
+            self.last_explain = now
+
+        self.loop.call_soon_threadsafe(
+            self.loop.create_task, self._explain(key, database_name, command_name, command)
+        )
+
+    def _should_explain(
+        self, shape: Dict[str, Any], command_name: str, command: Dict[str, Any], now: float
+    ) -> bool:
+        """Rate limiting for explains (called with the lock held)."""
+        if self.client is None or shape["count"] < settings.slow_query_explain_after:
+            return False
+        if shape["explained_at"] is not None and now - shape["explained_at"] < EXPLAIN_TTL:
+            return False
+        if command_name == "aggregate" and any(
+            stage in step for step in command.get("pipeline", []) for stage in WRITING_STAGES
+        ):
+            return False
+        if (
+            self.explaining
+            or now - self.last_explain < settings.slow_query_explain_interval
+            or len(self.slow_times) > settings.slow_query_storm  # Incident: don't add load
+        ):
+            self.explains_skipped += 1
+            return False
+        return True
+
+    async def _explain(
+        self, key: str, database_name: str, command_name: str, command: Dict[str, Any]
+    ):
+        explain_command = {
+            name: command[name] for name in COMMAND_KEYS[command_name] if name in command
+        }
+        try:
+            result = await self.client[database_name].command(
+                {"explain": explain_command, "verbosity": "executionStats"}
+            )
+            summary = summarize_explain(result)
+        except Exception as e:
+            summary = {"error": str(e)}
+        with self.lock:
+            self.explaining = False
+            self.explains_run += 1
+            shape = self.shapes.get(key)
+            if shape is not None:
+                shape["explain"] = summary
+                shape["explained_at"] = time.time()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            shapes = sorted(self.shapes.values(), key=lambda s: s["total_ms"], reverse=True)
+            return {
+                "threshold_ms": settings.slow_query_ms,
+                "explains_run": self.explains_run,
+                "explains_skipped": self.explains_skipped,
+                "shapes": [
+                    {k: v for k, v in shape.items() if k != "command"} for shape in shapes
+                ],
+                "recent": list(self.recent)[::-1],
+            }
+
+
+# Global slow query log instance
+slow_queries = SlowQueryLog()
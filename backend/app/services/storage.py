@@ -0,0 +1,243 @@
+"""
+Storage backends for attachment bytes.
+LocalStorage keeps uploads in settings.upload_dir. S3Storage streams every
+upload straight into an S3-compatible bucket (multipart for large files) and
+hands browsers presigned GET URLs; nodes keep no attachment bytes, so any node
+can serve any note. Code that needs a file on disk (processing jobs, page and
+preview rendering) asks for a local_copy(), which S3 downloads to a scratch
+file for the duration. Routes go through the global `storage`, which picks a
+backend on connect().
+"""
+import hashlib
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, BinaryIO, Dict, Optional
+from urllib.parse import quote
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.services.tiering import cold_tier
+from app.services.uploads import disk_path
+
+COPY_BUFFER_SIZE = 1024 * 1024  # 1MB copy buffer for writing uploads
+MIN_PART_SIZE = 5 * 1024 * 1024  # S3's minimum size for all but the last part
+
+
+class LocalStorage:
+    """Attachments as files in settings.upload_dir."""
+
+    name = "local"
+    keeps_files = True  # Files in upload_dir are served directly (variants, offload, ...)
+
+    @staticmethod
+    def _write(stored_path: str, source: BinaryIO) -> Dict[str, Any]:
+        digest = hashlib.sha256()
+        size = 0
+        with open(disk_path(stored_path), "wb") as buffer:
+            while chunk := source.read(COPY_BUFFER_SIZE):
+                digest.update(chunk)
+                buffer.write(chunk)
+                size += len(chunk)
+        return {"size": size, "sha256": digest.hexdigest()}
+
+    async def save(self, stored_path: str, source: BinaryIO) -> Dict[str, Any]:
+        """
+        Write an upload's bytes under its stored path (blocking IO runs in the threadpool).
+        Returns the size and SHA-256 computed while the bytes streamed through.
+        """
+        return await run_in_threadpool(self._write, stored_path, source)
+
+    async def delete(self, stored_path: str) -> bool:
+        """Remove an attachment. Returns False if it was already gone."""
+        try:
+            await run_in_threadpool(os.remove, disk_path(stored_path))
+        except FileNotFoundError:
+            return False
+        return True
+
+    @asynccontextmanager
+    async def local_copy(self, stored_path: str) -> AsyncIterator[Path]:
+        """
+        A file on disk with the attachment's bytes, valid inside the block.
+        Archived files are recalled from the cold tier; raises FileNotFoundError if missing.
+        """
+        path = disk_path(stored_path)
+        if not await run_in_threadpool(path.is_file) and not await cold_tier.recall(stored_path):
+            raise FileNotFoundError(stored_path)
+        yield path
+
+    async def sync(self, stored_path: str, local_path: Path):
+        """Publish a rewrite of a local_copy() (e.g. faststart). The copy is the file here."""
+
+    async def url_for(self, stored_path: str, download_name: Optional[str] = None) -> Optional[str]:
+        """A URL browsers can fetch the file from directly, or None to serve it ourselves."""
+        return None
+
+
+class S3Storage(LocalStorage):
+    """
+    Attachments in an S3-compatible bucket (AWS, MinIO, ...).
+    Nothing is kept on local disk; reads are redirected to presigned URLs.
+    """
+
+    name = "s3"
+    keeps_files = False
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        prefix: str = "",
+    ):
+        import boto3  # Imported here: local deployments never pay for it
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            config=Config(signature_version="s3v4"),  # Required by MinIO and newer regions
+        )
+
+    def key(self, stored_path: str) -> str:
+        return self.prefix + Path(stored_path).name
+
+    def _upload(self, stored_path: str, source: BinaryIO) -> Dict[str, Any]:
+        """
+        Stream `source` into the bucket, in parts of settings.s3_part_size once it is
+        larger than one. Only one part is held in memory. Returns the size and SHA-256.
+        """
+        key = self.key(stored_path)
+        part_size = max(settings.s3_part_size, MIN_PART_SIZE)
+        digest = hashlib.sha256()
+
+        chunk = source.read(part_size)
+        digest.update(chunk)
+        size = len(chunk)
+        if len(chunk) < part_size:
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=chunk)
+            return {"size": size, "sha256": digest.hexdigest()}
+
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=key)["UploadId"]
+        try:
+            parts = []
+            while chunk:
+                part_number = len(parts) + 1
+                response = self.client.upload_part(
+                    Bucket=self.bucket, Key=key, UploadId=upload_id,
+                    PartNumber=part_number, Body=chunk,
+                )
+                parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+                chunk = source.read(part_size)
+                digest.update(chunk)
+                size += len(chunk)
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except Exception:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+            raise
+        return {"size": size, "sha256": digest.hexdigest()}
+
+    def _upload_file(self, stored_path: str, local_path: Path):
+        with open(local_path, "rb") as source:
+            self._upload(stored_path, source)
+
+    def _download(self, stored_path: str, local_path: Path):
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.download_file(self.bucket, self.key(stored_path), str(local_path))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                raise FileNotFoundError(stored_path) from e
+            raise
+
+    async def save(self, stored_path: str, source: BinaryIO) -> Dict[str, Any]:
+        return await run_in_threadpool(self._upload, stored_path, source)
+
+    async def delete(self, stored_path: str) -> bool:
+        await run_in_threadpool(
+            self.client.delete_object, Bucket=self.bucket, Key=self.key(stored_path)
+        )
+        return True  # S3 deletes are idempotent and don't say whether the key existed
+
+    @asynccontextmanager
+    async def local_copy(self, stored_path: str) -> AsyncIterator[Path]:
+        """Download the object to a scratch file, removed when the block exits."""
+        fd, name = tempfile.mkstemp(
+            suffix=Path(stored_path).suffix,  # Processing picks its handling by extension
+            dir=settings.s3_scratch_dir or None,
+        )
+        os.close(fd)
+        local_path = Path(name)
+        try:
+            await run_in_threadpool(self._download, stored_path, local_path)
+            yield local_path
+        finally:
+            local_path.unlink(missing_ok=True)
+
+    async def sync(self, stored_path: str, local_path: Path):
+        await run_in_threadpool(self._upload_file, stored_path, local_path)
+
+    async def url_for(self, stored_path: str, download_name: Optional[str] = None) -> Optional[str]:
+        params = {"Bucket": self.bucket, "Key": self.key(stored_path)}
+        if download_name:
+            params["ResponseContentDisposition"] = (
+                f"attachment; filename*=utf-8''{quote(download_name)}"
+            )
+        return self.client.generate_presigned_url(
+            "get_object", Params=params, ExpiresIn=settings.s3_url_expiry
+        )
+
+
+class Storage:
+    """Attachment storage used by the routes; delegates to the configured backend."""
+
+    def __init__(self):
+        self.backend: LocalStorage = LocalStorage()
+
+    def connect(self):
+        """Select the backend named by settings.storage_backend."""
+        if settings.storage_backend == "s3":
+            self.backend = S3Storage(
+                settings.s3_bucket,
+                endpoint_url=settings.s3_endpoint_url,
+                region=settings.s3_region,
+                prefix=settings.s3_prefix,
+            )
+        else:
+            self.backend = LocalStorage()
+        print(f"✅ Attachment storage: {self.backend.name}")
+
+    async def save(self, stored_path: str, source: BinaryIO) -> Dict[str, Any]:
+        return await self.backend.save(stored_path, source)
+
+    async def delete(self, stored_path: str) -> bool:
+        return await self.backend.delete(stored_path)
+
+    @property
+    def keeps_files(self) -> bool:
+        """Whether attachments live in settings.upload_dir (local backend)."""
+        return self.backend.keeps_files
+
+    def local_copy(self, stored_path: str):
+        """Async context manager yielding a local file with the attachment's bytes."""
+        return self.backend.local_copy(stored_path)
+
+    async def sync(self, stored_path: str, local_path: Path):
+        await self.backend.sync(stored_path, local_path)
+
+    async def url_for(self, stored_path: str, download_name: Optional[str] = None) -> Optional[str]:
+        return await self.backend.url_for(stored_path, download_name)
+
+
+# Global storage instance
+storage = Storage()
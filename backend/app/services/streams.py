@@ -0,0 +1,145 @@
+"""
+Per-worker scheduling of attachment bodies.
+Bodies are never capped or turned away as a whole: a body only holds a read
+slot while one chunk is read from disk, so a long video playback held open
+by TCP backpressure costs nothing between chunks. At most
+settings.max_disk_reads chunks are read at once; when more are waiting, the
+slots go round-robin to clients, so one client with many parallel range
+requests cannot starve a room full of viewers. With settings.serve_bandwidth
+set, each connected client also gets a token bucket refilled at an even
+share of the worker's bandwidth.
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict
+
+from app.config import settings
+
+
+class TokenBucket:
+    """Byte allowance refilled at `rate` bytes/s, capped at `burst` (rate 0 = unlimited)."""
+
+    def __init__(self, rate: float = 0, burst: int = 0):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def refill(self):
+        """Credit the tokens earned since the last refill at the current rate."""
+        now = time.monotonic()
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def consume(self, nbytes: int):
+        """Take nbytes, sleeping off any debt so the long-run rate stays at `rate`."""
+        if self.rate <= 0:
+            return
+        self.refill()
+        self.tokens -= nbytes
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+
+class _Client:
+    def __init__(self):
+        self.bucket = TokenBucket()
+        self.streams = 0
+
+
+class StreamScheduler:
+    """Round-robin read slots plus per-client token buckets for one worker process."""
+
+    def __init__(self):
+        self.active = 0
+        # Waiting chunk reads per client, in the order clients get their next turn
+        self.queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self.clients: Dict[str, _Client] = {}
+
+    @asynccontextmanager
+    async def stream(self, client: str) -> AsyncIterator[TokenBucket]:
+        """Register a body being sent to `client` for the whole send; yields its bucket."""
+        entry = self.clients.get(client)
+        if entry is None:
+            entry = self.clients[client] = _Client()
+            self._rebalance()
+        entry.streams += 1
+        try:
+            yield entry.bucket
+        finally:
+            entry.streams -= 1
+            if not entry.streams:
+                del self.clients[client]
+                self._rebalance()
+
+    @asynccontextmanager
+    async def read_slot(self, client: str) -> AsyncIterator[None]:
+        """Hold one of settings.max_disk_reads slots while a chunk is read."""
+        await self._acquire(client)
+        try:
+            yield
+        finally:
+            self._release(client)
+
+    async def _acquire(self, client: str):
+        if self.active < settings.max_disk_reads and not self.queues:
+            self.active += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.queues.setdefault(client, deque()).append(waiter)
+        try:
+            await waiter
+        except BaseException:
+            self._abandon(client, waiter)
+            raise
+
+    def _abandon(self, client: str, waiter: asyncio.Future):
+        if waiter.done() and not waiter.cancelled():
+            self._release(client)  # The slot was handed over just as we gave up
+            return
+        queue = self.queues.get(client)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self.queues[client]
+
+    def _release(self, client: str):
+        # Hand the slot to the next client in turn, or free it
+        if client in self.queues:
+            self.queues.move_to_end(client)  # Everyone else waiting goes first
+        while self.queues:
+            client, queue = next(iter(self.queues.items()))
+            waiter = queue.popleft()
+            if queue:
+                self.queues.move_to_end(client)  # Its next chunk waits for everyone else's
+            else:
+                del self.queues[client]
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _rebalance(self):
+        """Split settings.serve_bandwidth evenly across connected clients."""
+        share = settings.serve_bandwidth / len(self.clients) if self.clients else 0
+        for entry in self.clients.values():
+            entry.bucket.refill()  # Bank what was earned at the old rate
+            entry.bucket.rate = share
+            entry.bucket.burst = settings.serve_chunk_size
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "streams": sum(entry.streams for entry in self.clients.values()),
+            "clients": len(self.clients),
+            "reading": self.active,
+            "waiting": sum(len(queue) for queue in self.queues.values()),
+            "max_disk_reads": settings.max_disk_reads,
+            "client_rate": settings.serve_bandwidth / len(self.clients) if self.clients else None,
+        }
+
+
+streams = StreamScheduler()
@@ -0,0 +1,58 @@
+"""
+Per-page text extraction for PDFs and PPTX decks.
+These functions are pure and CPU-bound so they can run in a process pool.
+"""
+import re
+import zipfile
+from pathlib import Path
+from typing import List
+from xml.etree import ElementTree
+
+from pypdf import PdfReader
+
+TEXT_EXTENSIONS = {".pdf", ".pptx"}
+
+_DRAWINGML_TEXT = "{http://schemas.openxmlformats.org/drawingml/2006/main}t"
+_DRAWINGML_PARAGRAPH = "{http://schemas.openxmlformats.org/drawingml/2006/main}p"
+_SLIDE_RE = re.compile(r"^ppt/slides/slide(\d+)\.xml$")
+
+
+def extract_pages(path: str) -> List[str]:
+    """Return the text of each page (PDF) or slide (PPTX), in order."""
+    ext = Path(path).suffix.lower()
+    if ext == ".pdf":
+        return pdf_pages(path)
+    if ext == ".pptx":
+        return pptx_slides(path)
+    raise ValueError(f'Text extraction not supported for {ext}')
+
+
+def pdf_pages(path: str) -> List[str]:
+    """Extract text from every PDF page; unreadable pages yield ''."""
+    reader = PdfReader(path)
+    pages = []
+    for page in reader.pages:
+        try:
+            pages.append(page.extract_text() or '')
+        except Exception:
+            pages.append('')
+    return pages
+
+
+def pptx_slides(path: str) -> List[str]:
+    """Extract text from each slide's XML (ppt/slides/slideN.xml) in slide order."""
+    with zipfile.ZipFile(path) as deck:
+        slides = sorted(
+            (int(match.group(1)), name)
+            for name in deck.namelist()
+            if (match := _SLIDE_RE.match(name))
+        )
+        texts = []
+        for _, name in slides:
+            root = ElementTree.fromstring(deck.read(name))
+            paragraphs = [
+                ''.join(node.text or '' for node in paragraph.iter(_DRAWINGML_TEXT))
+                for paragraph in root.iter(_DRAWINGML_PARAGRAPH)
+            ]
+            texts.append('\n'.join(p for p in paragraphs if p))
+    return texts
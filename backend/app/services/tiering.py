@@ -0,0 +1,280 @@
+"""
+Cold tier for attachments nobody opens any more.
+A periodic pass moves uploads not accessed for settings.archive_after_days
+from the upload directory (fast SSD) into settings.archive_dir (a cheaper
+mount), zstd-compressed when that saves space. The serve routes recall
+archived files transparently and record accesses, which are flushed to
+notes.access in batches.
+"""
+import asyncio
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+
+import anyio
+import zstandard
+
+from app.config import settings
+from app.services.file_cache import file_cache
+from app.services.hot_cache import hot_cache
+from app.services.uploads import disk_path
+from notes import access
+
+ZSTD_SUFFIX = ".zst"
+COPY_BUFFER_SIZE = 1024 * 1024
+SAMPLE_SIZE = 1024 * 1024  # Bytes compressed up front to decide whether zstd helps
+MIN_SAVING = 0.1  # Compress only if the sample shrinks by at least 10%
+
+
+def _atomic_target(dest: Path) -> Path:
+    return dest.with_name(f"{dest.name}.{uuid.uuid4().hex}.tmp")
+
+
+def archive_file(source: str, archive_dir: str, level: int) -> Dict[str, Any]:
+    """
+    Move a file into the archive directory, zstd-compressed if a sample of it
+    compresses well and copied as-is otherwise (video, images).
+    The archived copy keeps the file's mtime, for restore_file() to put back.
+    """
+    source_path = Path(source)
+    archive = Path(archive_dir)
+    archive.mkdir(parents=True, exist_ok=True)
+    stat_result = source_path.stat()
+    size = stat_result.st_size
+
+    with open(source_path, "rb") as src:
+        sample = src.read(SAMPLE_SIZE)
+        compress = bool(sample) and len(zstandard.compress(sample, level)) <= len(sample) * (
+            1 - MIN_SAVING
+        )
+        dest = archive / (source_path.name + (ZSTD_SUFFIX if compress else ""))
+        tmp_path = _atomic_target(dest)
+        src.seek(0)
+        with open(tmp_path, "wb") as out:
+            if compress:
+                zstandard.ZstdCompressor(level=level).copy_stream(
+                    src, out, size=size, read_size=COPY_BUFFER_SIZE
+                )
+            else:
+                shutil.copyfileobj(src, out, COPY_BUFFER_SIZE)
+            out.flush()
+            os.fsync(out.fileno())
+    os.utime(tmp_path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns))
+    os.replace(tmp_path, dest)
+    os.remove(source_path)
+    return {"size": size, "archived_size": dest.stat().st_size, "compressed": compress}
+
+
+def restore_file(archived: str, dest: str):
+    """
+    Bring an archived file back to `dest` and drop the archived copy.
+    The original mtime is restored, so its .br/.gz variants (which never leave
+    the upload directory) are not mistaken for stale, and ETags stay the same.
+    """
+    archived_path = Path(archived)
+    dest_path = Path(dest)
+    tmp_path = _atomic_target(dest_path)
+    stat_result = archived_path.stat()
+    with open(archived_path, "rb") as src, open(tmp_path, "wb") as out:
+        if archived_path.suffix == ZSTD_SUFFIX:
+            zstandard.ZstdDecompressor().copy_stream(src, out, read_size=COPY_BUFFER_SIZE)
+        else:
+            shutil.copyfileobj(src, out, COPY_BUFFER_SIZE)
+    os.utime(tmp_path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns))
+    os.replace(tmp_path, dest_path)
+    os.remove(archived_path)
+
+
+class AccessTracker:
+    """Last access per stored file name, buffered in memory between flushes."""
+
+    def __init__(self):
+        self.pending: Dict[str, float] = {}
+
+    def record(self, stored_path: str):
+        """Note an access; cheap enough to call on every served request."""
+        self.pending[Path(stored_path).name] = time.time()
+
+    async def flush(self) -> int:
+        """Write buffered accesses with one bulk write. Returns the number written."""
+        batch, self.pending = self.pending, {}
+        try:
+            return await access.record_many(batch)
+        except Exception:
+            # Keep the batch for the next flush, without overwriting newer accesses
+            for name, when in batch.items():
+                self.pending[name] = max(when, self.pending.get(name, 0))
+            raise
+
+
+class ColdTier:
+    """Moves idle uploads to the archive directory and recalls them on demand."""
+
+    def __init__(self):
+        self.tracker = AccessTracker()
+        self.recalls: Dict[str, asyncio.Task] = {}
+        self.task: Optional[asyncio.Task] = None  # Tiering passes (one worker)
+        self.flush_task: Optional[asyncio.Task] = None  # Access flushes (every worker)
+        self.archived = 0
+        self.recalled = 0
+        self.last_pass: Optional[Dict[str, Any]] = None
+
+    @staticmethod
+    def archived_path(name: str) -> Optional[Path]:
+        """Where an upload sits in the archive, if it is there."""
+        archive = Path(settings.archive_dir)
+        for candidate in (archive / (name + ZSTD_SUFFIX), archive / name):
+            if candidate.is_file():
+                return candidate
+        return None
+
+    def record_access(self, stored_path: str):
+        self.tracker.record(stored_path)
+
+    async def recall(self, stored_path: str) -> bool:
+        """
+        Restore an archived upload into the upload directory.
+        Concurrent requests for the same file share one restore.
+        Returns False if the file isn't archived.
+        """
+        name = Path(stored_path).name
+        task = self.recalls.get(name)
+        if task is None:
+            archived = self.archived_path(name)
+            if archived is None:
+                return False
+            task = asyncio.ensure_future(
+                anyio.to_thread.run_sync(restore_file, str(archived), str(disk_path(name)))
+            )
+            self.recalls[name] = task
+            task.add_done_callback(lambda _: self.recalls.pop(name, None))
+            self.recalled += 1
+        await asyncio.shield(task)
+        file_cache.invalidate(name)
+        self.tracker.record(name)  # A recalled file must not be archived again right away
+        return True
+
+    async def discard(self, stored_path: str):
+        """Remove an attachment's archived copy and access history (on delete)."""
+        name = Path(stored_path).name
+        archived = self.archived_path(name)
+        if archived is not None:
+            await anyio.to_thread.run_sync(os.remove, archived)
+        self.tracker.pending.pop(name, None)
+        await access.delete(name)
+
+    async def _recent_names(self, since: float) -> Set[str]:
+        recent = {name for name, when in self.tracker.pending.items() if when >= since}
+        async for name in access.accessed_since(since):
+            recent.add(name)
+        return recent
+
+    async def run_pass(self) -> Dict[str, Any]:
+        """
+        Archive every upload last accessed (or, if never, modified) more than
+        settings.archive_after_days ago. Files are moved one at a time.
+        """
+        await self.tracker.flush()
+        cutoff = time.time() - settings.archive_after_days * 24 * 60 * 60
+        recent = await self._recent_names(cutoff)
+        upload_dir = Path(settings.upload_dir)
+        result = {"archived": 0, "bytes_moved": 0, "bytes_saved": 0, "errors": 0}
+
+        def idle_files():
+            with os.scandir(upload_dir) as entries:
+                for entry in entries:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    if Path(entry.name).suffix.lower() not in settings.allowed_extensions:
+                        continue  # Variants and temporary files stay with the hot tier
+                    if entry.name in recent or entry.stat().st_mtime >= cutoff:
+                        continue
+                    yield entry.name
+
+        names = await anyio.to_thread.run_sync(lambda: list(idle_files()))
+        for name in names:
+            if name in self.recalls or name in self.tracker.pending:
+                continue  # Opened while the pass was running
+            try:
+                moved = await anyio.to_thread.run_sync(
+                    archive_file,
+                    str(upload_dir / name),
+                    settings.archive_dir,
+                    settings.archive_zstd_level,
+                )
+            except OSError as e:
+                print(f"Warning: Could not archive {name}: {e}")
+                result["errors"] += 1
+                continue
+            file_cache.invalidate(name)
+            hot_cache.discard((upload_dir / name).resolve())
+            result["archived"] += 1
+            result["bytes_moved"] += moved["size"]
+            result["bytes_saved"] += moved["size"] - moved["archived_size"]
+
+        self.archived += result["archived"]
+        self.last_pass = {**result, "finished_at": time.time()}
+        return result
+
+    async def _flush_forever(self):
+        """Write this worker's accesses every settings.access_flush_interval."""
+        while True:
+            await asyncio.sleep(settings.access_flush_interval)
+            try:
+                await self.tracker.flush()
+            except Exception as e:
+                print(f"Warning: Could not flush access times: {e}")
+
+    async def _run(self):
+        """Run a tiering pass every settings.tiering_interval."""
+        while True:
+            await asyncio.sleep(settings.tiering_interval)
+            try:
+                await self.run_pass()
+            except Exception as e:
+                print(f"Warning: Cold tier pass failed: {e}")
+
+    def start(self, tiering: bool = True):
+        """
+        Start flushing accesses and, with `tiering` (one worker only), the tiering
+        passes. Every worker serves files, so every worker flushes what it saw.
+        Local storage only; archive_after_days=0 disables both.
+        """
+        if settings.archive_after_days <= 0 or settings.storage_backend != "local":
+            return
+        self.flush_task = asyncio.create_task(self._flush_forever())
+        if tiering:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the loops and write any buffered accesses."""
+        for task in (self.task, self.flush_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self.task = self.flush_task = None
+        try:
+            await self.tracker.flush()
+        except Exception as e:
+            print(f"Warning: Could not flush access times: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.task is not None,
+            "flushing": self.flush_task is not None,
+            "archived": self.archived,
+            "recalled": self.recalled,
+            "recalls_in_progress": len(self.recalls),
+            "pending_accesses": len(self.tracker.pending),
+            "last_pass": self.last_pass,
+        }
+
+
+# Global cold tier instance
+cold_tier = ColdTier()
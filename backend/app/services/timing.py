@@ -0,0 +1,75 @@
+"""
+Per-request stage timing.
+The Server-Timing middleware puts a RequestTimer in a context variable.
+Code on the request's path wraps its stages in stage() or @timed. Outside
+a request (background jobs, loops) there is no timer and both are no-ops.
+Tasks started with asyncio.gather copy the context, so concurrent stages
+of one request land in the same timer.
+"""
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional
+
+
+class RequestTimer:
+    """Accumulated duration and call count per stage name."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, List[float]] = {}  # name -> [seconds, calls]
+        self.route_started: Optional[float] = None
+        self.endpoint_finished: Optional[float] = None
+
+    def add(self, name: str, seconds: float):
+        entry = self.stages.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def header(self) -> str:
+        """Server-Timing header value; `total` is the time until the headers went out."""
+        entries = [f"total;dur={self.elapsed() * 1000:.1f}"]
+        for name, (seconds, calls) in self.stages.items():
+            entry = f"{name};dur={seconds * 1000:.1f}"
+            if calls > 1:
+                entry += f';desc="{calls} calls"'
+            entries.append(entry)
+        return ", ".join(entries)
+
+    def as_dict(self) -> Dict[str, float]:
+        """Stage durations in milliseconds, for the structured log line."""
+        return {name: round(seconds * 1000, 3) for name, (seconds, _) in self.stages.items()}
+
+
+request_timer: ContextVar[Optional[RequestTimer]] = ContextVar("request_timer", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the enclosed block (which may await) as stage `name` of the current request."""
+    timer = request_timer.get()
+    if timer is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - started)
+
+
+def timed(prefix: str) -> Callable:
+    """Decorator timing a coroutine function as stage `<prefix>.<function name>`."""
+    def decorator(func: Callable) -> Callable:
+        name = f"{prefix}.{func.__name__}"
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with stage(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
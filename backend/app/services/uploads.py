@@ -0,0 +1,27 @@
+"""Helpers for mapping stored attachment paths to files on disk."""
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, Union
+
+from app.config import settings
+
+HASH_BUFFER_SIZE = 1024 * 1024
+
+
+def disk_path(stored_path: str) -> Path:
+    """
+    Resolve a stored path ('uploads/name', '../uploads/name') to its file on disk.
+    Uploads are stored flat in settings.upload_dir, so only the name is used.
+    """
+    return Path(settings.upload_dir) / Path(stored_path).name
+
+
+def file_digest(path: Union[str, Path]) -> Dict[str, Any]:
+    """Size and SHA-256 of a file on disk (blocking; for files rewritten after upload)."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_BUFFER_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+    return {"size": size, "sha256": digest.hexdigest()}
@@ -0,0 +1,74 @@
+"""
+Last-access times of attachments, used to pick files for the cold tier.
+The serve routes record accesses in memory; they are written here in batches.
+"""
+from typing import AsyncIterator, Dict
+
+from pymongo import UpdateOne
+
+from app.services.database import db
+
+# Field names
+FILE_NAME = 'file'  # Stored file name in the upload directory
+LAST_ACCESS = 'last_access'  # Unix time of the latest recorded access
+
+# Collection name
+COLLECTION_NAME = 'file_access'
+
+
+async def get_collection():
+    """Get the file access collection."""
+    return db.get_collection(COLLECTION_NAME)
+
+
+async def create_indexes():
+    """
+    Make the file name unique, so concurrent upserts from different workers can't
+    create two records for one file. Duplicates left by earlier versions are
+    merged into the record with the latest access first.
+    """
+    collection = await get_collection()
+    duplicates = collection.aggregate([
+        {'$sort': {LAST_ACCESS: -1}},
+        {'$group': {'_id': f'${FILE_NAME}', 'ids': {'$push': '$_id'}}},
+        {'$match': {'ids.1': {'$exists': True}}},
+    ])
+    async for group in duplicates:
+        await collection.delete_many({'_id': {'$in': group['ids'][1:]}})
+    await collection.create_index(FILE_NAME, unique=True)
+
+
+async def record_many(accesses: Dict[str, float]) -> int:
+    """
+    Store a batch of {file name: access time} with one bulk write.
+    Times only move forward. Returns the number of files written.
+    """
+    if not isinstance(accesses, dict):
+        raise ValueError(f'Bad type for {type(accesses)=}')
+    if not accesses:
+        return 0
+
+    collection = await get_collection()
+    await collection.bulk_write(
+        [
+            UpdateOne({FILE_NAME: name}, {'$max': {LAST_ACCESS: when}}, upsert=True)
+            for name, when in accesses.items()
+        ],
+        ordered=False,
+    )
+    return len(accesses)
+
+
+async def accessed_since(since: float, batch_size: int = 1000) -> AsyncIterator[str]:
+    """Stream the names of files accessed at or after `since`."""
+    collection = await get_collection()
+    cursor = collection.find({LAST_ACCESS: {'$gte': since}}, {'_id': 0, FILE_NAME: 1})
+    async for doc in cursor.batch_size(batch_size):
+        yield doc[FILE_NAME]
+
+
+async def delete(name: str) -> int:
+    """Forget a file's access history. Returns the number of records removed."""
+    collection = await get_collection()
+    result = await collection.delete_many({FILE_NAME: name})
+    return result.deleted_count
@@ -0,0 +1,121 @@
+"""
+Durable queue of attachment files waiting to be physically removed.
+Routes enqueue files after the note change commits; workers in
+app.services.deletions claim, delete and retry them.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+from app.services.database import db
+
+# Field names
+ID = '_id'
+FILE_PATH = 'file_path'  # Stored attachment path
+NOTE_ID = 'note_id'
+STATUS = 'status'
+ATTEMPTS = 'attempts'
+NEXT_ATTEMPT = 'next_attempt'  # Earliest time the next try may start
+LEASE_UNTIL = 'lease_until'  # A running record whose lease expired is claimable again
+LAST_ERROR = 'last_error'
+CREATED_AT = 'created_at'
+
+# Statuses
+PENDING = 'pending'
+RUNNING = 'running'
+FAILED = 'failed'  # Gave up after the maximum number of attempts
+
+# Collection name
+COLLECTION_NAME = 'pending_deletions'
+
+
+async def get_collection():
+    """Get the pending deletions collection."""
+    return db.get_collection(COLLECTION_NAME)
+
+
+async def create_indexes():
+    """
+    Index claim()'s predicate and sort: equality on status, then the sort key,
+    then the lease range. Both $or branches use it and merge in sort order.
+    """
+    collection = await get_collection()
+    await collection.create_index([(STATUS, 1), (NEXT_ATTEMPT, 1), (LEASE_UNTIL, 1)])
+
+
+async def enqueue(file_paths: List[str], note_id: Optional[str] = None) -> int:
+    """Queue files for removal. Returns the number queued."""
+    if not isinstance(file_paths, list):
+        raise ValueError(f'Bad type for {type(file_paths)=}')
+    if not file_paths:
+        return 0
+
+    now = datetime.utcnow()
+    collection = await get_collection()
+    await collection.insert_many([
+        {
+            FILE_PATH: file_path,
+            NOTE_ID: note_id,
+            STATUS: PENDING,
+            ATTEMPTS: 0,
+            NEXT_ATTEMPT: now,
+            LEASE_UNTIL: None,
+            LAST_ERROR: None,
+            CREATED_AT: now,
+        }
+        for file_path in file_paths
+    ])
+    return len(file_paths)
+
+
+async def claim(lease_seconds: float) -> Optional[Dict[str, Any]]:
+    """
+    Atomically take the oldest due record (or one whose worker died) and
+    lease it. Returns None when nothing is due.
+    """
+    now = datetime.utcnow()
+    collection = await get_collection()
+    return await collection.find_one_and_update(
+        {'$or': [
+            {STATUS: PENDING, NEXT_ATTEMPT: {'$lte': now}},
+            {STATUS: RUNNING, LEASE_UNTIL: {'$lt': now}},
+        ]},
+        {
+            '$set': {STATUS: RUNNING, LEASE_UNTIL: now + timedelta(seconds=lease_seconds)},
+            '$inc': {ATTEMPTS: 1},
+        },
+        sort=[(NEXT_ATTEMPT, 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def complete(record_id) -> bool:
+    """Remove a record whose file is gone."""
+    collection = await get_collection()
+    result = await collection.delete_one({ID: record_id})
+    return result.deleted_count > 0
+
+
+async def retry_later(record_id, delay_seconds: float, error: str, give_up: bool = False):
+    """Put a failed record back in the queue after a delay, or park it as failed."""
+    collection = await get_collection()
+    await collection.update_one(
+        {ID: record_id},
+        {'$set': {
+            STATUS: FAILED if give_up else PENDING,
+            NEXT_ATTEMPT: datetime.utcnow() + timedelta(seconds=delay_seconds),
+            LEASE_UNTIL: None,
+            LAST_ERROR: error,
+        }},
+    )
+
+
+async def count_by_status() -> Dict[str, int]:
+    """Number of records per status."""
+    collection = await get_collection()
+    counts = {PENDING: 0, RUNNING: 0, FAILED: 0}
+    pipeline = [{'$group': {'_id': f'${STATUS}', 'count': {'$sum': 1}}}]
+    async for doc in collection.aggregate(pipeline):
+        counts[doc['_id']] = doc['count']
+    return counts
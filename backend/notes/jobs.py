@@ -0,0 +1,80 @@
+"""
+Records of background processing jobs, shared by every server worker.
+The worker running a job writes its record as the status changes, so the
+status API answers the same whichever worker a request lands on.
+"""
+from typing import Any, Dict, List, Optional
+
+from pymongo.errors import OperationFailure
+
+from app.services.database import db
+
+# Field names (the rest of a job record is stored as is)
+ID = '_id'  # The job ID
+JOB_ID = 'id'  # The job ID as records are returned
+NOTE_ID = 'note_id'
+CREATED_AT = 'created_at'
+
+# Collection name
+COLLECTION_NAME = 'jobs'
+
+
+async def get_collection():
+    """Get the jobs collection."""
+    return db.get_collection(COLLECTION_NAME)
+
+
+async def create_indexes(retention_seconds: int):
+    """Index the per-note listing and expire records retention_seconds after creation."""
+    collection = await get_collection()
+    await collection.create_index([(NOTE_ID, 1), (CREATED_AT, -1)])
+    try:
+        await collection.create_index(CREATED_AT, expireAfterSeconds=retention_seconds)
+    except OperationFailure:  # The retention changed: update the existing TTL index
+        await db.database.command(
+            'collMod', COLLECTION_NAME,
+            index={'keyPattern': {CREATED_AT: 1}, 'expireAfterSeconds': retention_seconds},
+        )
+
+
+def _fields(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in job.items() if k != JOB_ID}
+
+
+def _from_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {JOB_ID: doc.pop(ID), **doc}
+
+
+async def insert(job: Dict[str, Any]):
+    """Store a newly queued job, unless a later status was already written."""
+    if not isinstance(job, dict):
+        raise ValueError(f'Bad type for {type(job)=}')
+    collection = await get_collection()
+    await collection.update_one(
+        {ID: job[JOB_ID]}, {'$setOnInsert': _fields(job)}, upsert=True
+    )
+
+
+async def save(job: Dict[str, Any]):
+    """Store a job's current state."""
+    if not isinstance(job, dict):
+        raise ValueError(f'Bad type for {type(job)=}')
+    collection = await get_collection()
+    await collection.update_one({ID: job[JOB_ID]}, {'$set': _fields(job)}, upsert=True)
+
+
+async def get(job_id: str) -> Dict[str, Any]:
+    """Get a job record. Raises KeyError if unknown or expired."""
+    collection = await get_collection()
+    doc = await collection.find_one({ID: job_id})
+    if doc is None:
+        raise KeyError(f'Job not found: {job_id}')
+    return _from_doc(doc)
+
+
+async def get_recent(note_id: Optional[str] = None, limit: int = 1000) -> List[Dict[str, Any]]:
+    """Job records, newest first, optionally for a single note."""
+    collection = await get_collection()
+    query = {} if note_id is None else {NOTE_ID: note_id}
+    cursor = collection.find(query).sort(CREATED_AT, -1).limit(limit)
+    return [_from_doc(doc) async for doc in cursor]
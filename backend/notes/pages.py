@@ -0,0 +1,83 @@
+"""
+Page text storage for uploaded PDFs and slide decks, searched through a
+text index by app.services.page_index.
+"""
+import re
+from typing import Any, Dict, List
+
+import pymongo
+
+from app.services.database import db
+
+# Field names
+FILE_PATH = 'file_path'
+NOTE_ID = 'note_id'
+PAGE = 'page'  # 1-based page / slide number
+TEXT = 'text'
+
+# Collection name
+COLLECTION_NAME = 'page_text'
+
+
+async def get_collection():
+    """Get the page text collection."""
+    return db.get_collection(COLLECTION_NAME)
+
+
+async def create_indexes():
+    """
+    Index the file path, which every reprocess and delete filters on, and the
+    text for search (language-neutral: no stemming or stop words).
+    """
+    collection = await get_collection()
+    await collection.create_index(FILE_PATH)
+    await collection.create_index([(TEXT, pymongo.TEXT)], default_language='none')
+
+
+async def replace_file(note_id: str, file_path: str, pages: List[str]) -> int:
+    """
+    Store the text of every page of a file, replacing any previous extraction.
+    Returns the number of pages stored.
+    """
+    if not isinstance(pages, list):
+        raise ValueError(f'Bad type for {type(pages)=}')
+
+    collection = await get_collection()
+    await collection.delete_many({FILE_PATH: file_path})
+
+    docs = [
+        {FILE_PATH: file_path, NOTE_ID: note_id, PAGE: number, TEXT: text}
+        for number, text in enumerate(pages, start=1)
+        if text.strip()
+    ]
+    if docs:
+        await collection.insert_many(docs)
+    return len(docs)
+
+
+async def delete_file(file_path: str) -> int:
+    """Remove all stored pages of a file. Returns the number removed."""
+    collection = await get_collection()
+    result = await collection.delete_many({FILE_PATH: file_path})
+    return result.deleted_count
+
+
+async def search(terms: List[str], limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Pages containing every term, best text score first. $text finds and scores
+    candidates through the text index (any term); the per-term filters keep
+    only pages that contain all of them.
+    """
+    if not isinstance(terms, list) or not terms:
+        raise ValueError(f'Bad value for {terms=}')
+
+    score = {'$meta': 'textScore'}
+    collection = await get_collection()
+    cursor = collection.find(
+        {
+            '$text': {'$search': ' '.join(terms)},
+            '$and': [{TEXT: {'$regex': re.escape(term), '$options': 'i'}} for term in terms],
+        },
+        {'_id': 0, 'score': score},
+    ).sort([('score', score), (FILE_PATH, 1), (PAGE, 1)]).limit(limit)
+    return await cursor.to_list(length=limit)
@@ -2,21 +2,33 @@
 All note CRUD operations.
 Following the Software Engineering project pattern.
 """
-from typing import List, Dict, Any
+import mimetypes
+from typing import AsyncIterator, List, Dict, Any, Union
 from bson import ObjectId
 from datetime import datetime
+from pymongo import ReturnDocument
 
 from app.services.database import db
+from app.services.timing import timed
 
 # Field names
 ID = '_id'
 TITLE = 'title'
 CONTENT = 'content'
 FILE_PATH = 'file_path'  # Keep for backward compatibility
-FILES = 'files'  # New: array of file paths
+FILES = 'files'  # Attachment records (legacy notes: plain path strings)
+ATTACHMENTS = 'attachments'  # Derived on read: one record per entry in files
 PAGE_NUMBER = 'page_number'
 CREATED_AT = 'created_at'
 
+# Attachment record fields (page_count, duration, width and height are added by probing)
+PATH = 'path'
+NAME = 'name'
+SIZE = 'size'
+MIME_TYPE = 'mime_type'
+SHA256 = 'sha256'
+UPLOADED_AT = 'uploaded_at'
+
 MIN_TITLE_LEN = 1
 
 # Collection name
@@ -46,17 +58,66 @@ def is_valid_title(title: str) -> bool:
     return True
 
 
+def attachment_path(entry: Union[str, Dict[str, Any]]) -> str:
+    """Stored path of a files entry (an attachment record or a legacy path string)."""
+    return entry if isinstance(entry, str) else entry[PATH]
+
+
+def _attachment(entry: Union[str, Dict[str, Any]]) -> dict:
+    """Attachment record for a files entry; legacy strings get what can be derived."""
+    if isinstance(entry, str):
+        return {
+            PATH: entry,
+            NAME: entry.rsplit('/', 1)[-1],
+            MIME_TYPE: mimetypes.guess_type(entry)[0],
+        }
+    return dict(entry)
+
+
+def _migrate_files(note: dict) -> dict:
+    """
+    Convert ObjectId to string and migrate old file_path to files array.
+    `files` is exposed as paths; the full records are exposed as `attachments`.
+    """
+    note[ID] = str(note[ID])
+
+    # Migrate old file_path to files array for backward compatibility
+    entries = note.get(FILES) or ([note[FILE_PATH]] if note.get(FILE_PATH) else [])
+    note[ATTACHMENTS] = [_attachment(entry) for entry in entries]
+    note[FILES] = [record[PATH] for record in note[ATTACHMENTS]]
+
+    return note
+
+
+def _entry_path(entry: str = '$$this') -> dict:
+    """Aggregation expression for the path of a files entry (record or legacy string)."""
+    return {'$cond': [{'$eq': [{'$type': entry}, 'string']}, entry, f'{entry}.{PATH}']}
+
+
+def _existing_files() -> dict:
+    """Aggregation expression for a note's files; legacy notes only have file_path."""
+    return {
+        '$cond': [
+            {'$gt': [{'$size': {'$ifNull': [f'${FILES}', []]}}, 0]},
+            f'${FILES}',
+            {'$cond': [f'${FILE_PATH}', [f'${FILE_PATH}'], []]},
+        ]
+    }
+
+
 async def get_collection():
     """Get the notes collection."""
     return db.get_collection(COLLECTION_NAME)
 
 
+@timed('db')
 async def num_notes() -> int:
     """Return the number of notes in the database."""
     collection = await get_collection()
     return await collection.count_documents({})
 
 
+@timed('db')
 async def create(flds: dict) -> str:
     """
     Create a new note.
@@ -91,6 +152,7 @@ async def create(flds: dict) -> str:
     return str(result.inserted_id)
 
 
+@timed('db')
 async def get(note_id: str) -> Dict[str, Any]:
     """Retrieve a note by ID."""
     if not is_valid_id(note_id):
@@ -102,18 +164,10 @@ async def get(note_id: str) -> Dict[str, Any]:
     if not note:
         raise KeyError(f'Note not found: {note_id}')
 
-    # Convert ObjectId to string for JSON serialization
-    note[ID] = str(note[ID])
-
-    # Migrate old file_path to files array for backward compatibility
-    if note.get(FILE_PATH) and not note.get(FILES):
-        note[FILES] = [note[FILE_PATH]]
-    elif not note.get(FILES):
-        note[FILES] = []
-
-    return note
+    return _migrate_files(note)
 
 
+@timed('db')
 async def get_all() -> List[Dict[str, Any]]:
     """Retrieve all notes."""
     collection = await get_collection()
@@ -121,18 +175,10 @@ async def get_all() -> List[Dict[str, Any]]:
     notes = await cursor.to_list(length=None)
 
     # Convert ObjectIds to strings and migrate old file_path to files array
-    for note in notes:
-        note[ID] = str(note[ID])
-
-        # Migrate old file_path to files array for backward compatibility
-        if note.get(FILE_PATH) and not note.get(FILES):
-            note[FILES] = [note[FILE_PATH]]
-        elif not note.get(FILES):
-            note[FILES] = []
-
-    return notes
+    return [_migrate_files(note) for note in notes]
 
 
+@timed('db')
 async def update(note_id: str, flds: dict) -> str:
     """Update an existing note."""
     if not is_valid_id(note_id):
@@ -144,8 +190,12 @@ async def update(note_id: str, flds: dict) -> str:
     # Check if note exists
     await get(note_id)  # Will raise KeyError if not found
 
-    # Filter out None values and _id
-    update_data = {k: v for k, v in flds.items() if v is not None and k != ID}
+    # Filter out None values, _id, fields derived on read and the attachment
+    # fields, which only add_files() / remove_file() / update_attachment() may change
+    update_data = {
+        k: v for k, v in flds.items()
+        if v is not None and k not in (ID, ATTACHMENTS, FILES, FILE_PATH)
+    }
 
     if not update_data:
         return note_id
@@ -159,6 +209,114 @@ async def update(note_id: str, flds: dict) -> str:
     return note_id
 
 
+@timed('db')
+async def add_files(note_id: str, files: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Append attachment records to a note in a single atomic update.
+    Returns the updated note.
+    """
+    if not is_valid_id(note_id):
+        raise ValueError(f'Invalid ID: {note_id}')
+
+    if not isinstance(files, list) or not files:
+        raise ValueError(f'Bad value for {files=}')
+
+    # Legacy notes only have file_path; fold it into the array before appending
+    collection = await get_collection()
+    note = await collection.find_one_and_update(
+        {ID: ObjectId(note_id)},
+        [{'$set': {
+            FILES: {'$concatArrays': [_existing_files(), {'$literal': files}]},
+            FILE_PATH: {'$literal': attachment_path(files[-1])},
+        }}],
+        return_document=ReturnDocument.AFTER,
+    )
+
+    if not note:
+        raise KeyError(f'Note not found: {note_id}')
+
+    return _migrate_files(note)
+
+
+def remove_file_pipeline(file_path: str) -> List[dict]:
+    """Update pipeline dropping one attachment from a note."""
+    return [
+        {'$set': {
+            FILES: {'$filter': {
+                'input': _existing_files(),
+                'cond': {'$ne': [_entry_path(), file_path]},
+            }},
+        }},
+        # file_path keeps the last remaining file, or None
+        {'$set': {FILE_PATH: {'$ifNull': [
+            {'$let': {
+                'vars': {'last': {'$arrayElemAt': [f'${FILES}', -1]}},
+                'in': _entry_path('$$last'),
+            }},
+            None,
+        ]}}},
+    ]
+
+
+@timed('db')
+async def remove_file(note_id: str, file_path: str) -> Dict[str, Any]:
+    """
+    Remove one attachment from a note in a single atomic update.
+    Returns the updated note; raises KeyError if the note does not list the file.
+    """
+    if not is_valid_id(note_id):
+        raise ValueError(f'Invalid ID: {note_id}')
+
+    collection = await get_collection()
+    note = await collection.find_one_and_update(
+        {ID: ObjectId(note_id), '$or': [
+            {FILES: file_path}, {f'{FILES}.{PATH}': file_path}, {FILE_PATH: file_path},
+        ]},
+        remove_file_pipeline(file_path),
+        return_document=ReturnDocument.AFTER,
+    )
+
+    if not note:
+        raise KeyError(f'File not found in note: {note_id}')
+
+    return _migrate_files(note)
+
+
+def update_attachment_pipeline(file_path: str, fields: Dict[str, Any]) -> List[dict]:
+    """Update pipeline merging fields into one attachment record (upgrading legacy strings)."""
+    as_record = {'$cond': [{'$eq': [{'$type': '$$this'}, 'string']}, {PATH: '$$this'}, '$$this']}
+    return [{'$set': {FILES: {'$map': {
+        'input': _existing_files(),
+        'in': {'$cond': [
+            {'$eq': [_entry_path(), file_path]},
+            {'$mergeObjects': [as_record, {'$literal': fields}]},
+            '$$this',
+        ]},
+    }}}}]
+
+
+@timed('db')
+async def update_attachment(note_id: str, file_path: str, fields: Dict[str, Any]) -> str:
+    """Merge derived fields (size, sha256, page_count, ...) into an attachment record."""
+    if not is_valid_id(note_id):
+        raise ValueError(f'Invalid ID: {note_id}')
+
+    if not isinstance(fields, dict):
+        raise ValueError(f'Bad type for {type(fields)=}')
+
+    fields = {k: v for k, v in fields.items() if k != PATH}
+    collection = await get_collection()
+    result = await collection.update_one(
+        {ID: ObjectId(note_id)}, update_attachment_pipeline(file_path, fields)
+    )
+
+    if result.matched_count == 0:
+        raise KeyError(f'Note not found: {note_id}')
+
+    return note_id
+
+
+@timed('db')
 async def delete(note_id: str) -> bool:
     """Delete a note by ID."""
     if not is_valid_id(note_id):
@@ -171,3 +329,27 @@ async def delete(note_id: str) -> bool:
     result = await collection.delete_one({ID: ObjectId(note_id)})
 
     return result.deleted_count > 0
+
+
+async def referenced_file_names(batch_size: int = 1000) -> AsyncIterator[str]:
+    """
+    Stream the distinct file names referenced by any note (attachment records,
+    legacy path strings and file_path), sorted by name. The server sorts with
+    allowDiskUse, so memory stays bounded however many files there are.
+    """
+    pipeline = [
+        {'$project': {'paths': {'$setUnion': [
+            {'$map': {
+                'input': {'$ifNull': [f'${FILES}', []]},
+                'in': _entry_path(),
+            }},
+            {'$cond': [{'$ifNull': [f'${FILE_PATH}', False]}, [f'${FILE_PATH}'], []]},
+        ]}}},
+        {'$unwind': '$paths'},
+        {'$group': {'_id': {'$arrayElemAt': [{'$split': ['$paths', '/']}, -1]}}},
+        {'$sort': {'_id': 1}},
+    ]
+    collection = await get_collection()
+    cursor = collection.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
+    async for doc in cursor:
+        yield doc['_id']
@@ -3,10 +3,15 @@ import uvicorn
 from app.config import settings
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "app.main:app",
-        host="0.0.0.0",
-        port=settings.port,
-        reload=True,  # Enable auto-reload during development
-        log_level="info",
-    )
+    if settings.run_mode == "production":
+        from app.server import run  # gunicorn is POSIX-only; keep development portable
+
+        run()
+    else:
+        uvicorn.run(
+            "app.main:app",
+            host=settings.host,
+            port=settings.port,
+            reload=True,  # Enable auto-reload during development
+            log_level="info",
+        )
@@ -64,6 +64,14 @@ async def async_client():
         db.database = None
 
 
+@pytest.fixture
+def admin_headers(monkeypatch):
+    """Configure an admin token and return the headers that carry it."""
+    from app.config import settings
+    monkeypatch.setattr(settings, "admin_token", "admin-secret")
+    return {"X-Admin-Token": "admin-secret"}
+
+
 @pytest.fixture(scope="session", autouse=True)
 def setup_test_environment():
     """
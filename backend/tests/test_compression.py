@@ -0,0 +1,182 @@
+"""Tests for pre-compressed attachment variants."""
+import gzip
+import os
+
+import brotli
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+
+from app.config import settings
+from app.main import app
+from app.services import compression
+from app.services.compression import (
+    accepted_encodings,
+    compress_variants,
+    is_compressible,
+    remove_variants,
+)
+from app.services.file_cache import FileMetaCache, file_cache
+from app.services.hot_cache import hot_cache
+
+SVG_NAME = "20250101_120000_diagram.svg"
+SVG_BYTES = (
+    b'<svg xmlns="http://www.w3.org/2000/svg">' + b'<rect width="1" height="1"/>' * 500 + b"</svg>"
+)
+URL = f"/api/notes/serve/{SVG_NAME}"
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    """Temporary upload directory holding an SVG with its variants."""
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path))
+    (tmp_path / SVG_NAME).write_bytes(SVG_BYTES)
+    compress_variants(str(tmp_path / SVG_NAME))
+    file_cache.clear()
+    hot_cache.clear()
+    yield tmp_path
+    file_cache.clear()
+    hot_cache.clear()
+
+
+@pytest_asyncio.fixture
+async def client(upload_dir):
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        yield client
+
+
+def test_accepted_encodings_follow_server_preference():
+    """Test Accept-Encoding parsing with q-values and wildcards."""
+    assert accepted_encodings("gzip, deflate, br") == ["br", "gzip"]
+    assert accepted_encodings("gzip;q=0.5, br;q=0") == ["gzip"]
+    assert accepted_encodings("*, gzip;q=0") == ["br"]
+    assert accepted_encodings("identity") == []
+    assert accepted_encodings("") == []
+
+
+def test_is_compressible():
+    """Test which MIME types get variants."""
+    assert is_compressible("image/svg+xml")
+    assert is_compressible("text/plain")
+    assert not is_compressible("video/mp4")
+    assert not is_compressible(None)
+
+
+def test_compress_variants_writes_smaller_files(upload_dir):
+    """Test that both variants decode back to the original."""
+    assert brotli.decompress((upload_dir / f"{SVG_NAME}.br").read_bytes()) == SVG_BYTES
+    assert gzip.decompress((upload_dir / f"{SVG_NAME}.gz").read_bytes()) == SVG_BYTES
+
+
+def test_large_files_compress_in_chunks_at_lower_quality(tmp_path, monkeypatch):
+    """Test the streaming pass over several chunks and the quality cap."""
+    monkeypatch.setattr(compression, "CHUNK_SIZE", 1024)
+    monkeypatch.setattr(compression, "MAX_QUALITY_SIZE", 4096)
+    path = tmp_path / "slides.ppt"
+    data = b"Binary slide deck with repeated records. " * 1000
+    path.write_bytes(data)
+
+    written = compress_variants(str(path))
+
+    assert set(written) == {"br", "gzip"}
+    assert brotli.decompress((tmp_path / "slides.ppt.br").read_bytes()) == data
+    assert gzip.decompress((tmp_path / "slides.ppt.gz").read_bytes()) == data
+    assert compression.brotli_quality(len(data)) == compression.LARGE_FILE_QUALITY
+    assert compression.brotli_quality(100) == 11
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "slides.ppt", "slides.ppt.br", "slides.ppt.gz",
+    ]
+
+
+def test_incompressible_data_gets_no_variants(tmp_path):
+    """Test that variants which don't save space are skipped."""
+    path = tmp_path / "noise.svg"
+    path.write_bytes(os.urandom(4096))
+    assert compress_variants(str(path)) == {}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["noise.svg"]
+
+
+@pytest.mark.asyncio
+async def test_serve_prefers_brotli(client):
+    """Test that br is chosen over gzip and decoded by the client."""
+    response = await client.get(URL, headers={"Accept-Encoding": "gzip, br"})
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["content-type"].startswith("image/svg+xml")
+    assert response.headers["etag"].endswith('-br"')
+    assert response.content == SVG_BYTES
+
+
+@pytest.mark.asyncio
+async def test_serve_falls_back_to_gzip_and_identity(client):
+    """Test gzip-only and identity clients."""
+    gzipped = await client.get(URL, headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.content == SVG_BYTES
+
+    plain = await client.get(URL, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["vary"] == "Accept-Encoding"
+    assert plain.headers["content-length"] == str(len(SVG_BYTES))
+
+
+@pytest.mark.asyncio
+async def test_range_requests_get_identity_bytes(client):
+    """Test that Range requests are never answered from a variant."""
+    response = await client.get(URL, headers={"Accept-Encoding": "br", "Range": "bytes=0-3"})
+    assert response.status_code == 206
+    assert "content-encoding" not in response.headers
+    assert response.content == SVG_BYTES[:4]
+
+
+@pytest.mark.asyncio
+async def test_variant_conditional_request(client):
+    """Test that a variant's own ETag revalidates to 304."""
+    first = await client.get(URL, headers={"Accept-Encoding": "br"})
+    second = await client.get(
+        URL, headers={"Accept-Encoding": "br", "If-None-Match": first.headers["etag"]}
+    )
+    assert second.status_code == 304
+    assert second.headers["content-encoding"] == "br"
+
+
+@pytest.mark.asyncio
+async def test_missing_variants_are_cached_per_source_version(upload_dir, monkeypatch):
+    """Test that an absent variant isn't looked up again until its source changes."""
+    monkeypatch.setattr(settings, "file_meta_ttl", 60)
+    (upload_dir / f"{SVG_NAME}.br").unlink()
+    cache = FileMetaCache()
+    source = await cache.lookup(SVG_NAME)
+
+    assert await cache.lookup_variant(f"{SVG_NAME}.br", source) is None
+    assert await cache.lookup_variant(f"{SVG_NAME}.br", source) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert (await cache.lookup_variant(f"{SVG_NAME}.gz", source)).path.suffix == ".gz"
+
+    compress_variants(str(upload_dir / SVG_NAME))  # Written by another worker
+    assert await cache.lookup_variant(f"{SVG_NAME}.br", source) is None  # Still trusted
+    os.utime(upload_dir / SVG_NAME, ns=(0, source.stat_result.st_mtime_ns + 1))
+    changed = source._replace(stat_result=os.stat(upload_dir / SVG_NAME))
+    assert (await cache.lookup_variant(f"{SVG_NAME}.br", changed)).path.suffix == ".br"
+
+
+@pytest.mark.asyncio
+async def test_invalidating_a_variant_forgets_its_absence(upload_dir):
+    """Test that the worker that writes variants stops treating them as missing."""
+    source = await file_cache.lookup(SVG_NAME)
+    (upload_dir / f"{SVG_NAME}.br").rename(upload_dir / "saved.br")
+    assert await file_cache.lookup_variant(f"{SVG_NAME}.br", source) is None
+
+    (upload_dir / "saved.br").rename(upload_dir / f"{SVG_NAME}.br")
+    file_cache.invalidate(f"uploads/{SVG_NAME}.br")
+    assert (await file_cache.lookup_variant(f"{SVG_NAME}.br", source)).path.suffix == ".br"
+
+
+def test_remove_variants(upload_dir):
+    """Test that deleting an attachment's variants leaves the original."""
+    removed = remove_variants(f"uploads/{SVG_NAME}")
+    assert sorted(removed) == [f"uploads/{SVG_NAME}.br", f"uploads/{SVG_NAME}.gz"]
+    assert sorted(p.name for p in upload_dir.iterdir()) == [SVG_NAME]
+    assert remove_variants(f"uploads/{SVG_NAME}") == []
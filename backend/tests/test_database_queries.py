@@ -314,6 +314,28 @@ async def test_update_empty_data(async_client):
     assert note[qry.TITLE] == "Title"
 
 
+@pytest.mark.asyncio
+async def test_update_ignores_attachment_fields(async_client):
+    """Test that update() can't overwrite the attachment records."""
+    note_id = await qry.create({
+        qry.TITLE: "Title",
+        qry.FILES: [{qry.PATH: "uploads/a.pdf", qry.NAME: "a.pdf", qry.SIZE: 3}],
+        qry.FILE_PATH: "uploads/a.pdf",
+    })
+
+    await qry.update(note_id, {
+        qry.TITLE: "New Title",
+        qry.FILES: ["uploads/other.pdf"],
+        qry.FILE_PATH: "uploads/other.pdf",
+    })
+
+    note = await qry.get(note_id)
+    assert note[qry.TITLE] == "New Title"
+    assert note[qry.FILES] == ["uploads/a.pdf"]
+    assert note[qry.FILE_PATH] == "uploads/a.pdf"
+    assert note[qry.ATTACHMENTS][0][qry.SIZE] == 3
+
+
 @pytest.mark.asyncio
 async def test_delete_note(async_client):
     """Test deleting a note."""
@@ -473,3 +495,65 @@ async def test_note_with_null_page_number(async_client):
 
 print("✅ Database queries tests created!")
 
+
+# ============================================================================
+# ATTACHMENT RECORD TESTS
+# ============================================================================
+
+
+def test_migrate_files_exposes_attachment_records():
+    """Test that records and legacy strings both become attachments."""
+    record = {
+        qry.PATH: "uploads/20250101_120000_slides.pdf", qry.NAME: "slides.pdf",
+        qry.SIZE: 10, qry.MIME_TYPE: "application/pdf", qry.SHA256: "ab" * 32,
+    }
+    note = qry._migrate_files({
+        qry.ID: "n1",
+        qry.FILES: [record, "uploads/old.mp4"],
+    })
+
+    assert note[qry.FILES] == ["uploads/20250101_120000_slides.pdf", "uploads/old.mp4"]
+    assert note[qry.ATTACHMENTS][0] == record
+    assert note[qry.ATTACHMENTS][1] == {
+        qry.PATH: "uploads/old.mp4", qry.NAME: "old.mp4",
+        qry.MIME_TYPE: "video/mp4",
+    }
+
+
+def test_migrate_files_legacy_file_path():
+    """Test that a note with only file_path gets one attachment."""
+    note = qry._migrate_files({qry.ID: "n1", qry.FILE_PATH: "uploads/a.pdf"})
+    assert note[qry.FILES] == ["uploads/a.pdf"]
+    assert [a[qry.PATH] for a in note[qry.ATTACHMENTS]] == ["uploads/a.pdf"]
+
+    empty = qry._migrate_files({qry.ID: "n2"})
+    assert empty[qry.FILES] == [] and empty[qry.ATTACHMENTS] == []
+
+
+@pytest.mark.asyncio
+async def test_attachment_records_add_update_remove(async_client):
+    """Test appending records to a legacy note, merging probe results and removing one."""
+    note_id = await qry.create({
+        qry.TITLE: "Attachments", qry.FILE_PATH: "uploads/legacy.pdf",
+    })
+    record = {qry.PATH: "uploads/new.mp4", qry.NAME: "new.mp4", qry.SIZE: 5}
+
+    note = await qry.add_files(note_id, [record])
+    assert note[qry.FILES] == ["uploads/legacy.pdf", "uploads/new.mp4"]
+    assert note[qry.FILE_PATH] == "uploads/new.mp4"
+
+    await qry.update_attachment(note_id, "uploads/new.mp4", {"duration": 3.0})
+    await qry.update_attachment(note_id, "uploads/legacy.pdf", {"page_count": 2})
+    note = await qry.get(note_id)
+    assert note[qry.ATTACHMENTS][0] == {qry.PATH: "uploads/legacy.pdf", "page_count": 2}
+    assert note[qry.ATTACHMENTS][1] == {**record, "duration": 3.0}
+
+    note = await qry.remove_file(note_id, "uploads/new.mp4")
+    assert note[qry.FILES] == ["uploads/legacy.pdf"]
+    assert note[qry.FILE_PATH] == "uploads/legacy.pdf"
+
+    note = await qry.remove_file(note_id, "uploads/legacy.pdf")
+    assert note[qry.FILES] == [] and note[qry.FILE_PATH] is None
+
+    with pytest.raises(KeyError):
+        await qry.remove_file(note_id, "uploads/legacy.pdf")
@@ -0,0 +1,188 @@
+"""Tests for the background deletion queue (queue storage kept in memory)."""
+import asyncio
+import importlib
+
+import pytest
+
+from app.config import settings
+from app.services.deletions import DeletionQueue
+from app.services.storage import storage
+from notes import deletions as del_qry
+
+deletions_module = importlib.import_module("app.services.deletions")
+
+
+@pytest.fixture
+def queue_store(tmp_path, monkeypatch):
+    """In-memory stand-in for the pending_deletions collection, with instant retries."""
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "delete_retry_base", 0)
+    monkeypatch.setattr(settings, "delete_max_attempts", 3)
+    monkeypatch.setattr(settings, "delete_poll_interval", 0.01)
+    records = {}
+
+    async def enqueue(file_paths, note_id=None):
+        for file_path in file_paths:
+            record_id = len(records)
+            records[record_id] = {
+                del_qry.ID: record_id, del_qry.FILE_PATH: file_path,
+                del_qry.STATUS: del_qry.PENDING, del_qry.ATTEMPTS: 0,
+            }
+        return len(file_paths)
+
+    async def claim(lease_seconds):
+        for record in records.values():
+            if record[del_qry.STATUS] == del_qry.PENDING:
+                record[del_qry.STATUS] = del_qry.RUNNING
+                record[del_qry.ATTEMPTS] += 1
+                return dict(record)
+        return None
+
+    async def complete(record_id):
+        return records.pop(record_id, None) is not None
+
+    async def retry_later(record_id, delay_seconds, error, give_up=False):
+        records[record_id][del_qry.STATUS] = del_qry.FAILED if give_up else del_qry.PENDING
+        records[record_id][del_qry.LAST_ERROR] = error
+
+    async def discard_derived(file_path):
+        pass
+
+    monkeypatch.setattr(del_qry, "enqueue", enqueue)
+    monkeypatch.setattr(del_qry, "claim", claim)
+    monkeypatch.setattr(del_qry, "complete", complete)
+    monkeypatch.setattr(del_qry, "retry_later", retry_later)
+    monkeypatch.setattr(deletions_module, "discard_derived", discard_derived)
+    return tmp_path, records
+
+
+async def drain(queue, records):
+    """Run the workers until every record is gone or parked as failed."""
+    queue.start()
+    try:
+        for _ in range(200):
+            if all(r[del_qry.STATUS] == del_qry.FAILED for r in records.values()):
+                return
+            await asyncio.sleep(0.01)
+        raise AssertionError("Deletion queue did not drain")
+    finally:
+        await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_workers_remove_queued_files(queue_store):
+    """Test that enqueued files are removed by the worker pool."""
+    upload_dir, records = queue_store
+    for name in ("a.mp4", "b.mp4", "c.pdf"):
+        (upload_dir / name).write_bytes(b"video")
+    queue = DeletionQueue()
+
+    await queue.enqueue(["uploads/a.mp4", "uploads/b.mp4", "uploads/c.pdf"], "note")
+    assert len(list(upload_dir.iterdir())) == 3  # Nothing removed inline
+
+    await drain(queue, records)
+
+    assert list(upload_dir.iterdir()) == []
+    assert records == {}
+    assert queue.deleted == 3
+
+
+@pytest.mark.asyncio
+async def test_failures_are_retried_then_parked(queue_store, monkeypatch):
+    """Test retries with backoff and giving up after delete_max_attempts."""
+    _, records = queue_store
+    calls = []
+
+    async def failing_delete(file_path):
+        calls.append(file_path)
+        raise OSError("storage unavailable")
+
+    monkeypatch.setattr(storage, "delete", failing_delete)
+    queue = DeletionQueue()
+    await queue.enqueue(["uploads/stuck.mp4"])
+
+    await drain(queue, records)
+
+    assert len(calls) == 3
+    assert queue.retried == 2 and queue.given_up == 1
+    assert records[0][del_qry.STATUS] == del_qry.FAILED
+    assert records[0][del_qry.LAST_ERROR] == "storage unavailable"
+
+
+@pytest.mark.asyncio
+async def test_transient_failure_recovers(queue_store, monkeypatch):
+    """Test that a file is deleted once storage comes back."""
+    upload_dir, records = queue_store
+    (upload_dir / "flaky.pdf").write_bytes(b"pdf")
+    real_delete = storage.delete
+    failures = [OSError("busy")]
+
+    async def flaky_delete(file_path):
+        if failures:
+            raise failures.pop()
+        return await real_delete(file_path)
+
+    monkeypatch.setattr(storage, "delete", flaky_delete)
+    queue = DeletionQueue()
+    await queue.enqueue(["uploads/flaky.pdf"])
+
+    await drain(queue, records)
+
+    assert not (upload_dir / "flaky.pdf").exists()
+    assert queue.retried == 1 and queue.deleted == 1
+
+
+@pytest.mark.asyncio
+async def test_worker_survives_queue_update_failure(queue_store, monkeypatch):
+    """Test that a failed queue write doesn't kill the worker."""
+    upload_dir, records = queue_store
+    for name in ("a.pdf", "b.pdf"):
+        (upload_dir / name).write_bytes(b"pdf")
+    real_complete = del_qry.complete
+    failures = [ConnectionError("primary stepped down")]
+
+    async def flaky_complete(record_id):
+        if failures:
+            raise failures.pop()
+        return await real_complete(record_id)
+
+    monkeypatch.setattr(del_qry, "complete", flaky_complete)
+    monkeypatch.setattr(settings, "delete_workers", 1)
+    queue = DeletionQueue()
+    await queue.enqueue(["uploads/a.pdf", "uploads/b.pdf"])
+
+    queue.start()
+    try:
+        for _ in range(200):
+            if 1 not in records:  # The same worker went on to the second file
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await queue.stop()
+
+    assert list(upload_dir.iterdir()) == []
+    assert list(records) == [0] and records[0][del_qry.STATUS] == del_qry.RUNNING
+
+
+@pytest.mark.asyncio
+async def test_claim_is_indexed(monkeypatch):
+    """Test that startup indexes claim()'s filter and sort."""
+    created = []
+
+    class Collection:
+        async def create_index(self, keys, **kwargs):
+            created.append(keys)
+
+    async def get_collection():
+        return Collection()
+
+    monkeypatch.setattr(del_qry, "get_collection", get_collection)
+    await del_qry.create_indexes()
+    assert created == [[(del_qry.STATUS, 1), (del_qry.NEXT_ATTEMPT, 1), (del_qry.LEASE_UNTIL, 1)]]
+
+
+def test_retry_delay_backs_off_exponentially(monkeypatch):
+    """Test the backoff schedule and its cap."""
+    monkeypatch.setattr(settings, "delete_retry_base", 5.0)
+    monkeypatch.setattr(settings, "delete_retry_max", 60.0)
+    assert [DeletionQueue.retry_delay(n) for n in (1, 2, 3, 4, 5)] == [5, 10, 20, 40, 60]
@@ -0,0 +1,144 @@
+"""Tests for MP4 faststart rewriting."""
+import struct
+
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.main import app
+from app.services import faststart
+from app.services.file_cache import file_cache
+from app.services.media import iter_atoms, mp4_duration
+
+
+def atom(atom_type, payload):
+    """Build an ISO BMFF atom."""
+    return struct.pack(">I4s", 8 + len(payload), atom_type) + payload
+
+
+def chunk_table(atom_type, offsets):
+    """Build an stco (32-bit) or co64 (64-bit) chunk offset atom."""
+    fmt = ">Q" if atom_type == b"co64" else ">I"
+    entries = b"".join(struct.pack(fmt, offset) for offset in offsets)
+    return atom(atom_type, b"\x00\x00\x00\x00" + struct.pack(">I", len(offsets)) + entries)
+
+
+def build_moov(offsets, table=b"stco"):
+    """Build moov/trak/mdia/minf/stbl/<table> plus an mvhd."""
+    mvhd = atom(b"mvhd", b"\x00\x00\x00\x00" + struct.pack(">IIII", 0, 0, 1000, 5000))
+    stbl = atom(b"stbl", chunk_table(table, offsets))
+    trak = atom(b"trak", atom(b"mdia", atom(b"minf", stbl)))
+    return atom(b"moov", mvhd + trak)
+
+
+def build_mp4_moov_last(table=b"stco"):
+    """Build an MP4 with moov after mdat; returns (bytes, chunk payloads)."""
+    ftyp = atom(b"ftyp", b"isom\x00\x00\x02\x00")
+    chunks = [b"CHUNK-ONE", b"CHUNK-TWO", b"CHUNK-THREE"]
+    mdat_payload = b"".join(chunks)
+    offsets = []
+    position = len(ftyp) + 8
+    for chunk in chunks:
+        offsets.append(position)
+        position += len(chunk)
+    data = ftyp + atom(b"mdat", mdat_payload) + build_moov(offsets, table)
+    return data, chunks
+
+
+def read_chunk_offsets(data):
+    """Find the chunk offset table in a serialized file."""
+    for table in (b"stco", b"co64"):
+        index = data.find(table)
+        if index >= 0:
+            count = struct.unpack_from(">I", data, index + 8)[0]
+            fmt = ">Q" if table == b"co64" else ">I"
+            size = struct.calcsize(fmt)
+            return [
+                struct.unpack_from(fmt, data, index + 12 + i * size)[0] for i in range(count)
+            ]
+    return []
+
+
+def top_level_atoms(path):
+    """Return the top-level atom types of a file."""
+    with open(path, "rb") as f:
+        size = f.seek(0, 2)
+        return [atom_type for atom_type, *_ in iter_atoms(f, 0, size)]
+
+
+def test_faststart_moves_moov_and_fixes_offsets(tmp_path):
+    """Test that moov moves before mdat and chunk offsets still hit the same bytes."""
+    data, chunks = build_mp4_moov_last()
+    path = tmp_path / "lecture.mp4"
+    path.write_bytes(data)
+
+    result = faststart.faststart(str(path))
+
+    assert result["rewritten"] is True
+    assert top_level_atoms(path) == [b"ftyp", b"moov", b"mdat"]
+    rewritten = path.read_bytes()
+    assert len(rewritten) == len(data)
+    for offset, chunk in zip(read_chunk_offsets(rewritten), chunks):
+        assert rewritten[offset:offset + len(chunk)] == chunk
+    assert mp4_duration(path) == 5.0
+
+
+def test_faststart_handles_co64(tmp_path):
+    """Test relocation of 64-bit chunk offset tables."""
+    data, chunks = build_mp4_moov_last(table=b"co64")
+    path = tmp_path / "lecture.mp4"
+    path.write_bytes(data)
+
+    assert faststart.faststart(str(path))["rewritten"] is True
+    rewritten = path.read_bytes()
+    for offset, chunk in zip(read_chunk_offsets(rewritten), chunks):
+        assert rewritten[offset:offset + len(chunk)] == chunk
+
+
+def test_faststart_noop_when_moov_first(tmp_path):
+    """Test that already-optimized files are left untouched."""
+    ftyp = atom(b"ftyp", b"isom\x00\x00\x02\x00")
+    data = ftyp + build_moov([100]) + atom(b"mdat", b"\x00" * 32)
+    path = tmp_path / "lecture.mp4"
+    path.write_bytes(data)
+
+    assert faststart.faststart(str(path))["rewritten"] is False
+    assert path.read_bytes() == data
+    assert faststart.needs_faststart(path) is False
+
+
+@pytest.mark.asyncio
+async def test_media_is_not_immutable_until_faststart_ran(tmp_path, monkeypatch):
+    """Test that browsers revalidate an upload the faststart job will still rewrite."""
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path))
+    name = "20250101_120000_lecture.mp4"
+    path = tmp_path / name
+    path.write_bytes(build_mp4_moov_last()[0])
+    assert faststart.needs_faststart(path) is True
+    file_cache.clear()
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        pending = await client.get(f"/api/notes/serve/{name}", headers={"Range": "bytes=0-7"})
+        faststart.faststart(str(path))
+        file_cache.invalidate(f"uploads/{name}")
+        done = await client.get(f"/api/notes/serve/{name}", headers={"Range": "bytes=0-7"})
+    file_cache.clear()
+
+    assert pending.status_code == done.status_code == 206
+    assert pending.headers["cache-control"] == "no-cache"
+    assert "immutable" in done.headers["cache-control"]
+
+
+def test_relocate_upgrades_stco_on_overflow():
+    """Test that offsets beyond 4GB force an stco -> co64 upgrade."""
+    payload = build_moov([16, 32])[8:]
+
+    def shift(offset):
+        return offset + 0x1_0000_0000
+
+    with pytest.raises(faststart._Overflow):
+        faststart.relocate_moov(payload, shift)
+
+    upgraded = faststart.relocate_moov(payload, shift, use_co64=True)
+    assert b"co64" in upgraded and b"stco" not in upgraded
+    assert read_chunk_offsets(upgraded) == [16 + 0x1_0000_0000, 32 + 0x1_0000_0000]
@@ -0,0 +1,323 @@
+"""Tests for attachment serving (Range requests and file responses)."""
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+
+from app.config import settings
+from app.main import app
+from app.services.file_cache import FileMetaCache, file_cache
+from app.services.hot_cache import HotFileCache, hot_cache
+from app.services.file_serving import (
+    RangeFileResponse,
+    RangeNotSatisfiable,
+    ZEROCOPY_EXTENSION,
+    parse_range_header,
+)
+
+FILE_BYTES = bytes(range(256)) * 40  # 10240 bytes
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    """Serve from a temporary upload directory holding one video file."""
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path))
+    (tmp_path / "lecture.mp4").write_bytes(FILE_BYTES)
+    file_cache.clear()
+    hot_cache.clear()
+    yield tmp_path
+    file_cache.clear()
+    hot_cache.clear()
+
+
+@pytest_asyncio.fixture
+async def client(upload_dir):
+    """HTTP client for routes that don't touch the database."""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_serve_full_file(client):
+    """Test serving a whole file without a Range header."""
+    response = await client.get("/api/notes/serve/lecture.mp4")
+    assert response.status_code == 200
+    assert response.content == FILE_BYTES
+    assert response.headers["content-length"] == str(len(FILE_BYTES))
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-type"] == "video/mp4"
+
+
+@pytest.mark.asyncio
+async def test_serve_partial_content(client):
+    """Test serving a byte range."""
+    response = await client.get("/api/notes/serve/lecture.mp4", headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.content == FILE_BYTES[100:200]
+    assert response.headers["content-range"] == f"bytes 100-199/{len(FILE_BYTES)}"
+
+
+@pytest.mark.asyncio
+async def test_serve_small_chunks(client, monkeypatch):
+    """Test that buffered reads reassemble correctly across chunk boundaries."""
+    monkeypatch.setattr(settings, "serve_chunk_size", 1000)
+    monkeypatch.setattr(settings, "hot_cache_bytes", 0)
+    response = await client.get("/api/notes/serve/lecture.mp4", headers={"Range": "bytes=10-"})
+    assert response.status_code == 206
+    assert response.content == FILE_BYTES[10:]
+
+
+@pytest.mark.asyncio
+async def test_serve_suffix_range(client):
+    """Test that bytes=-N returns the last N bytes."""
+    response = await client.get("/api/notes/serve/lecture.mp4", headers={"Range": "bytes=-500"})
+    assert response.status_code == 206
+    assert response.content == FILE_BYTES[-500:]
+    assert response.headers["content-range"] == f"bytes 9740-10239/{len(FILE_BYTES)}"
+
+
+@pytest.mark.asyncio
+async def test_serve_multiple_ranges(client):
+    """Test multipart/byteranges responses."""
+    response = await client.get(
+        "/api/notes/serve/lecture.mp4", headers={"Range": "bytes=0-9, 100-109"}
+    )
+    assert response.status_code == 206
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    boundary = content_type.split("boundary=")[1].encode()
+    assert int(response.headers["content-length"]) == len(response.content)
+
+    parts = response.content.split(b"--" + boundary)
+    assert parts[-1] == b"--\r\n"
+    bodies = [part.split(b"\r\n\r\n", 1) for part in parts[1:-1]]
+    assert b"Content-Range: bytes 0-9/10240" in bodies[0][0]
+    assert bodies[0][1] == FILE_BYTES[0:10] + b"\r\n"
+    assert b"Content-Range: bytes 100-109/10240" in bodies[1][0]
+    assert bodies[1][1] == FILE_BYTES[100:110] + b"\r\n"
+
+
+@pytest.mark.asyncio
+async def test_serve_unsatisfiable_range(client):
+    """Test 416 with the complete length in Content-Range."""
+    response = await client.get(
+        "/api/notes/serve/lecture.mp4", headers={"Range": "bytes=20000-"}
+    )
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(FILE_BYTES)}"
+
+
+@pytest.mark.asyncio
+async def test_serve_if_range(client):
+    """Test that a stale If-Range validator yields the full file."""
+    first = await client.get("/api/notes/serve/lecture.mp4")
+    etag = first.headers["etag"]
+
+    fresh = await client.get(
+        "/api/notes/serve/lecture.mp4", headers={"Range": "bytes=0-9", "If-Range": etag}
+    )
+    assert fresh.status_code == 206
+    assert fresh.content == FILE_BYTES[:10]
+
+    stale = await client.get(
+        "/api/notes/serve/lecture.mp4", headers={"Range": "bytes=0-9", "If-Range": '"stale"'}
+    )
+    assert stale.status_code == 200
+    assert stale.content == FILE_BYTES
+
+    by_date = await client.get(
+        "/api/notes/serve/lecture.mp4",
+        headers={"Range": "bytes=0-9", "If-Range": first.headers["last-modified"]},
+    )
+    assert by_date.status_code == 206
+
+
+@pytest.mark.asyncio
+async def test_serve_head(client):
+    """Test HEAD returns headers without a body."""
+    response = await client.head("/api/notes/serve/lecture.mp4")
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["content-length"] == str(len(FILE_BYTES))
+    assert response.headers["accept-ranges"] == "bytes"
+
+
+def test_parse_range_header():
+    """Test Range header parsing edge cases."""
+    assert parse_range_header("bytes=0-99", 1000) == [(0, 99)]
+    assert parse_range_header("bytes=900-2000", 1000) == [(900, 999)]
+    assert parse_range_header("bytes=-2000", 1000) == [(0, 999)]
+    assert parse_range_header("bytes=500-599,0-99,50-149", 1000) == [(0, 149), (500, 599)]
+    assert parse_range_header("bytes=0-9,10-19", 1000) == [(0, 19)]
+    assert parse_range_header("bytes=0-9,2000-", 1000) == [(0, 9)]
+    # Ignored headers
+    assert parse_range_header("items=0-9", 1000) is None
+    assert parse_range_header("bytes=9-0", 1000) is None
+    assert parse_range_header("bytes=abc", 1000) is None
+    assert parse_range_header("bytes=-", 1000) is None
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header("bytes=1000-", 1000)
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header("bytes=-0", 1000)
+
+
+@pytest.mark.asyncio
+async def test_serve_conditional_get(client):
+    """Test 304 responses for If-None-Match and If-Modified-Since."""
+    first = await client.get("/api/notes/serve/lecture.mp4")
+    assert first.headers["cache-control"] == "no-cache"
+
+    by_etag = await client.get(
+        "/api/notes/serve/lecture.mp4", headers={"If-None-Match": f'W/{first.headers["etag"]}'}
+    )
+    assert by_etag.status_code == 304
+    assert by_etag.content == b""
+    assert by_etag.headers["etag"] == first.headers["etag"]
+
+    by_date = await client.get(
+        "/api/notes/serve/lecture.mp4",
+        headers={"If-Modified-Since": first.headers["last-modified"]},
+    )
+    assert by_date.status_code == 304
+
+    changed = await client.get(
+        "/api/notes/serve/lecture.mp4", headers={"If-None-Match": '"other"'}
+    )
+    assert changed.status_code == 200
+    assert changed.content == FILE_BYTES
+
+
+@pytest.mark.asyncio
+async def test_serve_timestamped_upload_is_immutable(client, upload_dir):
+    """Test that timestamped upload names are cached as immutable."""
+    (upload_dir / "20250101_120000_slides.pdf").write_bytes(b"%PDF-1.4")
+    response = await client.get("/api/notes/serve/20250101_120000_slides.pdf")
+    assert response.status_code == 200
+    assert "immutable" in response.headers["cache-control"]
+    assert f"max-age={settings.attachment_max_age}" in response.headers["cache-control"]
+
+
+@pytest.mark.asyncio
+async def test_serve_path_traversal(client, upload_dir):
+    """Test that paths escaping the upload directory are refused."""
+    (upload_dir.parent / "secret.txt").write_bytes(b"secret")
+    response = await client.get("/api/notes/serve/%2E%2E/secret.txt")
+    assert response.status_code in (403, 404)
+    assert response.content != b"secret"
+
+    cache = FileMetaCache()
+    with pytest.raises(PermissionError):
+        await cache.lookup("../secret.txt")
+
+
+@pytest.mark.asyncio
+async def test_file_cache_hits_and_revalidates(upload_dir, monkeypatch):
+    """Test that lookups are cached and changes are picked up via mtime/size."""
+    monkeypatch.setattr(settings, "file_meta_ttl", 0)
+    cache = FileMetaCache()
+
+    first = await cache.lookup("lecture.mp4")
+    assert first.mime_type == "video/mp4"
+    assert first.stat_result.st_size == len(FILE_BYTES)
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    assert (await cache.lookup("lecture.mp4")).path == first.path
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    (upload_dir / "lecture.mp4").write_bytes(b"shorter")
+    assert (await cache.lookup("lecture.mp4")).stat_result.st_size == 7
+    assert cache.misses == 2
+
+    (upload_dir / "lecture.mp4").unlink()
+    with pytest.raises(FileNotFoundError):
+        await cache.lookup("lecture.mp4")
+
+
+@pytest.mark.asyncio
+async def test_file_cache_invalidate_and_bound(upload_dir, monkeypatch):
+    """Test invalidation by stored path and LRU bounding."""
+    monkeypatch.setattr(settings, "file_meta_cache_size", 2)
+    for name in ("a.png", "b.png", "c.png"):
+        (upload_dir / name).write_bytes(b"x")
+
+    cache = FileMetaCache()
+    for name in ("a.png", "b.png", "c.png"):
+        await cache.lookup(name)
+    assert list(cache.entries) == ["b.png", "c.png"]
+
+    cache.invalidate("uploads/c.png")
+    assert list(cache.entries) == ["b.png"]
+
+
+@pytest.mark.asyncio
+async def test_serve_from_hot_cache(client, upload_dir, admin_headers):
+    """Test that repeat requests for small files are answered from memory."""
+    first = await client.get("/api/notes/serve/lecture.mp4")
+    second = await client.get(
+        "/api/notes/serve/lecture.mp4", headers={"Range": "bytes=0-9, 20-29"}
+    )
+    assert first.content == FILE_BYTES
+    assert second.status_code == 206
+    assert hot_cache.hits == 1 and hot_cache.misses == 1
+    assert hot_cache.resident_bytes == len(FILE_BYTES)
+
+    stats = await client.get("/api/admin/cache", headers=admin_headers)
+    assert stats.json()["hot_files"]["hit_rate"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_hot_cache_budget_and_staleness(upload_dir, monkeypatch):
+    """Test LRU eviction by bytes and that changed files are reloaded."""
+    monkeypatch.setattr(settings, "hot_file_max_size", 100)
+    monkeypatch.setattr(settings, "hot_cache_bytes", 150)
+    monkeypatch.setattr(settings, "file_meta_ttl", 0)
+    meta = FileMetaCache()
+    cache = HotFileCache()
+    for name in ("a.svg", "b.svg"):
+        (upload_dir / name).write_bytes(b"x" * 60)
+
+    assert bytes(await cache.fetch(await meta.lookup("a.svg"))) == b"x" * 60
+    await cache.fetch(await meta.lookup("b.svg"))
+    await cache.fetch(await meta.lookup("a.svg"))
+    assert cache.resident_bytes == 120
+
+    (upload_dir / "c.svg").write_bytes(b"y" * 60)
+    await cache.fetch(await meta.lookup("c.svg"))
+    assert [path.name for path in cache.entries] == ["a.svg", "c.svg"]
+
+    (upload_dir / "a.svg").write_bytes(b"z" * 10)
+    assert bytes(await cache.fetch(await meta.lookup("a.svg"))) == b"z" * 10
+    assert await cache.fetch(await meta.lookup("lecture.mp4")) is None  # Too large
+
+
+@pytest.mark.asyncio
+async def test_serve_missing_file(client):
+    """Test that unknown files return 404."""
+    response = await client.get("/api/notes/serve/missing.mp4")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_range_response_uses_zerocopy_extension(upload_dir):
+    """Test that servers offering zero-copy send get the file handed over."""
+    messages = []
+
+    async def send(message):
+        if message["type"] == ZEROCOPY_EXTENSION:
+            file = message["file"]
+            file.seek(message["offset"])
+            message = {**message, "data": file.read(message["count"])}
+        messages.append(message)
+
+    response = RangeFileResponse(
+        upload_dir / "lecture.mp4", len(FILE_BYTES), ranges=[(5, 24)], status_code=206
+    )
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    scope = {"type": "http", "method": "GET", "extensions": {ZEROCOPY_EXTENSION: {}}}
+    await response(scope, receive, send)
+
+    assert messages[0]["status"] == 206
+    assert messages[1]["type"] == ZEROCOPY_EXTENSION
+    assert messages[1]["data"] == FILE_BYTES[5:25]
@@ -1,5 +1,6 @@
 """Tests for file upload and file viewer functionality."""
 import pytest
+import hashlib
 import io
 import os
 from pathlib import Path
@@ -98,6 +99,15 @@ async def test_upload_pdf_with_note(async_client):
     assert data["page_number"] == note_data["page_number"]
     assert "file_path" in data
     assert data["file_path"].endswith(".pdf")
+
+    # The attachment record was measured while the upload streamed to disk
+    attachment = data["attachments"][0]
+    assert attachment["path"] == data["file_path"]
+    assert attachment["name"] == "test_document.pdf"
+    assert attachment["size"] == len(MINIMAL_PDF)
+    assert attachment["mime_type"] == "application/pdf"
+    assert attachment["sha256"] == hashlib.sha256(MINIMAL_PDF).hexdigest()
+    assert attachment["uploaded_at"]
     
     # Store note_id for cleanup
     note_id = data["_id"]
@@ -374,3 +384,87 @@ async def test_note_without_file(async_client):
     
     print("✅ Note without file works correctly")
 
+
+@pytest.mark.asyncio
+async def test_create_note_with_multiple_files(async_client):
+    """Test uploading several files in a single create request."""
+    note_data = {
+        "title": "Multi File Test",
+        "content": "Slides and handout",
+    }
+
+    files = [
+        ("files", ("test_slide1.png", io.BytesIO(b"\x89PNG\r\n\x1a\n"), "image/png")),
+        ("files", ("test_slide2.png", io.BytesIO(b"\x89PNG\r\n\x1a\n"), "image/png")),
+        ("files", ("test_handout.pdf", io.BytesIO(MINIMAL_PDF), "application/pdf")),
+    ]
+
+    response = await async_client.post("/api/notes/", data=note_data, files=files)
+    assert response.status_code == 201, f"Upload failed: {response.text}"
+
+    data = response.json()
+    assert len(data["files"]) == 3
+    assert data["files"][0].endswith("test_slide1.png")
+    assert data["files"][2].endswith("test_handout.pdf")
+    assert data["file_path"] == data["files"][-1]
+
+
+@pytest.mark.asyncio
+async def test_add_multiple_files_to_note(async_client):
+    """Test appending a batch of files to an existing note in one request."""
+    create_response = await async_client.post(
+        "/api/notes/",
+        data={"title": "Batch Attach Test"},
+        files={"file": ("test_first.pdf", io.BytesIO(MINIMAL_PDF), "application/pdf")},
+    )
+    assert create_response.status_code == 201
+    note_id = create_response.json()["_id"]
+
+    files = [
+        ("files", (f"test_batch{i}.png", io.BytesIO(b"\x89PNG\r\n\x1a\n"), "image/png"))
+        for i in range(5)
+    ]
+    response = await async_client.post(f"/api/notes/{note_id}/file", files=files)
+    assert response.status_code == 200, f"Attach failed: {response.text}"
+
+    data = response.json()
+    assert len(data["files"]) == 6
+    assert data["files"][0].endswith("test_first.pdf")
+    assert data["file_path"].endswith("test_batch4.png")
+
+
+@pytest.mark.asyncio
+async def test_add_files_rejects_batch_with_invalid_type(async_client):
+    """Test that one disallowed file rejects the whole batch."""
+    create_response = await async_client.post("/api/notes/", data={"title": "Batch Reject"})
+    note_id = create_response.json()["_id"]
+
+    files = [
+        ("files", ("test_ok.png", io.BytesIO(b"\x89PNG\r\n\x1a\n"), "image/png")),
+        ("files", ("test_bad.exe", io.BytesIO(b"MZ\x90\x00"), "application/x-msdownload")),
+    ]
+    response = await async_client.post(f"/api/notes/{note_id}/file", files=files)
+    assert response.status_code == 400
+
+    get_response = await async_client.get(f"/api/notes/{note_id}")
+    assert get_response.json()["files"] == []
+
+
+@pytest.mark.asyncio
+async def test_get_single_pdf_page(async_client):
+    """Test extracting the linked page of a note's PDF."""
+    response = await async_client.post(
+        "/api/notes/",
+        data={"title": "Page Extract Test", "page_number": 1},
+        files={"file": ("test_pages.pdf", io.BytesIO(MINIMAL_PDF), "application/pdf")},
+    )
+    assert response.status_code == 201
+    note_id = response.json()["_id"]
+
+    page_response = await async_client.get(f"/api/notes/{note_id}/page/1")
+    assert page_response.status_code == 200
+    assert page_response.headers["content-type"] == "application/pdf"
+    assert page_response.content.startswith(b"%PDF")
+
+    missing = await async_client.get(f"/api/notes/{note_id}/page/5")
+    assert missing.status_code == 404
@@ -0,0 +1,87 @@
+"""Tests for the event loop stall detector."""
+import asyncio
+import time
+
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.main import app
+from app.services.loop_monitor import LoopMonitor, percentile
+from app.services.metrics import metrics
+
+
+@pytest.fixture
+async def monitor(monkeypatch):
+    """A running monitor with a fast heartbeat and a 50 ms stall threshold."""
+    monkeypatch.setattr(settings, "loop_monitor_interval", 0.01)
+    monkeypatch.setattr(settings, "loop_stall_ms", 50.0)
+    loop_monitor = LoopMonitor()
+    loop_monitor.start()
+    yield loop_monitor
+    await loop_monitor.stop()
+
+
+def blocking_call():
+    time.sleep(0.2)  # Stands in for synchronous I/O in a handler
+
+
+async def handler():
+    blocking_call()
+
+
+@pytest.mark.asyncio
+async def test_stall_records_blocking_stack(monitor):
+    """Test that a blocked loop is reported with the stack of the blocking call."""
+    await asyncio.sleep(0.05)
+    await asyncio.create_task(handler(), name="request")
+    await asyncio.sleep(0.05)
+
+    stats = monitor.stats()
+    assert stats["stalls"] == 1
+    stall = stats["recent"][0]
+    assert stall["lag_ms"] >= 150
+    assert stall["task"] == "request"
+    assert stall["stack"][-1].startswith("blocking_call (test_loop_monitor.py")
+    assert any(frame.startswith("handler (") for frame in stall["stack"])
+    assert stats["locations"][0] == {"location": stall["stack"][-1], "count": 1}
+    assert stats["lag_ms"]["max"] >= 150
+
+
+@pytest.mark.asyncio
+async def test_idle_loop_has_no_stalls(monitor):
+    """Test that a responsive loop only reports small lag."""
+    await asyncio.sleep(0.2)
+
+    stats = monitor.stats()
+    assert stats["stalls"] == 0 and stats["recent"] == []
+    assert stats["lag_ms"]["samples"] > 5
+    assert stats["lag_ms"]["p50"] < 50
+
+
+@pytest.mark.asyncio
+async def test_lag_is_exported_as_histogram(monitor):
+    """Test that heartbeats land in the loop lag histogram."""
+    before = sum(sum(counts) for _, (counts, _) in metrics.loop_lag.samples())
+    await asyncio.sleep(0.1)
+    after = sum(sum(counts) for _, (counts, _) in metrics.loop_lag.samples())
+    assert after > before
+
+
+@pytest.mark.asyncio
+async def test_admin_endpoint_reports_lag(admin_headers):
+    """Test the admin endpoint shape."""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/api/admin/loop", headers=admin_headers)
+
+    assert response.status_code == 200
+    assert {"p50", "p90", "p99", "max", "samples"} <= set(response.json()["lag_ms"])
+
+
+def test_percentile_nearest_rank():
+    """Test percentiles over a small window."""
+    values = [float(n) for n in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 50) == 0.0
+    assert percentile([7.0], 90) == 7.0
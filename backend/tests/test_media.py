@@ -0,0 +1,187 @@
+"""Tests for upload metadata extraction and the background job queue."""
+import struct
+import zlib
+
+import pytest
+
+from app.services import media
+from app.services.jobs import JobQueue, DONE, FAILED, QUEUED, RUNNING
+from notes import jobs as jobs_qry
+from tests.test_file_upload import MINIMAL_PDF
+
+
+def make_png(width, height):
+    """Build a PNG header with an IHDR chunk."""
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + ihdr + b"\x00" * 4
+
+
+def make_atom(atom_type, payload):
+    """Build an ISO BMFF atom."""
+    return struct.pack(">I4s", 8 + len(payload), atom_type) + payload
+
+
+def make_mp4(timescale, duration, moov_first=True):
+    """Build a tiny MP4 with an mvhd atom."""
+    mvhd = make_atom(b"mvhd", b"\x00\x00\x00\x00" + struct.pack(">IIII", 0, 0, timescale, duration))
+    moov = make_atom(b"moov", mvhd)
+    mdat = make_atom(b"mdat", b"\x00" * 64)
+    ftyp = make_atom(b"ftyp", b"isom\x00\x00\x02\x00")
+    return ftyp + (moov + mdat if moov_first else mdat + moov)
+
+
+def test_pdf_page_count(tmp_path):
+    """Test reading the page count of a simple PDF."""
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(MINIMAL_PDF)
+    assert media.pdf_page_count(path) == 1
+
+
+def make_object_stream_pdf(page_count):
+    """Build a PDF 1.5 whose objects all live in a compressed object stream."""
+    kids = " ".join(f"{n} 0 R" for n in range(3, 3 + page_count))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {page_count} >>".encode(),
+    ] + [b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] >>"] * page_count
+    offsets, body = [], b""
+    for obj in objects:
+        offsets.append(len(body))
+        body += obj + b"\n"
+    header = " ".join(f"{n} {offset}" for n, offset in enumerate(offsets, 1)).encode() + b"\n"
+    stream = zlib.compress(header + body)
+    stream_num, xref_num = len(objects) + 1, len(objects) + 2
+
+    pdf = b"%PDF-1.5\n"
+    stream_offset = len(pdf)
+    pdf += (
+        f"{stream_num} 0 obj\n<< /Type /ObjStm /N {len(objects)} /First {len(header)} "
+        f"/Filter /FlateDecode /Length {len(stream)} >>\nstream\n"
+    ).encode() + stream + b"\nendstream\nendobj\n"
+    xref_offset = len(pdf)
+    rows = [struct.pack(">BIH", 0, 0, 65535)]
+    rows += [struct.pack(">BIH", 2, stream_num, index) for index in range(len(objects))]
+    rows += [struct.pack(">BIH", 1, stream_offset, 0), struct.pack(">BIH", 1, xref_offset, 0)]
+    xref = b"".join(rows)
+    pdf += (
+        f"{xref_num} 0 obj\n<< /Type /XRef /Size {xref_num + 1} /W [1 4 2] /Root 1 0 R "
+        f"/Length {len(xref)} >>\nstream\n"
+    ).encode() + xref + b"\nendstream\nendobj\n"
+    return pdf + f"startxref\n{xref_offset}\n%%EOF\n".encode()
+
+
+def test_pdf_page_count_in_object_stream(tmp_path):
+    """Test page count when the page tree lives in a compressed object stream."""
+    path = tmp_path / "compressed.pdf"
+    path.write_bytes(make_object_stream_pdf(3))
+    assert media.pdf_page_count(path) == 3
+
+
+def test_pdf_page_count_of_damaged_file(tmp_path):
+    """Test that an unreadable PDF has no page count instead of failing the job."""
+    path = tmp_path / "broken.pdf"
+    path.write_bytes(b"%PDF-1.5\n" + zlib.compress(b"\x00" * 1024 * 1024) + b"\n%%EOF\n")
+    assert media.pdf_page_count(path) is None
+
+
+def test_image_dimensions_png(tmp_path):
+    """Test reading PNG dimensions."""
+    path = tmp_path / "slide.png"
+    path.write_bytes(make_png(1920, 1080))
+    assert media.image_dimensions(path) == (1920, 1080)
+
+
+def test_image_dimensions_gif_and_svg(tmp_path):
+    """Test reading GIF and SVG dimensions."""
+    gif = tmp_path / "anim.gif"
+    gif.write_bytes(b"GIF89a" + struct.pack("<HH", 320, 240) + b"\x00" * 10)
+    assert media.image_dimensions(gif) == (320, 240)
+
+    svg = tmp_path / "diagram.svg"
+    svg.write_bytes(b'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 400 300"></svg>')
+    assert media.image_dimensions(svg) == (400, 300)
+
+
+def test_image_dimensions_jpeg(tmp_path):
+    """Test reading JPEG dimensions from the SOF0 segment."""
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+    sof0 = b"\xff\xc0" + struct.pack(">HBHH", 17, 8, 600, 800) + b"\x00" * 10
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(b"\xff\xd8" + app0 + sof0)
+    assert media.image_dimensions(path) == (800, 600)
+
+
+@pytest.mark.parametrize("moov_first", [True, False])
+def test_mp4_duration(tmp_path, moov_first):
+    """Test reading the MP4 duration wherever the moov atom is."""
+    path = tmp_path / "lecture.mp4"
+    path.write_bytes(make_mp4(1000, 90500, moov_first))
+    assert media.mp4_duration(path) == 90.5
+
+
+def test_probe_file(tmp_path):
+    """Test that probe_file dispatches on extension and reports size."""
+    path = tmp_path / "slide.png"
+    path.write_bytes(make_png(64, 32))
+    meta = media.probe_file(str(path))
+    assert meta == {"size": path.stat().st_size, "width": 64, "height": 32}
+
+
+@pytest.mark.asyncio
+async def test_job_queue_runs_in_process_pool(tmp_path):
+    """Test that jobs run in the pool, call back, and report status."""
+    path = tmp_path / "slide.png"
+    path.write_bytes(make_png(10, 20))
+    results = []
+
+    async def on_done(meta):
+        results.append(meta)
+
+    queue = JobQueue()
+    queue.start(workers=1)
+    try:
+        ok_id = queue.submit("metadata", media.probe_file, str(path), on_done=on_done)
+        bad_id = queue.submit("metadata", media.probe_file, str(tmp_path / "missing.png"))
+        await queue.join()
+    finally:
+        await queue.stop()
+
+    assert queue.get(ok_id)["status"] == DONE
+    assert queue.get(ok_id)["result"]["width"] == 10
+    assert results == [queue.get(ok_id)["result"]]
+    assert queue.get(bad_id)["status"] == FAILED
+
+
+@pytest.mark.asyncio
+async def test_job_records_are_stored(tmp_path, monkeypatch):
+    """Test that a job's record is written when queued, started and finished."""
+    path = tmp_path / "slide.png"
+    path.write_bytes(make_png(10, 20))
+    writes = []
+
+    async def insert(job):
+        writes.append(("insert", job["status"]))
+
+    async def save(job):
+        writes.append(("save", job["status"]))
+
+    monkeypatch.setattr(jobs_qry, "insert", insert)
+    monkeypatch.setattr(jobs_qry, "save", save)
+    queue = JobQueue()
+    queue.start(workers=1)
+    try:
+        queue.submit("metadata", media.probe_file, str(path))
+        await queue.join()
+    finally:
+        await queue.stop()
+
+    assert ("insert", QUEUED) in writes
+    assert [status for write, status in writes if write == "save"] == [RUNNING, DONE]
+
+
+def test_job_queue_not_running():
+    """Test that submitting to a stopped queue is a no-op."""
+    queue = JobQueue()
+    assert queue.submit("metadata", media.probe_file, "x.png") is None
+    with pytest.raises(KeyError):
+        queue.get("missing")
@@ -0,0 +1,139 @@
+"""Tests for the Prometheus metrics registry, Mongo listener and /metrics endpoint."""
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.main import app
+from app.services.metrics import (
+    Counter, Histogram, Metrics, MongoCommandListener, merge, metrics, render,
+)
+
+
+def test_histogram_buckets_and_render():
+    """Test bucket placement (le is inclusive) and cumulative exposition."""
+    histogram = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "/a")
+
+    text = render({"latency_seconds": {
+        "type": "histogram", "help": "Latency.", "labels": ["route"], "buckets": [0.1, 1.0],
+        "samples": histogram.samples(),
+    }})
+
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{route="/a",le="1"} 3' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{route="/a"} 4' in text
+    assert 'latency_seconds_sum{route="/a"} 3.65' in text
+    assert "# TYPE latency_seconds histogram" in text
+
+
+def test_histogram_shards_per_thread():
+    """Test that observations from several threads land in separate shards and sum up."""
+    histogram = Histogram("h", "H.")
+
+    def observe():
+        for _ in range(1000):
+            histogram.observe(0.2)
+
+    threads = [threading.Thread(target=observe) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(histogram.shards) == 4
+    [(labels, (counts, total))] = histogram.samples()
+    assert sum(counts) == 4000
+
+
+def test_label_values_are_escaped():
+    """Test escaping of quotes, backslashes and newlines in label values."""
+    counter = Counter("c_total", "C.", ("path",))
+    counter.inc('a"b\\c\nd')
+    text = render({"c_total": {
+        "type": "counter", "help": "C.", "labels": ["path"], "buckets": [],
+        "samples": counter.samples(),
+    }})
+    assert 'c_total{path="a\\"b\\\\c\\nd"} 1' in text
+
+
+def test_merge_sums_worker_snapshots():
+    """Test that counters and histograms from several workers are added together."""
+    first, second = Metrics(), Metrics()
+    first.upload_bytes.inc(amount=100)
+    second.upload_bytes.inc(amount=50)
+    first.request_duration.observe(0.02, "GET", "/", "200")
+    second.request_duration.observe(0.02, "GET", "/", "200")
+    second.request_duration.observe(0.02, "GET", "/health", "200")
+
+    merged = merge([json.loads(json.dumps(m.snapshot())) for m in (first, second)])
+
+    assert merged["notka_upload_bytes_total"]["samples"] == [([], 150)]
+    durations = dict(
+        (tuple(labels), value)
+        for labels, value in merged["notka_http_request_duration_seconds"]["samples"]
+    )
+    assert sum(durations[("GET", "/", "200")][0]) == 2
+    assert sum(durations[("GET", "/health", "200")][0]) == 1
+
+
+def test_collect_merges_live_workers(tmp_path, monkeypatch):
+    """Test the shared snapshot directory: live workers are merged, dead ones dropped."""
+    monkeypatch.setattr(settings, "metrics_dir", str(tmp_path))
+    other = Metrics()
+    other.served_bytes.inc(amount=7)
+    (tmp_path / "1.json").write_text(json.dumps(other.snapshot()))  # init: always alive
+    (tmp_path / "999999999.json").write_text(json.dumps(other.snapshot()))
+
+    ours = Metrics()
+    ours.served_bytes.inc(amount=3)
+    collected = ours.collect()
+
+    assert collected["notka_served_bytes_total"]["samples"] == [([], 10)]
+    assert not (tmp_path / "999999999.json").exists()
+
+
+def test_mongo_listener_times_commands():
+    """Test that command latencies are recorded by command, collection and outcome."""
+    histogram = Histogram("mongo", "Mongo.", ("command", "collection", "outcome"))
+    listener = MongoCommandListener(histogram)
+
+    def event(name, command, request_id, micros=0):
+        return SimpleNamespace(
+            command_name=name, command=command, connection_id=("localhost", 27017),
+            request_id=request_id, duration_micros=micros,
+        )
+
+    listener.started(event("find", {"find": "notes", "filter": {}}, 1))
+    listener.succeeded(event("find", None, 1, micros=2500))
+    listener.started(event("getMore", {"getMore": 123, "collection": "notes"}, 2))
+    listener.failed(event("getMore", None, 2, micros=100))
+
+    samples = dict(histogram.samples())
+    assert samples[("find", "notes", "ok")][1] == pytest.approx(0.0025)
+    assert ("getMore", "notes", "error") in samples
+    assert listener.collections == {}
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_reports_requests():
+    """Test that requests are timed per route template and exposed at /metrics."""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.get("/")
+        await client.get("/no/such/path")
+        response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert 'notka_http_request_duration_seconds_count{method="GET",route="/",status="200"}' \
+        in text
+    assert 'route="unmatched",status="404"' in text
+    assert metrics.requests_in_flight.values[("GET", "/")] == 0
+    # The scrape itself is in flight while it renders
+    assert 'notka_http_requests_in_flight{method="GET",route="/metrics"} 1' in text
@@ -0,0 +1,113 @@
+"""Tests for X-Accel-Redirect / X-Sendfile offload mode, via a stand-in proxy."""
+from pathlib import Path
+from urllib.parse import unquote
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+
+from app.config import settings
+from app.main import app
+from app.services.file_cache import file_cache
+
+FILE_BYTES = b"lecture video bytes" * 100
+
+
+class StandInProxy:
+    """
+    Minimal stand-in for nginx: forwards to the app and, when the app answers
+    with X-Accel-Redirect / X-Sendfile, replaces the body with the named file.
+    """
+
+    def __init__(self, app, internal_prefix, root):
+        self.app = app
+        self.internal_prefix = internal_prefix
+        self.root = Path(root)
+        self.offloaded = []
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = {}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif not message.get("more_body", False):
+                headers = dict(start["headers"])
+                target = headers.get(b"x-accel-redirect") or headers.get(b"x-sendfile")
+                if target is None:
+                    await send(start)
+                    await send(message)
+                    return
+                body = self._read(target.decode())
+                self.offloaded.append(target.decode())
+                kept = [
+                    (k, v) for k, v in start["headers"]
+                    if k not in (b"content-length", b"x-accel-redirect", b"x-sendfile")
+                ]
+                kept.append((b"content-length", str(len(body)).encode()))
+                await send({**start, "headers": kept})
+                await send({"type": "http.response.body", "body": body})
+            # Intermediate body chunks are dropped: offload responses have none
+
+        await self.app(scope, receive, capture)
+
+    def _read(self, target):
+        if target.startswith(self.internal_prefix):
+            return (self.root / unquote(target[len(self.internal_prefix):])).read_bytes()
+        return Path(target).read_bytes()
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    """Temporary upload directory holding one file."""
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path))
+    (tmp_path / "20250101_120000_my lecture.mp4").write_bytes(FILE_BYTES)
+    file_cache.clear()
+    yield tmp_path
+    file_cache.clear()
+
+
+@pytest_asyncio.fixture
+async def proxy(upload_dir):
+    """Stand-in proxy in front of the app."""
+    return StandInProxy(app, "/protected-uploads/", upload_dir)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["x-accel-redirect", "x-sendfile"])
+async def test_offload_mode_streams_through_proxy(proxy, monkeypatch, mode):
+    """Test that the app sends only a header and the proxy delivers the bytes."""
+    monkeypatch.setattr(settings, "file_offload", mode)
+    async with AsyncClient(app=proxy, base_url="http://test") as client:
+        response = await client.get("/api/notes/serve/20250101_120000_my%20lecture.mp4")
+
+    assert response.status_code == 200
+    assert response.content == FILE_BYTES
+    assert response.headers["content-type"] == "video/mp4"
+    assert "immutable" in response.headers["cache-control"]
+    if mode == "x-accel-redirect":
+        assert proxy.offloaded == ["/protected-uploads/20250101_120000_my%20lecture.mp4"]
+    else:
+        assert proxy.offloaded[0].endswith("20250101_120000_my lecture.mp4")
+
+
+@pytest.mark.asyncio
+async def test_offload_mode_still_checks_paths(proxy, monkeypatch):
+    """Test that traversal and missing files are refused before offloading."""
+    monkeypatch.setattr(settings, "file_offload", "x-accel-redirect")
+    async with AsyncClient(app=proxy, base_url="http://test") as client:
+        missing = await client.get("/api/notes/serve/missing.mp4")
+    assert missing.status_code == 404
+    assert proxy.offloaded == []
+
+
+@pytest.mark.asyncio
+async def test_offload_disabled_serves_directly(upload_dir):
+    """Test that the default mode sends the body from Python."""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/api/notes/serve/20250101_120000_my%20lecture.mp4")
+    assert response.content == FILE_BYTES
+    assert "x-accel-redirect" not in response.headers
@@ -0,0 +1,110 @@
+"""Tests for the orphaned upload collector."""
+import importlib
+import os
+import time
+
+import pytest
+
+from app.config import settings
+from app.services.orphan_gc import OrphanCollector, merge_runs, owner_name, write_sorted_runs
+from notes import queries as qry
+
+gc_module = importlib.import_module("app.services.orphan_gc")  # Package re-exports the instance
+OLD = time.time() - 7 * 24 * 60 * 60
+
+
+def make_file(directory, name, size=100, mtime=OLD):
+    path = directory / name
+    path.write_bytes(b"x" * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    """Temporary upload directory, collected without throttling in small runs."""
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "gc_grace_period", 24 * 60 * 60)
+    monkeypatch.setattr(settings, "gc_delete_rate", 0)
+    monkeypatch.setattr(gc_module, "RUN_SIZE", 3)  # Force several sorted runs
+    return tmp_path
+
+
+def use_references(monkeypatch, names):
+    async def referenced_file_names(batch_size=1000):
+        for name in sorted(set(names)):
+            yield name
+    monkeypatch.setattr(qry, "referenced_file_names", referenced_file_names)
+
+
+def test_owner_name():
+    """Test that compressed variants belong to their attachment."""
+    assert owner_name("a.svg.br") == "a.svg"
+    assert owner_name("a.svg.gz") == "a.svg"
+    assert owner_name("a.pdf") == "a.pdf"
+
+
+def test_sorted_runs_merge_in_order(upload_dir):
+    """Test that bounded runs merge back into one sorted stream."""
+    for name in ["e.pdf", "a.pdf", "d.pdf", "c.pdf", "b.pdf", "b.pdf.gz", ".gitkeep"]:
+        make_file(upload_dir, name)
+    make_file(upload_dir, "new.pdf", mtime=time.time())
+
+    runs = write_sorted_runs(upload_dir, time.time() - 60, str(upload_dir.parent))
+    try:
+        merged = list(merge_runs(runs))
+    finally:
+        for run in runs:
+            os.remove(run)
+
+    assert len(runs) == 2
+    assert [name for _, name in merged] == [
+        "a.pdf", "b.pdf", "b.pdf.gz", "c.pdf", "d.pdf", "e.pdf"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_collects_only_old_unreferenced_files(upload_dir, monkeypatch):
+    """Test that referenced files, their variants and young files survive."""
+    make_file(upload_dir, "kept.pdf")
+    make_file(upload_dir, "diagram.svg")
+    make_file(upload_dir, "diagram.svg.br")
+    make_file(upload_dir, "orphan1.pdf", size=1000)
+    make_file(upload_dir, "orphan2.mp4", size=2000)
+    make_file(upload_dir, "orphan2.mp4.gz", size=30)
+    make_file(upload_dir, "fresh.pdf", mtime=time.time())
+    use_references(monkeypatch, ["kept.pdf", "diagram.svg", "missing_on_disk.pdf"])
+
+    result = await OrphanCollector().run()
+
+    assert result["orphans"] == result["deleted"] == 3
+    assert result["bytes_reclaimed"] == 3030
+    assert sorted(p.name for p in upload_dir.iterdir()) == [
+        "diagram.svg", "diagram.svg.br", "fresh.pdf", "kept.pdf"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_dry_run_keeps_files(upload_dir, monkeypatch):
+    """Test that a dry run only counts orphans."""
+    make_file(upload_dir, "orphan.pdf")
+    use_references(monkeypatch, ["other.pdf"])
+
+    result = await OrphanCollector().run(dry_run=True)
+
+    assert result["orphans"] == 1
+    assert result["deleted"] == result["bytes_reclaimed"] == 0
+    assert (upload_dir / "orphan.pdf").exists()
+
+
+@pytest.mark.asyncio
+async def test_no_references_at_all_deletes_nothing(upload_dir, monkeypatch):
+    """Test the guard against pointing the collector at an empty database."""
+    make_file(upload_dir, "a.pdf")
+    use_references(monkeypatch, [])
+
+    result = await OrphanCollector().run()
+
+    assert result["dry_run"] is True
+    assert result["orphans"] == 1
+    assert (upload_dir / "a.pdf").exists()
@@ -0,0 +1,122 @@
+"""Tests for page text extraction and page-level search."""
+import zipfile
+
+import pytest
+
+from app.services import text_extract
+from app.services.page_index import PageIndex
+from notes import pages as pages_qry
+from tests.test_file_upload import MINIMAL_PDF
+
+SLIDE_XML = (
+    '<p:sld xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+    'xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main">'
+    '<p:cSld><p:spTree><p:sp><p:txBody>{}</p:txBody></p:sp></p:spTree></p:cSld></p:sld>'
+)
+
+
+def make_pptx(path, slides):
+    """Write a minimal PPTX containing one text body per slide."""
+    with zipfile.ZipFile(path, "w") as deck:
+        deck.writestr("[Content_Types].xml", "<Types/>")
+        for number, paragraphs in enumerate(slides, start=1):
+            body = "".join(f"<a:p><a:r><a:t>{text}</a:t></a:r></a:p>" for text in paragraphs)
+            deck.writestr(f"ppt/slides/slide{number}.xml", SLIDE_XML.format(body))
+
+
+def test_extract_pptx_slides_in_order(tmp_path):
+    """Test that slides come back in numeric (not lexical) order."""
+    path = tmp_path / "deck.pptx"
+    make_pptx(path, [[f"Slide {n}"] for n in range(1, 12)])
+    slides = text_extract.extract_pages(str(path))
+    assert len(slides) == 11
+    assert slides[1] == "Slide 2"
+    assert slides[10] == "Slide 11"
+
+
+def test_extract_pdf_pages(tmp_path):
+    """Test extracting text from a PDF page."""
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(MINIMAL_PDF)
+    assert text_extract.extract_pages(str(path)) == ["Test PDF"]
+
+
+@pytest.mark.asyncio
+async def test_search_requires_all_terms(monkeypatch):
+    """Test that search asks page_text for pages with every query word and builds results."""
+    queries = []
+
+    class Cursor:
+        def __init__(self, docs):
+            self.docs = docs
+
+        def sort(self, keys):
+            queries.append(("sort", keys))
+            return self
+
+        def limit(self, n):
+            queries.append(("limit", n))
+            return self
+
+        async def to_list(self, length):
+            return self.docs
+
+    class Collection:
+        def find(self, query, projection):
+            queries.append(("find", query))
+            return Cursor([{
+                pages_qry.FILE_PATH: "uploads/algo.pptx", pages_qry.NOTE_ID: "n1",
+                pages_qry.PAGE: 2, pages_qry.TEXT: "Quicksort partitions around a pivot",
+                "score": 1.5,
+            }])
+
+    async def get_collection():
+        return Collection()
+
+    monkeypatch.setattr(pages_qry, "get_collection", get_collection)
+    results = await PageIndex().search("QuickSort pivot quicksort", limit=5)
+
+    assert results == [{
+        "file_path": "uploads/algo.pptx", "note_id": "n1", "page": 2,
+        "snippet": "Quicksort partitions around a pivot",
+    }]
+    (_, query), (_, sort), (_, limit) = queries
+    assert query["$text"] == {"$search": "quicksort pivot"}
+    assert query["$and"] == [
+        {pages_qry.TEXT: {"$regex": "quicksort", "$options": "i"}},
+        {pages_qry.TEXT: {"$regex": "pivot", "$options": "i"}},
+    ]
+    assert sort[0] == ("score", {"$meta": "textScore"}) and limit == 5
+
+    queries.clear()
+    assert await PageIndex().search("   ") == []
+    assert queries == []
+
+
+def test_snippet_is_windowed():
+    """Test that snippets are trimmed around the match."""
+    text = "x " * 200 + "needle" + " y" * 200
+    snippet = PageIndex.snippet(text, ["needle"])
+    assert "needle" in snippet
+    assert snippet.startswith("…") and snippet.endswith("…")
+    assert len(snippet) < len(text)
+
+
+@pytest.mark.asyncio
+async def test_page_text_indexes(monkeypatch):
+    """Test that startup indexes the file path and the text for search."""
+    created = []
+
+    class Collection:
+        async def create_index(self, keys, **kwargs):
+            created.append((keys, kwargs))
+
+    async def get_collection():
+        return Collection()
+
+    monkeypatch.setattr(pages_qry, "get_collection", get_collection)
+    await pages_qry.create_indexes()
+    assert created == [
+        (pages_qry.FILE_PATH, {}),
+        ([(pages_qry.TEXT, "text")], {"default_language": "none"}),
+    ]
@@ -0,0 +1,56 @@
+"""Tests for single-page PDF extraction and the page cache."""
+import pytest
+from pypdf import PdfReader, PdfWriter
+
+from app.config import settings
+from app.services.pdf_pages import PageCache, extract_page
+
+
+def make_pdf(path, page_count):
+    """Write a PDF with blank pages of increasing width (to tell them apart)."""
+    writer = PdfWriter()
+    for number in range(1, page_count + 1):
+        writer.add_blank_page(width=100 + number, height=100)
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def test_extract_page(tmp_path):
+    """Test that exactly the requested page is written."""
+    source = tmp_path / "deck.pdf"
+    make_pdf(source, 5)
+    dest = tmp_path / "out" / "deck.pdf.p3.pdf"
+
+    result = extract_page(str(source), str(dest), 3)
+
+    assert result["page_count"] == 5
+    reader = PdfReader(str(dest))
+    assert len(reader.pages) == 1
+    assert float(reader.pages[0].mediabox.width) == 103
+
+
+def test_extract_page_out_of_range(tmp_path):
+    """Test that missing pages raise IndexError and write nothing."""
+    source = tmp_path / "deck.pdf"
+    make_pdf(source, 2)
+    dest = tmp_path / "deck.pdf.p9.pdf"
+    with pytest.raises(IndexError):
+        extract_page(str(source), str(dest), 9)
+    assert not dest.exists()
+
+
+@pytest.mark.asyncio
+async def test_page_cache_discard_file(tmp_path, monkeypatch):
+    """Test that all cached pages of one file are dropped together."""
+    monkeypatch.setattr(settings, "page_cache_dir", str(tmp_path))
+    cache = PageCache()
+    cache.load()
+    for key in [("uploads/a.pdf", 1), ("uploads/a.pdf", 12), ("uploads/ab.pdf", 1)]:
+        cache.path_for(key).write_bytes(b"%PDF")
+        cache.add(key)
+
+    await cache.discard_file("uploads/a.pdf")
+
+    assert cache.get(("uploads/a.pdf", 1)) is None
+    assert cache.get(("uploads/a.pdf", 12)) is None
+    assert cache.get(("uploads/ab.pdf", 1)) is not None
@@ -0,0 +1,108 @@
+"""Tests for preview generation and the on-disk preview cache."""
+import pytest
+from PIL import Image
+
+from app.config import settings
+from app.services.previews import PreviewCache, make_preview
+
+
+@pytest.fixture
+def preview_dir(tmp_path, monkeypatch):
+    """Point the preview cache at a temporary directory."""
+    directory = tmp_path / "previews"
+    monkeypatch.setattr(settings, "preview_dir", str(directory))
+    return directory
+
+
+def test_make_preview_downscales_image(tmp_path):
+    """Test that large images become small WebP thumbnails."""
+    source = tmp_path / "slide.png"
+    Image.new("RGB", (2000, 1000), "white").save(source)
+    dest = tmp_path / "slide.png.webp"
+
+    result = make_preview(str(source), str(dest), 320)
+
+    assert result["preview"] is True
+    assert (result["width"], result["height"]) == (320, 160)
+    with Image.open(dest) as preview:
+        assert preview.format == "WEBP"
+    assert dest.stat().st_size < source.stat().st_size
+
+
+def test_make_preview_unsupported_type(tmp_path):
+    """Test that unsupported types report no preview."""
+    source = tmp_path / "lecture.mp4"
+    source.write_bytes(b"\x00" * 16)
+    assert make_preview(str(source), str(tmp_path / "out.webp"), 320) == {"preview": False}
+
+
+def test_cache_evicts_least_recently_used(preview_dir, monkeypatch):
+    """Test LRU eviction once the byte budget is exceeded."""
+    monkeypatch.setattr(settings, "preview_cache_bytes", 250)
+    cache = PreviewCache()
+    cache.load()
+
+    for name in ("a.png", "b.png", "c.png"):
+        cache.path_for(f"uploads/{name}").write_bytes(b"x" * 100)
+        cache.add(f"uploads/{name}")
+        if name == "b.png":
+            assert cache.get("uploads/a.png") is not None  # a becomes most recent
+
+    assert cache.get("uploads/b.png") is None
+    assert not cache.path_for("uploads/b.png").exists()
+    assert cache.get("uploads/a.png") is not None
+    assert cache.get("uploads/c.png") is not None
+    assert cache.total_bytes == 200
+
+
+@pytest.mark.asyncio
+async def test_cache_load_and_discard(preview_dir):
+    """Test that existing previews are picked up at startup and can be removed."""
+    preview_dir.mkdir()
+    (preview_dir / "old.png.webp").write_bytes(b"x" * 10)
+
+    cache = PreviewCache()
+    cache.load()
+    assert cache.get("uploads/old.png") == preview_dir / "old.png.webp"
+
+    await cache.discard("uploads/old.png")
+    assert cache.get("uploads/old.png") is None
+    assert cache.total_bytes == 0
+    assert not (preview_dir / "old.png.webp").exists()
+
+
+def test_cache_adopts_files_of_other_workers(preview_dir):
+    """Test that a preview another worker wrote is a hit, not a regeneration."""
+    writer, reader = PreviewCache(), PreviewCache()
+    writer.load()
+    reader.load()
+    writer.path_for("uploads/a.png").write_bytes(b"x" * 10)
+    writer.add("uploads/a.png")
+
+    assert reader.get("uploads/a.png") == preview_dir / "a.png.webp"
+    assert reader.total_bytes == 10
+
+
+@pytest.mark.asyncio
+async def test_only_the_evicting_worker_deletes(preview_dir, monkeypatch):
+    """Test that the directory budget is enforced by one process over every worker's files."""
+    monkeypatch.setattr(settings, "preview_cache_bytes", 250)
+    monkeypatch.setattr(settings, "disk_cache_sweep_interval", 0)
+    preview_dir.mkdir()
+    (preview_dir / "old.png.webp").write_bytes(b"x" * 100)
+    holder, other = PreviewCache(), PreviewCache()
+    await holder.start(evict=True)
+    await other.start(evict=False)
+
+    for name in ("a.png", "b.png", "c.png"):
+        other.path_for(f"uploads/{name}").write_bytes(b"x" * 100)
+        other.add(f"uploads/{name}")
+    assert len(list(preview_dir.iterdir())) == 4  # Over budget, but not ours to evict
+
+    await holder.sweep()
+
+    assert sorted(p.name for p in preview_dir.iterdir()) == ["b.png.webp", "c.png.webp"]
+    assert holder.total_bytes == 200
+    assert other.get("uploads/a.png") is None
+    await holder.stop()
+    await other.stop()
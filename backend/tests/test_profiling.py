@@ -0,0 +1,117 @@
+"""Tests for on-demand request profiling."""
+import asyncio
+import time
+from collections import Counter
+
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.main import app
+from app.services.profiling import profiles
+from notes import queries as qry
+
+
+@pytest.fixture
+def profiling(tmp_path, monkeypatch):
+    """Profiles written to a temporary directory, triggered by a test token."""
+    monkeypatch.setattr(settings, "profile_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "profile_token", "secret")
+    monkeypatch.setattr(settings, "profile_sample_rate", 0.0)
+    monkeypatch.setattr(settings, "profile_interval", 0.001)
+    monkeypatch.setattr(profiles, "active", None)
+
+    def busy_loop():
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+
+    async def get_all():
+        busy_loop()  # On the CPU, blocking the loop
+        await asyncio.sleep(0.05)  # Suspended
+        return []
+
+    monkeypatch.setattr(qry, "get_all", get_all)
+    return tmp_path
+
+
+async def finished_profile():
+    """Wait for the active sampler to write its profile."""
+    await asyncio.to_thread(profiles.active.join, 5)
+    assert not profiles.active.is_alive()
+
+
+@pytest.mark.asyncio
+async def test_header_profiles_request(profiling, admin_headers):
+    """Test that a request with the token is sampled both running and awaiting."""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/api/notes/", headers={"X-Profile": "secret"})
+        assert response.status_code == 200
+        profile_id = response.headers["x-profile-id"]
+        await finished_profile()
+
+        listed = (
+            await client.get("/api/admin/profiles", headers=admin_headers)
+        ).json()
+        stacks = await client.get(f"/api/admin/profiles/{profile_id}", headers=admin_headers)
+
+    assert [meta["id"] for meta in listed] == [profile_id]
+    assert listed[0]["trigger"] == "header"
+    assert listed[0]["route"] == "/api/notes/" and listed[0]["status"] == 200
+    assert listed[0]["samples"] > 0
+
+    lines = stacks.text.splitlines()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("busy_loop (test_profiling.py" in line for line in lines)
+    assert any(line.rsplit(" ", 1)[0].endswith("[await]") for line in lines)
+
+
+@pytest.mark.asyncio
+async def test_requests_without_trigger_are_not_profiled(profiling, admin_headers):
+    """Test that wrong tokens and other paths never start the sampler."""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        wrong = await client.get("/api/notes/", headers={"X-Profile": "guess"})
+        other = await client.get(
+            "/api/admin/streams", headers={**admin_headers, "X-Profile": "secret"}
+        )
+
+    assert "x-profile-id" not in wrong.headers
+    assert "x-profile-id" not in other.headers
+    assert profiles.active is None
+
+
+@pytest.mark.asyncio
+async def test_sample_rate_profiles_without_header(profiling, monkeypatch):
+    """Test random sampling of requests."""
+    monkeypatch.setattr(settings, "profile_sample_rate", 1.0)
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/api/notes/")
+    await finished_profile()
+
+    assert profiles.list()[0]["id"] == response.headers["x-profile-id"]
+    assert profiles.list()[0]["trigger"] == "sample"
+
+
+@pytest.mark.asyncio
+async def test_unknown_profile_is_404(profiling, admin_headers):
+    """Test that missing and path-like IDs are not found."""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        missing = await client.get("/api/admin/profiles/123-abc", headers=admin_headers)
+        traversal = await client.get(
+            "/api/admin/profiles/..%2F..%2Fetc%2Fpasswd", headers=admin_headers
+        )
+
+    assert missing.status_code == 404
+    assert traversal.status_code == 404
+
+
+def test_retention_keeps_newest(profiling, monkeypatch):
+    """Test that only the newest profile_keep profiles stay on disk."""
+    monkeypatch.setattr(settings, "profile_keep", 2)
+    for n in range(4):
+        profiles.save({"id": f"100{n}-aa"}, Counter({"main (app.py:1)": n + 1}))
+
+    assert [meta["id"] for meta in profiles.list()] == ["1003-aa", "1002-aa"]
+    assert sorted(path.name for path in profiling.iterdir()) == [
+        "1002-aa.folded", "1002-aa.json", "1003-aa.folded", "1003-aa.json",
+    ]
@@ -0,0 +1,133 @@
+"""Tests for the production server configuration and coordination between workers."""
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.main import app
+from app.services.jobs import JobQueue
+from app.services.maintenance import MaintenanceLock, fcntl, maintenance_lock
+from app.services.orphan_gc import orphan_gc
+from notes import jobs as jobs_qry
+
+server = pytest.importorskip("app.server")  # gunicorn is POSIX-only
+
+
+def test_worker_count_defaults_to_cpu_count(monkeypatch):
+    """Test that workers=0 means one worker per core."""
+    monkeypatch.setattr(settings, "workers", 0)
+    monkeypatch.setattr(server.os, "cpu_count", lambda: 6)
+    assert server.worker_count() == 6
+
+    monkeypatch.setattr(settings, "workers", 3)
+    assert server.worker_count() == 3
+
+
+def test_production_options_from_settings(monkeypatch):
+    """Test that gunicorn is configured from Settings and preloads the app."""
+    monkeypatch.setattr(settings, "workers", 4)
+    monkeypatch.setattr(settings, "port", 9000)
+    monkeypatch.setattr(settings, "keepalive", 75)
+    monkeypatch.setattr(settings, "max_requests", 5000)
+
+    options = server.production_options()
+
+    assert options["bind"] == f"{settings.host}:9000"
+    assert options["workers"] == 4
+    assert options["preload_app"] is True
+    assert options["keepalive"] == 75
+    assert options["max_requests_jitter"] == 500
+
+    app = server.ProductionServer(options)
+    assert app.cfg.worker_class is server.ProductionWorker
+    assert app.cfg.backlog == settings.backlog
+    assert server.ProductionWorker.CONFIG_KWARGS["loop"] == "uvloop"
+
+
+@pytest.mark.skipif(fcntl is None, reason="flock is POSIX-only")
+def test_maintenance_lock_has_one_holder(tmp_path, monkeypatch):
+    """Test that only one worker at a time runs maintenance, and the lock passes on."""
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path))
+    first, second = MaintenanceLock(), MaintenanceLock()
+
+    assert first.acquire() is True
+    assert second.acquire() is False
+    assert first.acquire() is True  # Re-entrant for the holder
+
+    first.release()
+    assert second.acquire() is True
+    second.release()
+
+
+@pytest.mark.asyncio
+async def test_admin_api_needs_the_token(monkeypatch):
+    """Test that the admin API is off without a token and refuses wrong ones."""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        disabled = await client.get("/api/admin/gc", headers={"X-Admin-Token": ""})
+        monkeypatch.setattr(settings, "admin_token", "admin-secret")
+        missing = await client.get("/api/admin/gc")
+        wrong = await client.get("/api/admin/gc", headers={"X-Admin-Token": "guess"})
+        right = await client.get("/api/admin/gc", headers={"X-Admin-Token": "admin-secret"})
+
+    assert disabled.status_code == missing.status_code == wrong.status_code == 403
+    assert right.status_code == 200
+
+
+@pytest.mark.skipif(fcntl is None, reason="flock is POSIX-only")
+@pytest.mark.asyncio
+async def test_maintenance_runs_only_in_the_lock_holder(tmp_path, monkeypatch, admin_headers):
+    """Test that a manual pass is refused by workers that don't hold the maintenance lock."""
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path))
+    calls = []
+
+    async def fake_run(dry_run=False):
+        calls.append(dry_run)
+        return {"dry_run": dry_run}
+
+    monkeypatch.setattr(orphan_gc, "run", fake_run)
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        refused = await client.post("/api/admin/gc/run", headers=admin_headers)
+        tiering = await client.post("/api/admin/tiering/run", headers=admin_headers)
+        assert maintenance_lock.acquire() is True
+        try:
+            ran = await client.post("/api/admin/gc/run?dry_run=true", headers=admin_headers)
+        finally:
+            maintenance_lock.release()
+
+    assert refused.status_code == tiering.status_code == 409
+    assert ran.status_code == 200 and calls == [True]
+
+
+@pytest.fixture
+def four_workers(monkeypatch):
+    """Production mode with four server workers on the host."""
+    monkeypatch.setattr(settings, "run_mode", "production")
+    monkeypatch.setattr(settings, "workers", 4)
+
+
+@pytest.mark.asyncio
+async def test_job_pool_is_per_host(four_workers, monkeypatch):
+    """Test that media_workers is shared out among the server workers."""
+    monkeypatch.setattr(settings, "media_workers", 8)
+    queue = JobQueue()
+    queue.start()
+    try:
+        assert len(queue.workers) == 2
+    finally:
+        await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_jobs_of_other_workers_are_found(monkeypatch):
+    """Test that a job this worker doesn't know is looked up in the shared records."""
+    stored = {"id": "abc", "kind": "metadata", "status": "done"}
+
+    async def get(job_id):
+        if job_id != "abc":
+            raise KeyError(job_id)
+        return stored
+
+    monkeypatch.setattr(jobs_qry, "get", get)
+    queue = JobQueue()
+    assert await queue.find("abc") == stored
+    with pytest.raises(KeyError):
+        await queue.find("missing")
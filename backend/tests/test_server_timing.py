@@ -0,0 +1,89 @@
+"""Tests for the Server-Timing breakdown."""
+import json
+
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.main import app
+from app.services.timing import RequestTimer, request_timer, stage, timed
+
+
+def timings(response) -> dict:
+    """Server-Timing entries as {name: (duration ms, desc)}."""
+    entries = {}
+    for entry in response.headers["server-timing"].split(", "):
+        name, *params = entry.split(";")
+        params = dict(param.split("=", 1) for param in params)
+        entries[name] = (float(params["dur"]), params.get("desc"))
+    return entries
+
+
+def test_stages_need_a_request():
+    """Test that stage() is a no-op outside a request."""
+    with stage("db.get"):
+        pass
+    assert request_timer.get() is None
+
+
+@pytest.mark.asyncio
+async def test_timed_accumulates_calls():
+    """Test that repeated calls of one stage are summed and counted."""
+    @timed("db")
+    async def get():
+        return 42
+
+    timer = RequestTimer()
+    token = request_timer.set(timer)
+    try:
+        assert await get() == 42
+        await get()
+    finally:
+        request_timer.reset(token)
+
+    assert list(timer.stages) == ["db.get"]
+    assert timer.stages["db.get"][1] == 2
+    assert 'db.get;dur=' in timer.header() and 'desc="2 calls"' in timer.header()
+
+
+@pytest.mark.asyncio
+async def test_header_breaks_down_route_stages(admin_headers):
+    """Test validate/handler/serialize entries and the cross-origin opt-in."""
+    origin = settings.cors_origins[0]
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get(
+            "/api/admin/streams", headers={**admin_headers, "Origin": origin}
+        )
+
+    assert response.status_code == 200
+    entries = timings(response)
+    assert {"total", "validate", "handler", "serialize"} <= set(entries)
+    assert entries["total"][0] >= entries["handler"][0]
+    assert response.headers["timing-allow-origin"] == origin
+    assert "Server-Timing" in response.headers["access-control-expose-headers"]
+
+
+@pytest.mark.asyncio
+async def test_serve_route_times_file_lookup(tmp_path, monkeypatch):
+    """Test that file I/O stages appear, also on error responses."""
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path))
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/api/notes/serve/uploads/missing.pdf")
+
+    assert response.status_code == 404
+    assert "disk.stat" in timings(response)
+    assert "timing-allow-origin" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_structured_log_line(monkeypatch, capsys):
+    """Test the optional JSON log line per request."""
+    monkeypatch.setattr(settings, "server_timing_log", True)
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        await client.get("/api/search/pages")  # Missing q: rejected by validation
+
+    line = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert line["route"] == "/api/search/pages"
+    assert line["status"] == 422
+    assert "validate" in line["stages"] and "handler" not in line["stages"]
+    assert line["total_ms"] >= 0
@@ -0,0 +1,127 @@
+"""Tests for the slow query log and its explain sampling."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.main import app
+from app.services.slow_queries import SlowQueryLog, describe, query_shape, summarize_explain
+
+FIND = {
+    "find": "notes", "filter": {"title": {"$regex": "exam"}, "page_number": {"$in": [1, 2]}},
+    "sort": {"created_at": -1}, "lsid": {"id": "session"}, "$db": "notka",
+}
+
+EXPLAIN = {
+    "queryPlanner": {"winningPlan": {
+        "stage": "SORT",
+        "inputStage": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "t_1"}},
+    }},
+    "executionStats": {
+        "nReturned": 3, "totalDocsExamined": 5000, "totalKeysExamined": 5000,
+        "executionTimeMillis": 420,
+    },
+}
+
+
+class FakeDatabase:
+    def __init__(self, calls):
+        self.calls = calls
+
+    async def command(self, command):
+        self.calls.append(command)
+        return EXPLAIN
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+
+    def __getitem__(self, name):
+        return FakeDatabase(self.calls)
+
+
+@pytest.fixture
+async def slow_log(monkeypatch):
+    """A slow query log explaining through a fake client, after two slow runs."""
+    monkeypatch.setattr(settings, "slow_query_ms", 100)
+    monkeypatch.setattr(settings, "slow_query_explain_after", 2)
+    monkeypatch.setattr(settings, "slow_query_explain_interval", 60)
+    monkeypatch.setattr(settings, "slow_query_storm", 100)
+    log = SlowQueryLog()
+    log.attach(FakeClient())
+    return log
+
+
+def event(request_id, command=None, micros=0):
+    return SimpleNamespace(
+        command_name="find", command=command, database_name="notka",
+        connection_id=("localhost", 27017), request_id=request_id, duration_micros=micros,
+    )
+
+
+def test_query_shape_drops_values():
+    """Test that literal values (including $in lists) are never part of a shape."""
+    assert describe("find", FIND) == {
+        "command": "find", "collection": "notes",
+        "filter": {"title": {"$regex": "?"}, "page_number": {"$in": "?"}},
+        "sort": {"created_at": -1},
+    }
+    assert query_shape([{"$match": {"a": 1}}, {"$limit": 5}]) == [
+        {"$match": {"a": "?"}}, {"$limit": "?"}
+    ]
+
+
+def test_summarize_explain():
+    """Test that the plan stages and examined counts are pulled out of explain output."""
+    assert summarize_explain(EXPLAIN) == {
+        "plan": ["SORT", "FETCH", "IXSCAN t_1"],
+        "returned": 3, "docs_examined": 5000, "keys_examined": 5000, "execution_ms": 420,
+    }
+
+
+@pytest.mark.asyncio
+async def test_repeated_slow_shape_is_explained_once(slow_log):
+    """Test logging by shape and the explain of a shape that keeps being slow."""
+    for request_id, micros in enumerate((50_000, 150_000, 250_000, 300_000)):
+        slow_log.started(event(request_id, FIND))
+        slow_log.succeeded(event(request_id, micros=micros))
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    stats = slow_log.stats()
+    [shape] = stats["shapes"]
+    assert shape["count"] == 3  # The 50ms run was fast enough
+    assert shape["max_ms"] == 300
+    assert shape["explain"]["plan"] == ["SORT", "FETCH", "IXSCAN t_1"]
+    assert "command" not in shape
+    assert len(stats["recent"]) == 3
+
+    [explain] = slow_log.client.calls
+    assert explain["verbosity"] == "executionStats"
+    assert explain["explain"] == {k: FIND[k] for k in ("find", "filter", "sort")}
+    assert stats["explains_run"] == 1
+
+
+@pytest.mark.asyncio
+async def test_no_explains_during_a_storm(slow_log, monkeypatch):
+    """Test that explains are suspended while many slow commands arrive."""
+    monkeypatch.setattr(settings, "slow_query_storm", 2)
+    for request_id in range(5):
+        slow_log.started(event(request_id, FIND))
+        slow_log.succeeded(event(request_id, micros=200_000))
+    await asyncio.sleep(0)
+
+    assert slow_log.client.calls == []
+    assert slow_log.stats()["explains_skipped"] > 0
+
+
+@pytest.mark.asyncio
+async def test_slow_queries_endpoint(admin_headers):
+    """Test that the admin endpoint reports the log."""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/api/admin/slow-queries", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["threshold_ms"] == settings.slow_query_ms
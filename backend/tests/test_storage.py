@@ -0,0 +1,169 @@
+"""Tests for the attachment storage backends (S3 against moto's in-process stand-in)."""
+import hashlib
+import io
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+
+from app.config import settings
+from app.main import app
+from app.services import media
+from app.services.jobs import DONE, JobQueue, job_file
+from app.services.storage import LocalStorage, S3Storage, storage
+
+moto = pytest.importorskip("moto")
+
+BUCKET = "notka-test"
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    """Temporary upload directory."""
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def s3(upload_dir, monkeypatch):
+    """S3Storage backed by moto, installed as the global backend."""
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        backend = S3Storage(BUCKET, region="us-east-1", prefix="uploads/")
+        backend.client.create_bucket(Bucket=BUCKET)
+        monkeypatch.setattr(storage, "backend", backend)
+        yield backend
+
+
+def object_body(backend, key):
+    return backend.client.get_object(Bucket=BUCKET, Key=key)["Body"].read()
+
+
+@pytest.mark.asyncio
+async def test_local_save_and_delete(upload_dir):
+    """Test that the local backend writes into and removes from upload_dir."""
+    backend = LocalStorage()
+    written = await backend.save("uploads/a.pdf", io.BytesIO(b"pdf bytes"))
+    assert (upload_dir / "a.pdf").read_bytes() == b"pdf bytes"
+    assert written == {"size": 9, "sha256": hashlib.sha256(b"pdf bytes").hexdigest()}
+    assert await backend.url_for("uploads/a.pdf") is None
+
+    assert await backend.delete("uploads/a.pdf") is True
+    assert await backend.delete("uploads/a.pdf") is False
+    assert not (upload_dir / "a.pdf").exists()
+
+
+@pytest.mark.asyncio
+async def test_s3_save_small_file(s3, upload_dir):
+    """Test that small uploads become a single object and nothing stays on the node."""
+    written = await s3.save("uploads/notes.pdf", io.BytesIO(b"small"))
+    assert object_body(s3, "uploads/notes.pdf") == b"small"
+    assert written == {"size": 5, "sha256": hashlib.sha256(b"small").hexdigest()}
+    assert list(upload_dir.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_s3_save_uses_multipart(s3, monkeypatch):
+    """Test that files larger than one part are uploaded in parts."""
+    monkeypatch.setattr(settings, "s3_part_size", 5 * 1024 * 1024)
+    data = bytes(range(256)) * (23 * 1024)  # ~5.75MB: two parts
+    await s3.save("uploads/lecture.mp4", io.BytesIO(data))
+
+    head = s3.client.head_object(Bucket=BUCKET, Key="uploads/lecture.mp4")
+    assert head["ETag"].endswith('-2"')  # Multipart ETags carry the part count
+    assert object_body(s3, "uploads/lecture.mp4") == data
+
+
+@pytest.mark.asyncio
+async def test_s3_delete_removes_object(s3):
+    """Test that deleting removes the object."""
+    await s3.save("uploads/notes.pdf", io.BytesIO(b"bytes"))
+    await s3.delete("uploads/notes.pdf")
+
+    listing = s3.client.list_objects_v2(Bucket=BUCKET)
+    assert listing["KeyCount"] == 0
+
+
+@pytest.mark.asyncio
+async def test_s3_local_copy_is_scratch_download(s3, tmp_path, monkeypatch):
+    """Test that local copies are downloaded for the block, then removed."""
+    scratch = tmp_path / "scratch"
+    scratch.mkdir()
+    monkeypatch.setattr(settings, "s3_scratch_dir", str(scratch))
+    await s3.save("uploads/notes.pdf", io.BytesIO(b"pdf bytes"))
+
+    async with storage.local_copy("uploads/notes.pdf") as local_path:
+        assert local_path.parent == scratch and local_path.suffix == ".pdf"
+        assert local_path.read_bytes() == b"pdf bytes"
+        local_path.write_bytes(b"rewritten")
+        await storage.sync("uploads/notes.pdf", local_path)
+
+    assert list(scratch.iterdir()) == []
+    assert object_body(s3, "uploads/notes.pdf") == b"rewritten"
+
+
+@pytest.mark.asyncio
+async def test_s3_local_copy_of_missing_object(s3, tmp_path, monkeypatch):
+    """Test that a missing object raises FileNotFoundError and leaves no scratch file."""
+    monkeypatch.setattr(settings, "s3_scratch_dir", str(tmp_path))
+    with pytest.raises(FileNotFoundError):
+        async with storage.local_copy("uploads/gone.pdf"):
+            pass
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_job_runs_on_bucket_copy(s3, upload_dir):
+    """Test that a job on an attachment reads a downloaded copy, kept until on_done returns."""
+    await s3.save("uploads/notes.txt", io.BytesIO(b"twelve bytes"))
+    seen = []
+
+    async def on_done(meta):
+        seen.append(job_file.get().is_file())
+
+    queue = JobQueue()
+    queue.start(workers=1)
+    try:
+        job_id = queue.submit(
+            "metadata", media.probe_file, source="uploads/notes.txt", on_done=on_done
+        )
+        await queue.join()
+    finally:
+        await queue.stop()
+
+    assert queue.get(job_id)["status"] == DONE
+    assert queue.get(job_id)["result"] == {"size": 12}
+    assert seen == [True]
+    assert list(upload_dir.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_s3_presigned_url(s3):
+    """Test presigned GET URLs, with a download filename when asked."""
+    url = await s3.url_for("uploads/20250101_120000_notes.pdf", download_name="notes ą.pdf")
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query)
+
+    assert parsed.path.endswith("/uploads/20250101_120000_notes.pdf")
+    assert query["X-Amz-Expires"] == [str(settings.s3_url_expiry)]
+    assert query["response-content-disposition"] == [
+        "attachment; filename*=utf-8''notes%20%C4%85.pdf"
+    ]
+
+
+@pytest_asyncio.fixture
+async def client(s3):
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_serve_redirects_to_bucket(client):
+    """Test that the serve endpoint sends browsers straight to storage."""
+    response = await client.get("/api/notes/serve/20250101_120000_lecture.mp4")
+
+    assert response.status_code == 307
+    assert "/uploads/20250101_120000_lecture.mp4" in response.headers["location"]
+    assert "X-Amz-Signature" in response.headers["location"]
@@ -0,0 +1,160 @@
+"""Tests for disconnect-aware streaming and the per-worker stream scheduler."""
+import asyncio
+import time
+
+import pytest
+
+from app.config import settings
+from app.services.file_serving import RangeFileResponse
+from app.services.streams import StreamScheduler, TokenBucket
+
+FILE_BYTES = bytes(range(256)) * 64  # 16384 bytes
+
+
+@pytest.fixture
+def video(tmp_path, monkeypatch):
+    """A file served in 1KB chunks."""
+    monkeypatch.setattr(settings, "serve_chunk_size", 1024)
+    path = tmp_path / "lecture.mp4"
+    path.write_bytes(FILE_BYTES)
+    return path
+
+
+def scope_for(client="10.0.0.1"):
+    return {"type": "http", "method": "GET", "client": (client, 50000), "extensions": {}}
+
+
+@pytest.mark.asyncio
+async def test_stream_stops_when_client_disconnects(video):
+    """Test that a scrubbed-away request stops reading after the disconnect."""
+    chunks = []
+    disconnected = False
+
+    async def receive():
+        if disconnected:
+            return {"type": "http.disconnect"}
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal disconnected
+        if message["type"] == "http.response.body" and message["body"]:
+            chunks.append(message["body"])
+            disconnected = len(chunks) == 3  # Browser aborts after three chunks
+
+    response = RangeFileResponse(video, len(FILE_BYTES))
+    await response(scope_for(), receive, send)
+
+    assert len(chunks) == 3
+
+
+@pytest.mark.asyncio
+async def test_stream_sends_whole_file_in_chunks(video):
+    """Test that a connected client gets every chunk in order."""
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(bytes(message["body"]))
+
+    response = RangeFileResponse(video, len(FILE_BYTES), ranges=[(100, 5099)], status_code=206)
+    await response(scope_for(), receive, send)
+
+    assert b"".join(body) == FILE_BYTES[100:5100]
+    assert len(body) == 6  # Five chunks and the empty closing message
+
+
+@pytest.mark.asyncio
+async def test_open_bodies_do_not_hold_read_slots(video, monkeypatch):
+    """Test that more bodies than max_disk_reads all progress, one chunk at a time."""
+    monkeypatch.setattr(settings, "max_disk_reads", 1)
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    def sender(name):
+        async def send(message):
+            if message["type"] == "http.response.body" and message["body"]:
+                sent.append(name)
+                await asyncio.sleep(0.001)  # Slow client: backpressure on every chunk
+        return send
+
+    await asyncio.wait_for(asyncio.gather(*(
+        RangeFileResponse(video, len(FILE_BYTES))(scope_for(f"10.0.0.{n}"), receive, sender(n))
+        for n in range(3)
+    )), 5)
+
+    assert sorted(sent) == sorted([0, 1, 2] * 16)
+    assert sent[:6] != [0] * 6  # Interleaved, not one body after another
+
+
+@pytest.mark.asyncio
+async def test_read_slots_go_round_robin_across_clients(monkeypatch):
+    """Test that a client with many waiting reads cannot starve another client."""
+    monkeypatch.setattr(settings, "max_disk_reads", 1)
+    scheduler = StreamScheduler()
+    order = []
+
+    async def read(client, name):
+        async with scheduler.read_slot(client):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(read("a", "a1"), read("a", "a2"), read("a", "a3"), read("b", "b1"))
+
+    assert order == ["a1", "b1", "a2", "a3"]
+    stats = scheduler.stats()
+    assert (stats["reading"], stats["waiting"]) == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_read_gives_up_its_turn(monkeypatch):
+    """Test that a disconnected client's waiting read leaves the queue."""
+    monkeypatch.setattr(settings, "max_disk_reads", 1)
+    scheduler = StreamScheduler()
+
+    async with scheduler.read_slot("a"):
+        waiting = asyncio.create_task(scheduler.read_slot("b").__aenter__())
+        await asyncio.sleep(0)
+        assert scheduler.stats()["waiting"] == 1
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert scheduler.stats()["waiting"] == 0
+    assert scheduler.active == 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_splits_bandwidth_across_clients(monkeypatch):
+    """Test that each connected client gets an even share of serve_bandwidth."""
+    monkeypatch.setattr(settings, "serve_bandwidth", 1_000_000)
+    scheduler = StreamScheduler()
+
+    async with scheduler.stream("a") as first:
+        assert first.rate == 1_000_000
+        async with scheduler.stream("b") as second, scheduler.stream("b") as again:
+            assert second is again  # One client's streams share its bucket
+            assert first.rate == second.rate == 500_000
+        assert first.rate == 1_000_000
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_paces_to_rate():
+    """Test that consuming beyond the burst sleeps off the debt."""
+    bucket = TokenBucket(rate=100_000, burst=1000)
+    started = time.monotonic()
+    for _ in range(6):
+        await bucket.consume(1000)
+    assert time.monotonic() - started >= 0.045  # 5KB of debt at 100KB/s
+
+
+@pytest.mark.asyncio
+async def test_unlimited_bucket_never_waits():
+    """Test that a zero rate means no pacing."""
+    bucket = TokenBucket()
+    started = time.monotonic()
+    await bucket.consume(10 ** 9)
+    assert time.monotonic() - started < 0.01
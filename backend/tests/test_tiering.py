@@ -0,0 +1,222 @@
+"""Tests for the cold tier: archiving idle uploads and recalling them on demand."""
+import asyncio
+import gzip
+import os
+import time
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+
+from app.config import settings
+from app.main import app
+from app.services.file_cache import file_cache
+from app.services.hot_cache import hot_cache
+from app.services.tiering import ColdTier, archive_file, cold_tier, restore_file
+from notes import access
+
+TEXT_BYTES = b"lecture transcript " * 5000
+VIDEO_BYTES = os.urandom(256 * 1024)
+OLD = time.time() - 400 * 24 * 60 * 60
+
+
+@pytest.fixture
+def tiers(tmp_path, monkeypatch):
+    """Upload and archive directories, with access history kept in memory."""
+    upload_dir = tmp_path / "uploads"
+    archive_dir = tmp_path / "archive"
+    upload_dir.mkdir()
+    monkeypatch.setattr(settings, "upload_dir", str(upload_dir))
+    monkeypatch.setattr(settings, "archive_dir", str(archive_dir))
+    monkeypatch.setattr(settings, "archive_after_days", 90)
+
+    history = {}
+
+    async def record_many(accesses):
+        for name, when in accesses.items():
+            history[name] = max(when, history.get(name, 0))
+        return len(accesses)
+
+    async def accessed_since(since, batch_size=1000):
+        for name, when in list(history.items()):
+            if when >= since:
+                yield name
+
+    monkeypatch.setattr(access, "record_many", record_many)
+    monkeypatch.setattr(access, "accessed_since", accessed_since)
+    file_cache.clear()
+    hot_cache.clear()
+    yield upload_dir, archive_dir, history
+    cold_tier.tracker.pending.clear()
+    file_cache.clear()
+    hot_cache.clear()
+
+
+def make_upload(directory, name, data, mtime=OLD):
+    path = directory / name
+    path.write_bytes(data)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_archive_compresses_only_when_it_helps(tmp_path):
+    """Test zstd for compressible files and plain copies for the rest."""
+    archive_dir = tmp_path / "archive"
+    text = make_upload(tmp_path, "notes.pdf", TEXT_BYTES)
+    video = make_upload(tmp_path, "lecture.mp4", VIDEO_BYTES)
+
+    text_result = archive_file(str(text), str(archive_dir), 3)
+    video_result = archive_file(str(video), str(archive_dir), 3)
+
+    assert text_result["compressed"] and text_result["archived_size"] < len(TEXT_BYTES) // 10
+    assert not video_result["compressed"]
+    assert sorted(p.name for p in archive_dir.iterdir()) == ["lecture.mp4", "notes.pdf.zst"]
+    assert not text.exists() and not video.exists()
+
+    restore_file(str(archive_dir / "notes.pdf.zst"), str(text))
+    restore_file(str(archive_dir / "lecture.mp4"), str(video))
+    assert text.read_bytes() == TEXT_BYTES
+    assert video.read_bytes() == VIDEO_BYTES
+    assert text.stat().st_mtime == video.stat().st_mtime == OLD  # Original mtimes come back
+    assert list(archive_dir.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_pass_archives_only_idle_files(tiers):
+    """Test that recently accessed or modified files stay in the hot tier."""
+    upload_dir, archive_dir, history = tiers
+    make_upload(upload_dir, "idle.pdf", TEXT_BYTES)
+    make_upload(upload_dir, "watched.mp4", VIDEO_BYTES)
+    make_upload(upload_dir, "new.pdf", TEXT_BYTES, mtime=time.time())
+    make_upload(upload_dir, "idle.pdf.br", b"variant")  # Not an attachment itself
+    history["watched.mp4"] = time.time() - 60
+
+    tier = ColdTier()
+    result = await tier.run_pass()
+
+    assert result["archived"] == 1
+    assert result["bytes_moved"] == len(TEXT_BYTES)
+    assert result["bytes_saved"] > 0
+    assert sorted(p.name for p in upload_dir.iterdir()) == ["idle.pdf.br", "new.pdf", "watched.mp4"]
+    assert [p.name for p in archive_dir.iterdir()] == ["idle.pdf.zst"]
+
+
+@pytest.mark.asyncio
+async def test_pending_accesses_are_flushed_in_one_batch(tiers):
+    """Test that accesses are buffered and written on flush."""
+    _, _, history = tiers
+    tier = ColdTier()
+    for _ in range(100):
+        tier.record_access("uploads/a.pdf")
+    tier.record_access("uploads/b.pdf")
+
+    assert history == {}
+    assert await tier.tracker.flush() == 2
+    assert set(history) == {"a.pdf", "b.pdf"}
+    assert tier.tracker.pending == {}
+
+
+@pytest.mark.asyncio
+async def test_every_worker_flushes_accesses(tiers, monkeypatch):
+    """Test that a worker without the tiering loop still writes the accesses it saw."""
+    _, _, history = tiers
+    monkeypatch.setattr(settings, "access_flush_interval", 0.01)
+    tier = ColdTier()
+    tier.start(tiering=False)
+    assert tier.task is None and tier.flush_task is not None
+    try:
+        tier.record_access("uploads/watched.mp4")
+        await asyncio.sleep(0.05)
+        assert "watched.mp4" in history  # Before stop() flushes what is left
+    finally:
+        await tier.stop()
+
+
+@pytest_asyncio.fixture
+async def client(tiers):
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_serve_recalls_archived_file(client, tiers):
+    """Test that serving an archived file restores it transparently."""
+    upload_dir, archive_dir, _ = tiers
+    make_upload(upload_dir, "20240101_120000_old.pdf", TEXT_BYTES)
+    await cold_tier.run_pass()
+    assert not (upload_dir / "20240101_120000_old.pdf").exists()
+
+    response = await client.get(
+        "/api/notes/serve/20240101_120000_old.pdf", headers={"Range": "bytes=0-6"}
+    )
+
+    assert response.status_code == 206
+    assert response.content == TEXT_BYTES[:7]
+    assert (upload_dir / "20240101_120000_old.pdf").read_bytes() == TEXT_BYTES
+    assert list(archive_dir.iterdir()) == []
+    assert "20240101_120000_old.pdf" in cold_tier.tracker.pending
+
+
+@pytest.mark.asyncio
+async def test_recalled_file_keeps_its_variants(client, tiers):
+    """Test that a pre-compressed variant is still served after a recall."""
+    upload_dir, _, _ = tiers
+    make_upload(upload_dir, "20240101_120000_diagram.svg", TEXT_BYTES)
+    make_upload(
+        upload_dir, "20240101_120000_diagram.svg.gz", gzip.compress(TEXT_BYTES), mtime=OLD + 1
+    )
+    await cold_tier.run_pass()
+    assert not (upload_dir / "20240101_120000_diagram.svg").exists()
+
+    response = await client.get(
+        "/api/notes/serve/20240101_120000_diagram.svg", headers={"Accept-Encoding": "gzip"}
+    )
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == TEXT_BYTES
+    assert (upload_dir / "20240101_120000_diagram.svg").stat().st_mtime == OLD
+
+
+@pytest.mark.asyncio
+async def test_serve_missing_file_is_still_404(client):
+    """Test that files in neither tier are not found."""
+    response = await client.get("/api/notes/serve/nothing.pdf")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_access_records_are_unique_per_file(monkeypatch):
+    """Test that startup merges duplicate access records and indexes the name as unique."""
+    deleted, created = [], []
+
+    class Cursor:
+        def __init__(self, groups):
+            self.groups = iter(groups)
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            try:
+                return next(self.groups)
+            except StopIteration:
+                raise StopAsyncIteration
+
+    class Collection:
+        def aggregate(self, pipeline):
+            return Cursor([{"_id": "a.pdf", "ids": ["newest", "older", "oldest"]}])
+
+        async def delete_many(self, query):
+            deleted.append(query)
+
+        async def create_index(self, keys, **kwargs):
+            created.append((keys, kwargs))
+
+    async def get_collection():
+        return Collection()
+
+    monkeypatch.setattr(access, "get_collection", get_collection)
+    await access.create_indexes()
+
+    assert deleted == [{"_id": {"$in": ["older", "oldest"]}}]
+    assert created == [(access.FILE_NAME, {"unique": True})]
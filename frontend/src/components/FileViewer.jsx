@@ -4,7 +4,7 @@ import LinkTextModal from './LinkTextModal';
 import PdfViewer from './PdfViewer';
 import './FileViewer.css';
 
-function FileViewer({ note, onClose, onInsertLink, selectedText }) {
+function FileViewer({ note, noteId, onClose, onInsertLink, selectedText }) {
   const videoRef = useRef(null);
   const modalRef = useRef(null);
   const [pdfPage, setPdfPage] = useState(note.page_number || 1);
@@ -358,6 +358,16 @@ function FileViewer({ note, onClose, onInsertLink, selectedText }) {
               >
                 📥
               </a>
+              {fileExt === 'pdf' && noteId && (
+                <a
+                  href={noteAPI.getPageUrl(noteId, pdfPage, note.file_path)}
+                  download
+                  className="btn-download-header"
+                  title={`Download page ${pdfPage} only`}
+                >
+                  📄
+                </a>
+              )}
               <button 
                 className="btn-fullscreen" 
                 onClick={toggleFullscreen}
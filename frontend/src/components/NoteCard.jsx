@@ -18,7 +18,21 @@ function NoteCard({ note, onDelete, onViewFile }) {
     return filePath.split('.').pop().toLowerCase();
   };
 
+  const formatSize = (bytes) => {
+    if (bytes == null) return null;
+    const units = ['B', 'KB', 'MB', 'GB'];
+    let size = bytes;
+    let unit = 0;
+    while (size >= 1024 && unit < units.length - 1) {
+      size /= 1024;
+      unit += 1;
+    }
+    return `${unit === 0 ? size : size.toFixed(1)} ${units[unit]}`;
+  };
+
   const fileExt = getFileExtension(note.file_path);
+  const attachment = (note.attachments || []).find(a => a.path === note.file_path);
+  const fileSize = formatSize(attachment?.size);
 
   return (
     <div className="note-card">
@@ -58,7 +72,9 @@ function NoteCard({ note, onDelete, onViewFile }) {
           )}
 
           {fileExt && (
-            <span className="file-badge">{fileExt.toUpperCase()}</span>
+            <span className="file-badge">
+              {fileExt.toUpperCase()}{fileSize && ` · ${fileSize}`}
+            </span>
           )}
         </div>
       )}
@@ -152,6 +152,7 @@ function NotebookPage() {
   const [noteTitle, setNoteTitle] = useState('');
   const [noteContent, setNoteContent] = useState('');
   const [noteFiles, setNoteFiles] = useState([]);
+  const [failedPreviews, setFailedPreviews] = useState(new Set()); // Files whose thumbnail 404ed
   const [selectedText, setSelectedText] = useState('');
   const [showFileViewer, setShowFileViewer] = useState(false);
   const [viewerFile, setViewerFile] = useState(null);
@@ -238,12 +239,8 @@ function NotebookPage() {
     setCurrentNote(note);
     setNoteTitle(note.title);
     setNoteContent(note.content);
-    // Load files associated with this note (use files array if available, fallback to file_path)
-    const filesArray = note.files && note.files.length > 0 
-      ? note.files 
-      : (note.file_path ? [note.file_path] : []);
-    const files = filesArray.map(path => ({ path, name: extractFileName(path) }));
-    setNoteFiles(files);
+    // Load files associated with this note
+    setNoteFiles(noteFilesOf(note));
     // Focus immediately - no setTimeout needed
     requestAnimationFrame(() => {
       editorRef.current?.focus();
@@ -255,6 +252,17 @@ function NotebookPage() {
     return path.split('/').pop();
   };
 
+  // Attachment records carry the original upload name; older notes only have paths
+  const noteFilesOf = (note) => {
+    if (note.attachments && note.attachments.length > 0) {
+      return note.attachments.map(a => ({ ...a, name: a.name || extractFileName(a.path) }));
+    }
+    const filesArray = note.files && note.files.length > 0
+      ? note.files
+      : (note.file_path ? [note.file_path] : []);
+    return filesArray.map(path => ({ path, name: extractFileName(path) }));
+  };
+
   // Debounced auto-save (1 second delay)
   // Note: handleSaveNote is NOT wrapped in useCallback to avoid stale closure issues
   // This ensures the debounced function always uses the latest state values
@@ -285,27 +293,25 @@ function NotebookPage() {
       return;
     }
 
-    const file = e.target.files[0];
-    if (!file) return;
+    const files = Array.from(e.target.files);
+    if (files.length === 0) return;
 
     try {
-      // Add file to the existing note (appends to files array)
-      const updatedNote = await noteAPI.addFileToNote(currentNote._id, file);
+      // Add the files to the existing note (appends to files array) in one request
+      const updatedNote = files.length === 1
+        ? await noteAPI.addFileToNote(currentNote._id, files[0])
+        : await noteAPI.addFilesToNote(currentNote._id, files);
 
       // Update current note with all files
       setCurrentNote(updatedNote);
       
-      // Build files array from the updated note
-      const filesArray = updatedNote.files && updatedNote.files.length > 0 
-        ? updatedNote.files 
-        : (updatedNote.file_path ? [updatedNote.file_path] : []);
-      const files = filesArray.map(path => ({ path, name: extractFileName(path) }));
-      setNoteFiles(files);  // Update with ALL files (not just the new one)
+      // Update with ALL files (not just the new one)
+      setNoteFiles(noteFilesOf(updatedNote));
       
       // Update the note in the notes list
       setNotes(notes.map(n => n._id === updatedNote._id ? updatedNote : n));
       
-      alert('File uploaded successfully!');
+      alert(files.length === 1 ? 'File uploaded successfully!' : `${files.length} files uploaded successfully!`);
     } catch (error) {
       console.error('Failed to upload file:', error);
       alert(`Failed to upload file: ${error.response?.data?.detail || error.message}`);
@@ -589,11 +595,7 @@ function NotebookPage() {
       
       // Update local state
       setCurrentNote(updatedNote);
-      const filesArray = updatedNote.files && updatedNote.files.length > 0 
-        ? updatedNote.files 
-        : (updatedNote.file_path ? [updatedNote.file_path] : []);
-      const files = filesArray.map(path => ({ path, name: extractFileName(path) }));
-      setNoteFiles(files);
+      setNoteFiles(noteFilesOf(updatedNote));
       setNotes(notes.map(n => n._id === updatedNote._id ? updatedNote : n));
       
       setShowDeleteFileConfirm(false);
@@ -871,9 +873,10 @@ function NotebookPage() {
             <p className="sidebar-hint">💡 Click to preview • Hover to insert/delete</p>
             <label className="btn-upload-file">
               <Upload size={18} />
-              Upload File
+              Upload Files
               <input
                 type="file"
+                multiple
                 accept=".pdf,.ppt,.pptx,.doc,.docx,.png,.jpg,.jpeg,.gif,.bmp,.svg,.webp,.mp4,.webm,.ogg,.mov,.avi,.mkv,.m4v"
                 onChange={handleFileUpload}
                 style={{ display: 'none' }}
@@ -891,6 +894,7 @@ function NotebookPage() {
                   const isVideo = videoExts.includes(fileExt);
                   const isImage = imageExts.includes(fileExt);
                   const canEmbed = isVideo || isImage;
+                  const hasPreview = fileExt === 'pdf' || (isImage && fileExt !== 'svg');
 
                   return (
                     <div 
@@ -899,7 +903,17 @@ function NotebookPage() {
                       onClick={() => handleFileClick(file)}
                       title="Click to preview"
                     >
-                      <FileText size={16} />
+                      {hasPreview && !failedPreviews.has(file.path) ? (
+                        <img
+                          src={noteAPI.getPreviewUrl(file.path)}
+                          alt=""
+                          className="file-thumb"
+                          loading="lazy"
+                          onError={() => setFailedPreviews(prev => new Set(prev).add(file.path))}
+                        />
+                      ) : (
+                        <FileText size={16} />
+                      )}
                       <span className="file-name">{file.name}</span>
                       <div className="file-actions">
                         {isVideo && <span className="file-badge">🎬</span>}
@@ -936,6 +950,7 @@ function NotebookPage() {
       {showFileViewer && viewerFile && (
         <FileViewer
           note={viewerFile}
+          noteId={currentNote?._id}
           onClose={() => setShowFileViewer(false)}
           onInsertLink={handleInsertLink}
           selectedText={selectedText}
@@ -63,6 +63,21 @@ export const noteAPI = {
     return response.data;
   },
 
+  // Add several files to an existing note in a single request
+  addFilesToNote: async (id, files) => {
+    const formData = new FormData();
+    for (const file of files) {
+      formData.append('files', file);
+    }
+
+    const response = await api.post(`/api/notes/${id}/file`, formData, {
+      headers: {
+        'Content-Type': 'multipart/form-data',
+      },
+    });
+    return response.data;
+  },
+
   // Delete a specific file from a note
   deleteFileFromNote: async (id, filePath) => {
     const response = await api.delete(`/api/notes/${id}/file`, {
@@ -92,6 +107,19 @@ export const noteAPI = {
     // Use the new Range-supporting endpoint for video seeking
     return `${API_BASE_URL}/api/notes/serve/${normalizedPath}`;
   },
+
+  // Get URL of a single page of a note's PDF (small standalone PDF)
+  getPageUrl: (id, pageNumber, filePath) => {
+    const query = filePath ? `?file=${encodeURIComponent(filePath)}` : '';
+    return `${API_BASE_URL}/api/notes/${id}/page/${pageNumber}${query}`;
+  },
+
+  // Get thumbnail URL for an image or PDF attachment
+  getPreviewUrl: (filePath) => {
+    if (!filePath) return null;
+    const name = filePath.split('/').pop();
+    return `${API_BASE_URL}/api/notes/serve/preview/${name}`;
+  },
 };
 
 export default api;